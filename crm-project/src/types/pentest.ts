@@ -31,6 +31,10 @@ export interface URL {
   compliance_id?: number;
   is_completed: boolean;
   finding_counts?: number;
+  critical_findings?: number;
+  high_findings?: number;
+  medium_findings?: number;
+  low_findings?: number;
 }
 
 export interface URLType {
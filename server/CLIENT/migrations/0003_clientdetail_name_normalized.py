@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:28
+
+import re
+import unicodedata
+from django.db import migrations, models
+
+
+def normalize_name(value):
+    # Copy of CLIENT.models.normalize_name as of this migration.
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', value.casefold()))
+
+
+def backfill_name_normalized(apps, schema_editor):
+    ClientDetail = apps.get_model('CLIENT', 'ClientDetail')
+    batch = []
+    for client in ClientDetail.objects.only('id', 'name').iterator(chunk_size=1000):
+        client.name_normalized = normalize_name(client.name)
+        batch.append(client)
+        if len(batch) >= 1000:
+            ClientDetail.objects.bulk_update(batch, ['name_normalized'])
+            batch = []
+    ClientDetail.objects.bulk_update(batch, ['name_normalized'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CLIENT', '0002_alter_clientaddress_state'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientdetail',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=400),
+        ),
+        migrations.RunPython(backfill_name_normalized, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CLIENT', '0003_clientdetail_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clientdetail',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='clientdetail',
+            index=models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ),
+    ]
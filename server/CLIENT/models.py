@@ -1,3 +1,5 @@
+import re
+import unicodedata
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
@@ -12,14 +14,38 @@ class ClientAddress(models.Model):
     def __str__(self):
         return f"{self.city}, {self.country}"
     
+def normalize_name(value):
+    """
+    Search key for a name: accents stripped, case folded and runs of
+    punctuation and whitespace collapsed to a single space.
+    """
+    value = unicodedata.normalize('NFKD', value or '')
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return ' '.join(re.findall(r'\w+', value.casefold()))
+
+
 class ClientDetail(models.Model):
     name = models.CharField(max_length=400)
+    name_normalized = models.CharField(max_length=400, db_index=True, editable=False, default='')
     email = models.EmailField(unique=True)
     phone_code = models.CharField(max_length=5)
     phone = models.CharField(max_length=15)
     profile = models.ImageField(upload_to='client_company_profiles/', null=True)
     address = models.OneToOneField(ClientAddress, on_delete=models.CASCADE)
     date_joined = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='client_updated_idx'),
+        ]
+    
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'name_normalized'}
+        super().save(*args, **kwargs)
     
     def __str__(self):
         return self.name
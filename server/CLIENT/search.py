@@ -0,0 +1,57 @@
+from difflib import SequenceMatcher
+from .models import ClientDetail, normalize_name
+
+# Upper bound on the rows scored in Python when prefix matches run short.
+FUZZY_CANDIDATES = 500
+FUZZY_THRESHOLD = 0.75
+
+
+def prefix_range(prefix):
+    # `name_normalized >= prefix AND < prefix + U+FFFF` is a plain index
+    # range scan on every backend, unlike LIKE 'prefix%'.
+    return {'name_normalized__gte': prefix, 'name_normalized__lt': prefix + '\uffff'}
+
+
+def fuzzy_score(term, name):
+    scores = [SequenceMatcher(None, term, name[:len(term)]).ratio()]
+    scores.extend(SequenceMatcher(None, term, word[:len(term)]).ratio() for word in name.split())
+    return max(scores)
+
+
+def search_clients(term, limit=10):
+    """
+    Clients whose normalized name starts with `term`, then those with a
+    later word starting with it ("bank" finds "First Bank"), topped up
+    with near misses (typos) scored against a bounded set of candidates
+    sharing the term's first letter.
+    """
+    term = normalize_name(term)
+    if not term:
+        return []
+    fields = ('id', 'name', 'email', 'name_normalized')
+
+    matches = list(
+        ClientDetail.objects.filter(**prefix_range(term))
+        .order_by('name_normalized', 'id').values(*fields)[:limit]
+    )
+    if len(matches) < limit:
+        # Not an index range: only scanned when prefix matches run short,
+        # and stopped at `limit`.
+        matches.extend(
+            ClientDetail.objects.filter(name_normalized__contains=f' {term}')
+            .exclude(**prefix_range(term)).order_by('name_normalized', 'id').values(*fields)[:limit - len(matches)]
+        )
+    if len(matches) < limit:
+        found = {match['id'] for match in matches}
+        candidates = ClientDetail.objects.filter(**prefix_range(term[0])) \
+            .exclude(id__in=found).values(*fields)[:FUZZY_CANDIDATES]
+        scored = [
+            (score, candidate) for candidate in candidates
+            if (score := fuzzy_score(term, candidate['name_normalized'])) >= FUZZY_THRESHOLD
+        ]
+        scored.sort(key=lambda item: (-item[0], item[1]['name_normalized']))
+        matches.extend(candidate for _, candidate in scored[:limit - len(matches)])
+
+    for match in matches:
+        del match['name_normalized']
+    return matches
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from CORE.renditions import RenditionURLField
 from .models import ClientDetail, ClientAddress, ClientTeam
 
 
@@ -15,9 +16,10 @@ class ClientTeamSerializer(serializers.ModelSerializer):
 class ClientDetailSerializer(serializers.ModelSerializer):
     address = ClientAddressSerializer()
     teams = ClientTeamSerializer(many=True, read_only=True)
+    profile_thumbnail = RenditionURLField('client-profile-rendition', source='profile')
     class Meta:
         model = ClientDetail
-        fields = '__all__'
+        exclude = ['name_normalized']
 
     def create(self, validated_data):
         address_data = validated_data.pop('address')
@@ -39,4 +41,9 @@ class ClientDetailSerializer(serializers.ModelSerializer):
         instance.save()
 
         return instance
-    
+
+
+class ClientSearchSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    email = serializers.EmailField()
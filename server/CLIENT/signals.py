@@ -0,0 +1,19 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from CORE.sync import touch, track_deletes, track_updates
+from .models import ClientAddress, ClientDetail, ClientTeam
+
+track_deletes(ClientDetail)
+track_updates(ClientDetail)
+
+
+# A client embeds its address and teams, so sync clients see those change
+# through the client's updated_at.
+@receiver(post_save, sender=ClientAddress)
+def touch_address_client(sender, instance, **kwargs):
+    touch(ClientDetail.objects.filter(address=instance))
+
+
+@receiver([post_save, post_delete], sender=ClientTeam)
+def touch_team_client(sender, instance, **kwargs):
+    touch(ClientDetail.objects.filter(pk=instance.client_id))
@@ -1,3 +1,63 @@
+import importlib
+from django.apps import apps
 from django.test import TestCase
+from rest_framework.test import APIClient
+from .models import ClientAddress, ClientDetail, normalize_name
+from .search import search_clients
 
-# Create your tests here.
+backfill = importlib.import_module('CLIENT.migrations.0003_clientdetail_name_normalized')
+
+
+def create_client(name):
+    address = ClientAddress.objects.create(address='-', city='-', postal_code='-', country='-')
+    return ClientDetail.objects.create(
+        name=name, email=f'{normalize_name(name).replace(" ", ".")}@example.com', phone_code='+1', phone='0', address=address,
+    )
+
+
+class ClientSearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for name in ('ACME Labs', 'Globex', 'Ácmé Holdings', 'First Bank', 'Acme Corp', 'Bankside Ltd'):
+            create_client(name)
+
+    def names(self, term, limit=10):
+        return [match['name'] for match in search_clients(term, limit=limit)]
+
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('  Ácmé, Corp.--Ltd '), 'acme corp ltd')
+        self.assertEqual(normalize_name(None), '')
+
+    def test_saves_keep_name_normalized(self):
+        client = ClientDetail.objects.get(name='Globex')
+        client.name = 'Globex Ünited'
+        client.save(update_fields=['name'])
+        client.refresh_from_db()
+        self.assertEqual(client.name_normalized, 'globex united')
+
+    def test_prefix_matches_come_in_name_order(self):
+        self.assertEqual(self.names('acm'), ['Acme Corp', 'Ácmé Holdings', 'ACME Labs'])
+        # Close misses follow the exact prefix match.
+        self.assertEqual(self.names('ACME  h'), ['Ácmé Holdings', 'Acme Corp', 'ACME Labs'])
+        self.assertEqual(self.names('acm', limit=2), ['Acme Corp', 'Ácmé Holdings'])
+
+    def test_later_words_match_after_prefixes(self):
+        self.assertEqual(self.names('bank'), ['Bankside Ltd', 'First Bank'])
+
+    def test_typos_are_matched_fuzzily(self):
+        self.assertEqual(self.names('glbex'), ['Globex'])
+        self.assertEqual(self.names('zzz'), [])
+        self.assertEqual(self.names(' !'), [])
+
+    def test_migration_backfills_name_normalized(self):
+        ClientDetail.objects.update(name_normalized='')
+        backfill.backfill_name_normalized(apps, None)
+        self.assertEqual(ClientDetail.objects.get(name='Ácmé Holdings').name_normalized, 'acme holdings')
+        self.assertFalse(ClientDetail.objects.filter(name_normalized='').exists())
+
+    def test_endpoint(self):
+        response = APIClient().get('/api/client/search/', {'q': 'acme', 'limit': 'x'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['name'] for row in response.json()], ['Acme Corp', 'Ácmé Holdings', 'ACME Labs'])
+        self.assertEqual(set(response.json()[0]), {'id', 'name', 'email'})
+        self.assertEqual(len(APIClient().get('/api/client/search/', {'q': 'acme', 'limit': 1}).json()), 1)
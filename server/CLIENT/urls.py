@@ -2,7 +2,7 @@ from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
 
-from .views import ClientDetailViewset, ClientAddressViewset, ClientTeamViewset
+from .views import ClientDetailViewset, ClientAddressViewset, ClientTeamViewset, ClientSearchView, ClientProfileRenditionView
 
 router = DefaultRouter()
 router.register(r'details', ClientDetailViewset)
@@ -11,6 +11,9 @@ router.register(r'teams', ClientTeamViewset)
 
 urlpatterns = [
     path('', include(router.urls)),        
+    path('search/', ClientSearchView.as_view(), name='client-search'),
+    path('sync/details/', ClientDetailViewset.as_view({'get': 'sync'}), name='client-sync'),
+    path('renditions/profiles/<int:width>/<str:file_format>/<path:name>', ClientProfileRenditionView.as_view(), name='client-profile-rendition'),
 ]
 
 urlpatterns = urlpatterns
\ No newline at end of file
@@ -4,28 +4,47 @@ from django.shortcuts import render
 from django.shortcuts import render
 from rest_framework import generics
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from CORE.middleware import ViewTimingMixin, view_timing
+from CORE.renditions import RenditionView
+from CORE.sync import SyncMixin
 from .models import ClientDetail, ClientAddress, ClientTeam
-from .serializer import ClientDetailSerializer, ClientAddressSerializer, ClientTeamSerializer
+from .serializer import ClientDetailSerializer, ClientAddressSerializer, ClientTeamSerializer, ClientSearchSerializer
+from .search import search_clients
 from .pagination import GroupedResultsSetPagination, StandardResultsSetPagination
 
-class ClientAddressViewset(ModelViewSet):
+class ClientAddressViewset(ViewTimingMixin, ModelViewSet):
     queryset = ClientAddress.objects.all()
     serializer_class = ClientAddressSerializer
     
-class ClientDetailViewset(ModelViewSet):
-    queryset = ClientDetail.objects.select_related('address').all()
+class ClientDetailViewset(ViewTimingMixin, SyncMixin, ModelViewSet):
+    queryset = ClientDetail.objects.select_related('address').prefetch_related('teams').all()
     serializer_class = ClientDetailSerializer
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
-        queryset = ClientDetail.objects.select_related('address').all()
+        queryset = ClientDetail.objects.select_related('address').prefetch_related('teams').all()
         name = self.request.query_params.get('name')
         if name is not None:
             queryset = queryset.filter(name__icontains=name)
         return queryset
     
-class ClientTeamViewset(ModelViewSet):
+class ClientSearchView(generics.GenericAPIView):
+    serializer_class = ClientSearchSerializer
+    max_limit = 50
+    
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), self.max_limit)
+        except ValueError:
+            limit = 10
+        results = search_clients(request.query_params.get('q', ''), limit=max(limit, 1))
+        with view_timing():
+            data = self.get_serializer(results, many=True).data
+        return Response(data)
+    
+class ClientTeamViewset(ViewTimingMixin, ModelViewSet):
     queryset = ClientTeam.objects.select_related('client').all()
     serializer_class = ClientTeamSerializer
     pagination_class = StandardResultsSetPagination
@@ -35,4 +54,7 @@ class ClientTeamViewset(ModelViewSet):
         client_id = self.request.query_params.get('client_id')
         if client_id is not None:
             queryset = queryset.filter(client_id=client_id)
-        return queryset
\ No newline at end of file
+        return queryset    
+class ClientProfileRenditionView(RenditionView):
+    queryset = ClientDetail.objects.all()
+    image_field = 'profile'
@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'CORE'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+        from django.utils.module_loading import autodiscover_modules
+        from . import checks, signals  # noqa: F401
+        from .search import ensure_fts_triggers
+        post_migrate.connect(ensure_fts_triggers, sender=self)
+        # Registers the @job functions of every app.
+        autodiscover_modules('tasks')
@@ -0,0 +1,91 @@
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+from .models import User
+
+# Deactivations, role and team changes saved through the ORM delete the
+# snapshot at once; the timeout bounds staleness for queryset.update()
+# and for processes that don't share the cache.
+USER_SNAPSHOT_TIMEOUT = 60
+
+SNAPSHOT_FIELDS = ['id', 'email', 'first_name', 'last_name', 'is_staff', 'is_superuser', 'is_active', 'team_id', 'password']
+
+
+def user_snapshot_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_user_snapshot(user_id):
+    cache.delete(user_snapshot_key(user_id))
+
+
+def get_user_snapshot(user_id):
+    """The fields authentication needs, cached for USER_SNAPSHOT_TIMEOUT; None for unknown users."""
+    key = user_snapshot_key(user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = User.objects.filter(pk=user_id).values(*SNAPSHOT_FIELDS).first()
+        if snapshot is None:
+            return None
+        snapshot['password'] = get_md5_hash_password(snapshot['password'])
+        cache.set(key, snapshot, USER_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds the user's role and team to the tokens, for clients and other services."""
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        token['is_staff'] = user.is_staff
+        token['is_active'] = user.is_active
+        token['team_id'] = user.team_id
+        return token
+
+
+class CachedUser(TokenUser):
+    """
+    `request.user` built from the token and the cached snapshot instead of
+    a `User` row. Views needing the model instance load it by `pk`.
+    """
+    def __init__(self, token, snapshot):
+        super().__init__(token)
+        self.id = self.pk = snapshot['id']
+        self.username = self.email = snapshot['email']
+        self.first_name = snapshot['first_name']
+        self.last_name = snapshot['last_name']
+        # The snapshot wins over the claims, which may be a refresh token old.
+        self.is_staff = snapshot['is_staff']
+        self.is_superuser = snapshot['is_superuser']
+        self.is_active = snapshot['is_active']
+        self.team_id = snapshot['team_id']
+
+    def __str__(self):
+        return f'{self.first_name} {self.last_name}'
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the per-request user query: the user is
+    checked against a snapshot that is cached for USER_SNAPSHOT_TIMEOUT
+    and dropped whenever the user is saved or deleted.
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        snapshot = get_user_snapshot(user_id)
+        if snapshot is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not snapshot['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != snapshot['password']:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return CachedUser(validated_token, snapshot)
@@ -0,0 +1,123 @@
+import hashlib
+import threading
+import uuid
+from collections import OrderedDict
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework.renderers import JSONRenderer
+
+REFERENCE_CACHE_TIMEOUT = 60 * 60
+LOCAL_CACHE_SIZE = 512
+
+# Cache label of each lookup table, by model label.
+REFERENCE_TABLES = {
+    'CORE.compilancetype': 'compliance',
+    'CORE.assessmenttype': 'assessments',
+    'CORE.vulnerabilities': 'vulnerabilities',
+    'CORE.teamsmanagement': 'teams',
+}
+
+
+class LocalCache:
+    """Small thread-safe LRU in front of the shared Django cache."""
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+local_cache = LocalCache(LOCAL_CACHE_SIZE)
+
+
+def version_key(label):
+    return f'refdata:version:{label}'
+
+
+def table_version(label):
+    version = cache.get(version_key(label))
+    if version is None:
+        cache.add(version_key(label), uuid.uuid4().hex, None)
+        version = cache.get(version_key(label))
+    return version
+
+
+def invalidate(label):
+    """Give `label` a new version, orphaning every response cached for it."""
+    cache.set(version_key(label), uuid.uuid4().hex, None)
+
+
+def invalidate_model(model):
+    """
+    Invalidate the responses cached for `model` if it is a lookup table,
+    once the current transaction commits. Saves and deletes do this through
+    signals; call it after bulk_create, bulk_update and QuerySet.update(),
+    which send none.
+    """
+    label = REFERENCE_TABLES.get(model._meta.label_lower)
+    if label is not None:
+        # A request reading the old rows before the commit would otherwise
+        # cache them under the new version.
+        transaction.on_commit(lambda: invalidate(label))
+
+
+class CachedReferenceMixin:
+    """
+    Serves list and retrieve responses of rarely changing lookup tables
+    from a process-local LRU backed by the shared cache, and answers
+    `If-None-Match` revalidations with 304 without touching the database.
+
+    Entries are keyed by the version of every table in `cache_tables`,
+    which `invalidate()` replaces whenever one of their rows is written.
+    """
+    cache_tables = ()
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cached_response(self, render, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return render(request, *args, **kwargs)
+
+        versions = '-'.join(table_version(label) for label in self.cache_tables)
+        digest = hashlib.sha256(f'{versions}:{request.get_full_path()}'.encode()).hexdigest()[:32]
+        etag = f'"{digest}"'
+
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            key = f'refdata:response:{digest}'
+            content = local_cache.get(key)
+            if content is None:
+                content = cache.get(key)
+            if content is None:
+                response = render(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                content = JSONRenderer().render(response.data)
+                cache.set(key, content, REFERENCE_CACHE_TIMEOUT)
+            local_cache.set(key, content)
+            response = HttpResponse(content, content_type='application/json')
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
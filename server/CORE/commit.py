@@ -0,0 +1,21 @@
+from django.db import transaction
+
+
+def commit_batch(cls, key):
+    """
+    The `cls(key)` whose `run` method the current transaction calls when
+    it commits, created and registered on first use so that callers add
+    to one batch per transaction. Savepoints get their own batch, which
+    their rollback drops. None outside a transaction.
+    """
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        return None
+    savepoints = set(connection.savepoint_ids)
+    for sids, func, robust in connection.run_on_commit:
+        batch = getattr(func, '__self__', None)
+        if sids == savepoints and type(batch) is cls and batch.key == key:
+            return batch
+    batch = cls(key)
+    transaction.on_commit(batch.run, robust=True)
+    return batch
@@ -0,0 +1,133 @@
+import math
+import re
+from decimal import Decimal
+from .cache import invalidate_model
+
+CRITICAL = 'critical'
+HIGH = 'high'
+MEDIUM = 'medium'
+LOW = 'low'
+
+# Lower bound of each CVSS v3 qualitative severity band, highest first.
+SEVERITY_BANDS = [
+    (CRITICAL, 9.0),
+    (HIGH, 7.0),
+    (MEDIUM, 4.0),
+    (LOW, 0.1),
+]
+
+
+# Scores are stored as free text such as "7.3", "7.3 (High)" or a CVSS
+# vector, optionally preceded by its score.
+SCORE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+V3_VECTOR_RE = re.compile(r'CVSS:3\.[01]/([A-Za-z]+:[A-Za-z](?:/[A-Za-z]+:[A-Za-z])*)')
+
+# CVSS v3.x base metric weights, from the specification.
+V3_WEIGHTS = {
+    'AV': {'N': 0.85, 'A': 0.62, 'L': 0.55, 'P': 0.2},
+    'AC': {'L': 0.77, 'H': 0.44},
+    'UI': {'N': 0.85, 'R': 0.62},
+    'C': {'H': 0.56, 'L': 0.22, 'N': 0},
+    'I': {'H': 0.56, 'L': 0.22, 'N': 0},
+    'A': {'H': 0.56, 'L': 0.22, 'N': 0},
+}
+V3_PRIVILEGES = {'U': {'N': 0.85, 'L': 0.62, 'H': 0.27}, 'C': {'N': 0.85, 'L': 0.68, 'H': 0.5}}
+
+
+def parse_score(value):
+    if value is None:
+        return None
+    match = SCORE_RE.match(str(value))
+    if match is None:
+        return None
+    return float(match.group(1))
+
+
+def roundup(value):
+    """The CVSS v3.1 Roundup: smallest one-decimal number >= value, free of float noise."""
+    scaled = round(value * 100000)
+    if scaled % 10000 == 0:
+        return scaled / 100000
+    return (math.floor(scaled / 10000) + 1) / 10
+
+
+def parse_v3_vector(value):
+    """Base score of a CVSS v3.0/v3.1 vector in `value`, or None if there is no complete one."""
+    match = V3_VECTOR_RE.search(str(value or ''))
+    if match is None:
+        return None
+    metrics = dict(metric.upper().split(':') for metric in match.group(1).split('/'))
+    scope = metrics.get('S')
+    try:
+        weights = {name: V3_WEIGHTS[name][metrics[name]] for name in V3_WEIGHTS}
+        privileges = V3_PRIVILEGES[scope][metrics['PR']]
+    except KeyError:
+        return None
+
+    impact_subscore = 1 - (1 - weights['C']) * (1 - weights['I']) * (1 - weights['A'])
+    if scope == 'U':
+        impact = 6.42 * impact_subscore
+    else:
+        impact = 7.52 * (impact_subscore - 0.029) - 3.25 * (impact_subscore - 0.02) ** 15
+    exploitability = 8.22 * weights['AV'] * weights['AC'] * privileges * weights['UI']
+    if impact <= 0:
+        return 0.0
+    if scope == 'U':
+        return roundup(min(impact + exploitability, 10))
+    return roundup(min(1.08 * (impact + exploitability), 10))
+
+
+def base_score(value):
+    """
+    Numeric base score of a stored score: its leading number, else the
+    score computed from a v3.x vector. CVSS v4 vectors are only read
+    through the score written before them, as computing one takes the
+    specification's macrovector tables.
+    """
+    score = parse_score(value)
+    if score is None:
+        score = parse_v3_vector(value)
+    if score is None or score > 10:
+        return None
+    return score
+
+
+def severity_band(score):
+    if score is None:
+        return None
+    for severity, lower in SEVERITY_BANDS:
+        if score >= lower:
+            return severity
+    return None
+
+
+def severity_of(value):
+    return severity_band(base_score(value))
+
+
+def score_columns(value):
+    """
+    Values of the `cvss_base_score` and `severity` columns kept next to a
+    free-text score. Scores that can't be read get 0.0 and no severity,
+    the same band as a 0.0 score, so the columns stay sortable.
+    """
+    score = base_score(value)
+    return {
+        'cvss_base_score': Decimal(f'{score or 0:.1f}'),
+        'severity': severity_band(score) or '',
+    }
+
+
+def backfill_score_columns(model, source, batch_size=1000):
+    """Fill the score columns of every `model` row from its `source` field, `batch_size` rows at a time."""
+    last = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last).order_by('pk').only('pk', source)[:batch_size])
+        if not batch:
+            invalidate_model(model)
+            return
+        for instance in batch:
+            for name, value in score_columns(getattr(instance, source)).items():
+                setattr(instance, name, value)
+        model.objects.bulk_update(batch, ['cvss_base_score', 'severity'])
+        last = batch[-1].pk
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import threading
+import uuid
+from datetime import timedelta
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from .authentication import CachedJWTAuthentication
+from .commit import commit_batch
+from .models import ChangeEvent
+
+# Identifies this process's events in the shared log, which other
+# processes relay to their own subscribers.
+PROCESS_ID = uuid.uuid4().hex
+# Events buffered per subscriber; a client that falls further behind is told to resync.
+SUBSCRIBER_QUEUE_SIZE = 256
+# Expired rows are deleted by every this many-th send.
+PRUNE_EVERY = 100
+# Events relayed per poll at most; the rest wait for the next one.
+POLL_BATCH_SIZE = 1000
+
+
+def latest_event_id():
+    return ChangeEvent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def events_after(last):
+    return list(ChangeEvent.objects.filter(pk__gt=last).order_by('pk').values_list('pk', 'events', 'origin')[:POLL_BATCH_SIZE])
+
+
+class ChangeBus:
+    """
+    Fans change events out to the streams open in this process. Events
+    are also appended to the ChangeEvent table, a row per transaction,
+    which one poller per event loop reads to relay the events published
+    by other processes, so idle streams cost a queue each and share one
+    query per interval.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = set()
+        self.pollers = {}
+
+    def subscribe(self):
+        loop = asyncio.get_running_loop()
+        subscriber = (loop, asyncio.Queue(SUBSCRIBER_QUEUE_SIZE))
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if loop not in self.pollers:
+                self.pollers[loop] = loop.create_task(self.poll(loop))
+        return subscriber[1]
+
+    def unsubscribe(self, queue):
+        with self.lock:
+            self.subscribers = {subscriber for subscriber in self.subscribers if subscriber[1] is not queue}
+
+    def deliver(self, event):
+        """Hand `event` to every local subscriber; safe to call from any thread."""
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self.put, queue, event)
+            except RuntimeError:
+                # The loop was closed under an open stream.
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def put(queue, event):
+        if queue.full():
+            # Dropped events are replaced by a single marker.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait({'type': 'resync'})
+        else:
+            queue.put_nowait(event)
+
+    async def poll(self, loop):
+        interval = getattr(settings, 'CHANGE_POLL_INTERVAL', 1.0)
+        try:
+            last = await sync_to_async(latest_event_id)()
+            while True:
+                await asyncio.sleep(interval)
+                with self.lock:
+                    if not any(subscriber[0] is loop for subscriber in self.subscribers):
+                        return
+                for pk, events, origin in await sync_to_async(events_after)(last):
+                    if origin != PROCESS_ID:
+                        for event in events:
+                            self.deliver(event)
+                    last = pk
+        finally:
+            with self.lock:
+                self.pollers.pop(loop, None)
+
+
+bus = ChangeBus()
+
+
+class EventBatch:
+    """The events published in a transaction, sent together when it commits."""
+    def __init__(self, key):
+        self.key, self.events = key, []
+
+    def run(self):
+        send(*self.events)
+
+
+def publish(event):
+    """
+    Send a change event to the open streams once the current transaction
+    commits. `tester_id` decides who may see it; staff see everything.
+    """
+    batch = commit_batch(EventBatch, None)
+    if batch is not None:
+        batch.events.append(event)
+    else:
+        # Robust, like batches: the change is already committed, so failing
+        # to announce it must not fail the request.
+        transaction.on_commit(lambda: send(event), robust=True)
+
+
+def send(*events):
+    for event in events:
+        bus.deliver(event)
+    entry = ChangeEvent.objects.create(events=list(events), origin=PROCESS_ID)
+    if entry.pk % PRUNE_EVERY == 0:
+        expired = timezone.now() - timedelta(seconds=getattr(settings, 'CHANGE_LOG_TIMEOUT', 60))
+        ChangeEvent.objects.filter(created_at__lt=expired).delete()
+
+
+def visible_to(user, event):
+    if user.is_staff or event['type'] == 'resync':
+        return True
+    return user.pk in (event.get('tester_id'), event.get('previous_tester_id'))
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+
+def authenticate(request):
+    """The user of the bearer token in the Authorization header or, for EventSource, the `token` parameter."""
+    authentication = CachedJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else request.GET.get('token')
+    if not raw_token:
+        return None
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def stream_changes(user):
+    # Subscribed here rather than in the view, so the queue belongs to the
+    # event loop that sends the response.
+    queue = bus.subscribe()
+    heartbeat = getattr(settings, 'CHANGE_HEARTBEAT_INTERVAL', 15)
+    try:
+        yield 'retry: 5000\nevent: ready\ndata: {}\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), heartbeat)
+            except asyncio.TimeoutError:
+                # Also how a closed connection is noticed.
+                yield ': keepalive\n\n'
+                continue
+            if visible_to(user, event):
+                yield format_event(event)
+    finally:
+        bus.unsubscribe(queue)
+
+
+class ChangeStreamView(View):
+    """
+    Server-sent events for changes to the requesting tester's URLs and
+    their findings and POCs, or to all of them for staff. Events carry
+    ids only; a `resync` event means some were dropped and lists should
+    be refetched, as they should after reconnecting.
+    """
+    async def get(self, request, *args, **kwargs):
+        user = await sync_to_async(authenticate)(request)
+        if user is None:
+            return JsonResponse({"error": "Authentication credentials were not provided or are invalid"}, status=401)
+        response = StreamingHttpResponse(stream_changes(user), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stops nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
@@ -0,0 +1,147 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+
+
+def parse_paths(value):
+    """
+    Turn `id,url.url,url.tester.email` into the tree
+    `{'id': {}, 'url': {'url': {}, 'tester': {'email': {}}}}`.
+    """
+    tree = {}
+    for path in (value or '').split(','):
+        node = tree
+        for name in path.strip().split('.'):
+            if name:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def nested_serializer(field):
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.BaseSerializer):
+        return field
+    return None
+
+
+def shape_serializer(serializer, fields=None, expand=None):
+    """
+    Prune `serializer` in place to the `fields` tree. When an `expand`
+    tree is given, nested serializers outside it collapse to primary keys.
+    """
+    serializer = nested_serializer(serializer)
+    if not isinstance(serializer, serializers.Serializer):
+        return
+
+    if fields:
+        for name in list(serializer.fields):
+            if name not in fields:
+                serializer.fields.pop(name)
+
+    for name, field in list(serializer.fields.items()):
+        nested = nested_serializer(field)
+        if nested is None:
+            continue
+        subfields = fields.get(name) if fields else None
+        if expand is not None and name not in expand and not subfields:
+            source = field.source if field.source != name else None
+            many = isinstance(field, serializers.ListSerializer)
+            serializer.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True, many=many, source=source)
+            continue
+        shape_serializer(nested, subfields, None if expand is None else expand.get(name, {}))
+
+
+def collect_relations(serializer, model, prefix='', paths=None):
+    """
+    The relation paths, from `model`, that `serializer` reads. Each path
+    maps to whether it crosses a to-many relation.
+    """
+    paths = {} if paths is None else paths
+    serializer = nested_serializer(serializer)
+    if not isinstance(serializer, serializers.Serializer):
+        return paths
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        nested = nested_serializer(field)
+        if field.source == '*':
+            if nested is not None:
+                collect_relations(nested, model, prefix, paths)
+            continue
+
+        current, path, many = model, prefix, paths.get(prefix, False)
+        for part in field.source.split('.'):
+            try:
+                model_field = current._meta.get_field(part)
+            except FieldDoesNotExist:
+                break
+            if not model_field.is_relation:
+                break
+            if isinstance(field, RelatedField) and not isinstance(field, ManyRelatedField) and path == prefix:
+                # A primary key field reads the local `<name>_id` column.
+                break
+            path = f'{path}__{part}' if path else part
+            many = many or model_field.one_to_many or model_field.many_to_many
+            paths[path] = many
+            current = model_field.related_model
+        else:
+            if nested is not None:
+                collect_relations(nested, current, path, paths)
+    return paths
+
+
+def optimize_queryset(queryset, serializer, related_querysets=None):
+    """
+    Add the select_related/prefetch_related calls `serializer` needs.
+    Relations listed in `related_querysets` are prefetched from the given
+    querysets (e.g. annotated ones), with their own nested relations.
+    """
+    related_querysets = related_querysets or {}
+    paths = collect_relations(serializer, queryset.model)
+
+    prefetches = {}
+    for root, factory in related_querysets.items():
+        nested = {path[len(root) + 2:]: many for path, many in paths.items() if path.startswith(f'{root}__')}
+        if root not in paths:
+            continue
+        related = factory()
+        related = related.select_related(*[path for path, many in nested.items() if not many])
+        related = related.prefetch_related(*[path for path, many in nested.items() if many])
+        prefetches[root] = Prefetch(root, queryset=related)
+        paths = {path: many for path, many in paths.items() if path != root and not path.startswith(f'{root}__')}
+
+    selected = [path for path, many in paths.items() if not many]
+    prefetched = [path for path, many in paths.items() if many]
+    if selected:
+        queryset = queryset.select_related(*selected)
+    return queryset.prefetch_related(*prefetched, *prefetches.values())
+
+
+class ShapedQuerysetMixin:
+    """
+    `?fields=` and `?expand=` for a view: GET responses are pruned to the
+    requested shape and the queryset loads exactly the relations it needs.
+    """
+    related_querysets = {}
+
+    def get_shape(self):
+        params = self.request.query_params
+        fields = parse_paths(params.get('fields'))
+        expand = parse_paths(params.get('expand')) if 'expand' in params else None
+        return fields, expand
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.request is not None and self.request.method == 'GET':
+            shape_serializer(serializer, *self.get_shape())
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return optimize_queryset(queryset, self.get_serializer(), self.get_related_querysets())
+
+    def get_related_querysets(self):
+        return self.related_querysets
@@ -0,0 +1,156 @@
+import logging
+import os
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Functions run by the workers, by job name. Apps register theirs with
+# @job in their tasks module, which CORE.apps imports at startup.
+registry = {}
+
+current_job = ContextVar('current_job', default=None)
+
+
+class JobFailed(Exception):
+    """Raised by a job to fail without retrying, e.g. for invalid input."""
+
+
+def job(name, max_attempts=3):
+    def register(func):
+        registry[name] = (func, max_attempts)
+        return func
+    return register
+
+
+def lease():
+    return timedelta(seconds=getattr(settings, 'JOB_LEASE_SECONDS', 300))
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=getattr(settings, 'JOB_RETRY_DELAY', 10) * 2 ** (attempts - 1))
+
+
+def enqueue(name, payload=None, user=None, delay=None):
+    """
+    Queue `name` to run with `payload` as keyword arguments. The row is
+    written in the caller's transaction, so workers see it once that
+    commits. With JOB_RUN_INLINE, jobs without a delay are run by this
+    process instead, as soon as the transaction commits.
+    """
+    if name not in registry:
+        raise LookupError(f"No job named {name!r}")
+    entry = Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=registry[name][1],
+        created_by_id=getattr(user, 'pk', None),
+        run_after=timezone.now() + (delay or timedelta()),
+    )
+    if getattr(settings, 'JOB_RUN_INLINE', False) and not delay:
+        transaction.on_commit(lambda: run_inline(entry))
+    return entry
+
+
+def stash_upload(upload):
+    """Save an uploaded file for a job to read; the job deletes it when done."""
+    return default_storage.save(f'jobs/{uuid.uuid4().hex}/{os.path.basename(upload.name or "upload")}', upload)
+
+
+def retries_left():
+    """Whether the running job is retried if this attempt fails; False outside a job."""
+    running = current_job.get()
+    return running is not None and running.attempts < running.max_attempts
+
+
+def report_progress(progress, total=None, message=None):
+    """Record the running job's progress and renew its lease; a no-op outside a job."""
+    running = current_job.get()
+    if running is None:
+        return
+    changes = {'progress': progress, 'locked_until': timezone.now() + lease()}
+    if total is not None:
+        changes['total'] = total
+    if message is not None:
+        changes['message'] = message[:255]
+    Job.objects.filter(pk=running.pk, status=Job.RUNNING, attempts=running.attempts).update(**changes)
+    for field, value in changes.items():
+        setattr(running, field, value)
+
+
+def claim_job():
+    """
+    Take the next due job, or one whose worker's lease ran out. Claims are
+    conditional updates, so concurrent workers never run the same job.
+    """
+    now = timezone.now()
+    candidates = [
+        Job.objects.filter(status=Job.QUEUED, run_after__lte=now).order_by('run_after', 'id'),
+        Job.objects.filter(status=Job.RUNNING, locked_until__lt=now).order_by('locked_until', 'id'),
+    ]
+    for queryset in candidates:
+        for pk, status, locked_until in queryset.values_list('pk', 'status', 'locked_until')[:10]:
+            claimed = Job.objects.filter(pk=pk, status=status, locked_until=locked_until).update(
+                status=Job.RUNNING, attempts=F('attempts') + 1, started_at=now, locked_until=now + lease(),
+            )
+            if claimed:
+                return Job.objects.get(pk=pk)
+    return None
+
+
+def run_job(entry):
+    func, _ = registry.get(entry.name, (None, None))
+    token = current_job.set(entry)
+    # Outcomes only apply while this attempt still holds the job.
+    attempt = Job.objects.filter(pk=entry.pk, status=Job.RUNNING, attempts=entry.attempts)
+    try:
+        if func is None:
+            raise JobFailed(f"No job named {entry.name!r}")
+        if entry.attempts > entry.max_attempts:
+            raise JobFailed("The worker running this job stopped")
+        result = func(**entry.payload)
+    except Exception as e:
+        retry = not isinstance(e, JobFailed) and entry.attempts < entry.max_attempts
+        if retry:
+            logger.warning("Job %s failed on attempt %s, retrying", entry, entry.attempts, exc_info=True)
+        elif isinstance(e, JobFailed):
+            logger.info("Job %s failed: %s", entry, e)
+        else:
+            logger.exception("Job %s failed", entry)
+        attempt.update(
+            status=Job.QUEUED if retry else Job.FAILED,
+            run_after=timezone.now() + retry_delay(entry.attempts) if retry else entry.run_after,
+            finished_at=None if retry else timezone.now(),
+            locked_until=None,
+            error=str(e) if isinstance(e, JobFailed) else traceback.format_exc(),
+        )
+    else:
+        attempt.update(status=Job.SUCCEEDED, result=result, finished_at=timezone.now(), locked_until=None, error='')
+    finally:
+        current_job.reset(token)
+
+
+def run_inline(entry):
+    """Run the queued job `entry` in this process, retrying at once, and refresh it."""
+    while Job.objects.filter(pk=entry.pk, status=Job.QUEUED).update(
+        status=Job.RUNNING, attempts=F('attempts') + 1, started_at=timezone.now(), locked_until=timezone.now() + lease(),
+    ):
+        run_job(Job.objects.get(pk=entry.pk))
+    entry.refresh_from_db()
+
+
+def run_pending():
+    """Run due jobs in this process until none are left; returns how many ran."""
+    count = 0
+    while (claimed := claim_job()) is not None:
+        run_job(claimed)
+        count += 1
+    return count
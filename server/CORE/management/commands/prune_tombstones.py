@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from CORE.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the tombstones of rows deleted more than SYNC_TOMBSTONE_DAYS ago. "
+        "Sync tokens that old are refused, so their clients sync from scratch."
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Deleted {prune_tombstones()} tombstones.")
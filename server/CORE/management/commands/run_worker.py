@@ -0,0 +1,87 @@
+import multiprocessing
+import signal
+import threading
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from CORE.jobs import claim_job, run_job
+
+
+def work(stop, poll_interval, burst, child=False):
+    """Claim and run jobs until `stop` is set, or the queue is empty in burst mode."""
+    if child:
+        # The parent sets `stop` on SIGINT/SIGTERM; the job in hand is finished first.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # Connections are never shared with the parent process.
+    connections.close_all()
+    try:
+        while not stop.is_set():
+            claimed = claim_job()
+            if claimed is None:
+                if burst:
+                    return
+                time.sleep(poll_interval)
+                continue
+            run_job(claimed)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs in a pool of worker processes. Jobs are "
+        "retried with backoff, and those of workers that died are picked up again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=getattr(settings, 'JOB_WORKER_PROCESSES', 2),
+            help="Worker processes; 1 runs jobs in this process.",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty.")
+        parser.add_argument('--burst', action='store_true', help="Exit once the queue is empty.")
+
+    def handle(self, *args, **options):
+        processes = max(options['processes'], 1)
+        if processes == 1:
+            stop = threading.Event()
+            self.on_signal(lambda: stop.set())
+            work(stop, options['poll_interval'], options['burst'])
+            return
+
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        # Handlers only flag the request: setting a multiprocessing Event
+        # from a signal handler can deadlock on its lock.
+        stopping = threading.Event()
+        self.on_signal(lambda: stopping.set())
+        connections.close_all()
+        self.stdout.write(f"Starting {processes} workers.")
+        pool = [self.start_worker(context, index, stop, options) for index in range(processes)]
+        while any(pool):
+            time.sleep(options['poll_interval'])
+            if stopping.is_set():
+                stop.set()
+            for index, process in enumerate(pool):
+                if process is None or process.is_alive():
+                    continue
+                process.join()
+                if options['burst'] or stop.is_set():
+                    pool[index] = None
+                else:
+                    self.stderr.write(f"Worker {index} exited with {process.exitcode}, restarting.")
+                    pool[index] = self.start_worker(context, index, stop, options)
+        self.stdout.write("Workers stopped.")
+
+    def on_signal(self, callback):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: callback())
+
+    def start_worker(self, context, index, stop, options):
+        process = context.Process(
+            target=work, args=(stop, options['poll_interval'], options['burst'], True), name=f'job-worker-{index}',
+        )
+        process.start()
+        return process
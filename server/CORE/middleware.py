@@ -0,0 +1,134 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Collapses IN (%s, %s, ...) lists so queries differing only in their
+# number of parameters count as the same shape.
+PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+
+current_recorder = ContextVar('current_recorder', default=None)
+
+
+def query_shape(sql):
+    return PLACEHOLDER_LIST_RE.sub('%s', sql)
+
+
+class RequestRecorder:
+    """SQL and view timings of one request."""
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.view_time = 0.0
+        self.view_depth = 0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[query_shape(sql)] += 1
+
+    def repeated(self, threshold):
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+@contextmanager
+def view_timing():
+    """
+    Adds the time spent inside the block, less the SQL run in it, to the
+    request's view time.
+    """
+    recorder = current_recorder.get()
+    if recorder is None or recorder.view_depth:
+        yield
+        return
+    recorder.view_depth += 1
+    start, sql_start = time.perf_counter(), recorder.sql_time
+    try:
+        yield
+    finally:
+        recorder.view_time += time.perf_counter() - start - (recorder.sql_time - sql_start)
+        recorder.view_depth -= 1
+
+
+class ViewTimingMixin:
+    """
+    Counts the list and retrieve actions of a view, queryset building,
+    pagination and serialization, as view time in
+    QueryInstrumentationMiddleware. List it first among the view's bases
+    so that it wraps the other mixins.
+    """
+    def list(self, request, *args, **kwargs):
+        with view_timing():
+            return super().list(request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        with view_timing():
+            return super().retrieve(request, *args, **kwargs)
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the number of SQL queries, the time spent in SQL and in views
+    outside SQL for each request. View time is what views mark with
+    ViewTimingMixin or `view_timing()`. The totals go out as one JSON log
+    line, at DEBUG level, and as a Server-Timing header for staff or when
+    DEBUG is on. Query shapes repeated at least N_PLUS_ONE_THRESHOLD
+    times, usually lazy loads in a loop, are flagged in both and logged
+    as a warning.
+
+    Work done while a streaming response is being sent isn't counted.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = RequestRecorder()
+        token = current_recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(recorder))
+                response = self.get_response(request)
+        finally:
+            current_recorder.reset(token)
+        total = time.perf_counter() - start
+
+        repeated = recorder.repeated(getattr(settings, 'N_PLUS_ONE_THRESHOLD', 10))
+        timings = [
+            f'db;dur={recorder.sql_time * 1000:.1f};desc="{recorder.queries} queries"',
+            f'view;dur={recorder.view_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ]
+        if repeated:
+            timings.append(f'nplusone;desc="{len(repeated)} repeated query shapes"')
+        # Timings and query counts are for developers, not every client.
+        if settings.DEBUG or getattr(getattr(request, 'user', None), 'is_staff', False):
+            response['Server-Timing'] = ', '.join(timings)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(total * 1000, 1),
+            'queries': recorder.queries,
+            'sql_ms': round(recorder.sql_time * 1000, 1),
+            'view_ms': round(recorder.view_time * 1000, 1),
+            'repeated_queries': [{'sql': shape[:500], 'count': count} for shape, count in repeated],
+        }
+        level = logging.WARNING if repeated else logging.DEBUG
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps(record))
+        return response
@@ -0,0 +1,49 @@
+from django.db import migrations
+
+FTS_TABLE = 'CORE_vulnerabilities_fts'
+TABLE = 'CORE_vulnerabilities'
+COLUMNS = 'name, description, impact'
+NEW_VALUES = 'new.name, new.description, new.impact'
+OLD_VALUES = 'old.name, old.description, old.impact'
+
+
+def create_fts_index(apps, schema_editor):
+    # FTS5 is SQLite only; other backends search without this table.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not cursor.fetchone()[0]:
+            return
+    statements = [
+        f"CREATE VIRTUAL TABLE \"{FTS_TABLE}\" USING fts5({COLUMNS}, content='{TABLE}', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER \"{FTS_TABLE}_ai\" AFTER INSERT ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END",
+        f"CREATE TRIGGER \"{FTS_TABLE}_ad\" AFTER DELETE ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\", rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); END",
+        f"CREATE TRIGGER \"{FTS_TABLE}_au\" AFTER UPDATE ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\", rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); "
+        f"INSERT INTO \"{FTS_TABLE}\"(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END",
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\") VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for trigger in ('ai', 'ad', 'au'):
+        schema_editor.execute(f"DROP TRIGGER IF EXISTS \"{FTS_TABLE}_{trigger}\"")
+    schema_editor.execute(f"DROP TABLE IF EXISTS \"{FTS_TABLE}\"")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CORE', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:54
+
+import math
+import re
+from decimal import Decimal
+from django.db import migrations, models
+
+# What CORE.cvss computed when this migration was written. Migrations keep
+# their own copy so that later changes to the live code can't change or
+# break them.
+SEVERITY_BANDS = [('critical', 9.0), ('high', 7.0), ('medium', 4.0), ('low', 0.1)]
+SCORE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+V3_VECTOR_RE = re.compile(r'CVSS:3\.[01]/([A-Za-z]+:[A-Za-z](?:/[A-Za-z]+:[A-Za-z])*)')
+V3_WEIGHTS = {
+    'AV': {'N': 0.85, 'A': 0.62, 'L': 0.55, 'P': 0.2},
+    'AC': {'L': 0.77, 'H': 0.44},
+    'UI': {'N': 0.85, 'R': 0.62},
+    'C': {'H': 0.56, 'L': 0.22, 'N': 0},
+    'I': {'H': 0.56, 'L': 0.22, 'N': 0},
+    'A': {'H': 0.56, 'L': 0.22, 'N': 0},
+}
+V3_PRIVILEGES = {'U': {'N': 0.85, 'L': 0.62, 'H': 0.27}, 'C': {'N': 0.85, 'L': 0.68, 'H': 0.5}}
+
+
+def roundup(value):
+    scaled = round(value * 100000)
+    if scaled % 10000 == 0:
+        return scaled / 100000
+    return (math.floor(scaled / 10000) + 1) / 10
+
+
+def parse_v3_vector(value):
+    match = V3_VECTOR_RE.search(str(value or ''))
+    if match is None:
+        return None
+    metrics = dict(metric.upper().split(':') for metric in match.group(1).split('/'))
+    scope = metrics.get('S')
+    try:
+        weights = {name: V3_WEIGHTS[name][metrics[name]] for name in V3_WEIGHTS}
+        privileges = V3_PRIVILEGES[scope][metrics['PR']]
+    except KeyError:
+        return None
+
+    impact_subscore = 1 - (1 - weights['C']) * (1 - weights['I']) * (1 - weights['A'])
+    if scope == 'U':
+        impact = 6.42 * impact_subscore
+    else:
+        impact = 7.52 * (impact_subscore - 0.029) - 3.25 * (impact_subscore - 0.02) ** 15
+    exploitability = 8.22 * weights['AV'] * weights['AC'] * privileges * weights['UI']
+    if impact <= 0:
+        return 0.0
+    if scope == 'U':
+        return roundup(min(impact + exploitability, 10))
+    return roundup(min(1.08 * (impact + exploitability), 10))
+
+
+def score_columns(value):
+    match = SCORE_RE.match(str(value)) if value is not None else None
+    score = float(match.group(1)) if match is not None else parse_v3_vector(value)
+    if score is not None and score > 10:
+        score = None
+    severity = next((band for band, lower in SEVERITY_BANDS if score is not None and score >= lower), '')
+    return {'cvss_base_score': Decimal(f'{score or 0:.1f}'), 'severity': severity}
+
+
+def backfill_score_columns(model, source, batch_size=1000):
+    last = 0
+    while True:
+        batch = list(model.objects.filter(pk__gt=last).order_by('pk').only('pk', source)[:batch_size])
+        if not batch:
+            return
+        for instance in batch:
+            for name, value in score_columns(getattr(instance, source)).items():
+                setattr(instance, name, value)
+        model.objects.bulk_update(batch, ['cvss_base_score', 'severity'])
+        last = batch[-1].pk
+
+
+def backfill(apps, schema_editor):
+    backfill_score_columns(apps.get_model('CORE', 'Vulnerabilities'), 'cvss')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CORE', '0002_vulnerabilities_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vulnerabilities',
+            name='cvss_base_score',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='vulnerabilities',
+            name='severity',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='vulnerabilities',
+            index=models.Index(fields=['severity', '-cvss_base_score'], name='vulnerability_severity_idx'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+from django.db import migrations
+
+FTS_TABLE = 'CORE_vulnerabilities_fts'
+TABLE = 'CORE_vulnerabilities'
+COLUMNS = 'name, description, impact'
+NEW_VALUES = 'new.name, new.description, new.impact'
+OLD_VALUES = 'old.name, old.description, old.impact'
+
+
+def restore_triggers(apps, schema_editor):
+    # SQLite rebuilds a table to add a column, dropping its triggers; the
+    # score columns of 0003 did that to the ones keeping the index current.
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    if FTS_TABLE not in schema_editor.connection.introspection.table_names():
+        return
+    statements = [
+        f"DROP TRIGGER IF EXISTS \"{FTS_TABLE}_ai\"",
+        f"DROP TRIGGER IF EXISTS \"{FTS_TABLE}_ad\"",
+        f"DROP TRIGGER IF EXISTS \"{FTS_TABLE}_au\"",
+        f"CREATE TRIGGER \"{FTS_TABLE}_ai\" AFTER INSERT ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END",
+        f"CREATE TRIGGER \"{FTS_TABLE}_ad\" AFTER DELETE ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\", rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); END",
+        f"CREATE TRIGGER \"{FTS_TABLE}_au\" AFTER UPDATE ON \"{TABLE}\" BEGIN "
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\", rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); "
+        f"INSERT INTO \"{FTS_TABLE}\"(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END",
+        # Rows written while the triggers were missing.
+        f"INSERT INTO \"{FTS_TABLE}\"(\"{FTS_TABLE}\") VALUES ('rebuild')",
+    ]
+    for statement in statements:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CORE', '0005_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations
+
+
+def drop_events(apps, schema_editor):
+    # Rows only relay events for CHANGE_LOG_TIMEOUT seconds; the ones
+    # written as single events are dropped rather than converted.
+    apps.get_model('CORE', 'ChangeEvent').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CORE', '0007_changeevent'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_events, migrations.RunPython.noop),
+        migrations.RenameField(
+            model_name='changeevent',
+            old_name='event',
+            new_name='events',
+        ),
+    ]
@@ -2,6 +2,7 @@ from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.models import AbstractUser, AbstractBaseUser, PermissionsMixin
 from django.utils import timezone
+from .cvss import score_columns
 from .manager import UserManager
 
 class CompilanceType(models.Model):
@@ -23,10 +24,24 @@ class Vulnerabilities(models.Model):
     impact = models.TextField()
     reference=models.URLField()
     cvss=models.CharField(max_length=200, null=True, blank=True)
+    # Parsed from cvss on save.
+    cvss_base_score = models.DecimalField(max_digits=3, decimal_places=1, default=0)
+    severity = models.CharField(max_length=10, blank=True, default='')
     category_of_testing = models.ForeignKey(AssessmentType, on_delete=models.DO_NOTHING, related_name="vulnerabilities")
     
     class Meta:
         db_table_comment = "Vulnerabilities list"
+        indexes = [
+            models.Index(fields=['severity', '-cvss_base_score'], name='vulnerability_severity_idx'),
+        ]
+        
+    def save(self, *args, **kwargs):
+        for name, value in score_columns(self.cvss).items():
+            setattr(self, name, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cvss' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cvss_base_score', 'severity'}
+        super().save(*args, **kwargs)
         
     def __str__(self):
         return f"{self.name} - {self.category_of_testing.name}"
@@ -73,3 +88,72 @@ class User(AbstractBaseUser, PermissionsMixin):
     class Meta:
         db_table_comment = "Employee in your company"
         
+
+
+# Background work run by `manage.py run_worker` (CORE.jobs).
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    progress = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    message = models.CharField(max_length=255, blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, default='')
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    run_after = models.DateTimeField(default=timezone.now)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # A running job whose lease has passed is presumed lost with its worker.
+    locked_until = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+            models.Index(fields=['status', 'locked_until'], name='job_lease_idx'),
+            models.Index(fields=['created_by', '-id'], name='job_owner_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class Tombstone(models.Model):
+    # Deleted rows of the collections clients sync with CORE.sync, kept
+    # until SYNC_TOMBSTONE_DAYS have passed.
+    model = models.CharField(max_length=100)
+    object_id = models.PositiveBigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'deleted_at', 'id'], name='tombstone_sync_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.model} #{self.object_id}"
+
+
+class ChangeEvent(models.Model):
+    # Recent change events (CORE.events), a row per transaction, read by
+    # the streams of other processes and kept for CHANGE_LOG_TIMEOUT seconds.
+    events = models.JSONField()
+    origin = models.CharField(max_length=32)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+    
+    def __str__(self):
+        return f"{len(self.events)} change events #{self.pk}"
@@ -1,17 +1,216 @@
-from rest_framework.pagination import PageNumberPagination
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
-class GroupedResultsSetPagination(PageNumberPagination):
+def is_model_field(meta, name):
+    if name == 'pk':
+        return True
+    try:
+        meta.get_field(name)
+    except FieldDoesNotExist:
+        return False
+    return True
+
+
+def get_ordering(queryset):
+    """
+    The ordering of `queryset` as a tuple of field names, always ending
+    on the primary key so that every row has a distinct position.
+    Annotations and related lookups can't be seeked on and are dropped.
+    """
+    meta = queryset.model._meta
+    ordering = queryset.query.order_by or meta.ordering
+    ordering = [field for field in ordering if isinstance(field, str) and is_model_field(meta, field.lstrip('-'))]
+    pk_name = meta.pk.name
+    if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+        ordering.append(pk_name)
+    return tuple(ordering)
+
+
+def unsupported_ordering(queryset):
+    """
+    Terms of the queryset's ordering that keyset pagination can't seek on,
+    such as the rank of a search or any other annotation.
+    """
+    meta = queryset.model._meta
+    ordering = [*queryset.query.extra_order_by, *(queryset.query.order_by or meta.ordering)]
+    return [
+        str(field) for field in ordering
+        if not (isinstance(field, str) and is_model_field(meta, field.lstrip('-')))
+    ]
+
+
+def keyset_filter(ordering, position, reverse=False):
+    """
+    Q object matching the rows that sort strictly after `position` (or
+    before it if `reverse`) under `ordering`.
+    """
+    query = Q()
+    equal = Q()
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        lookup = 'lt' if descending else 'gt'
+        query |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return query
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination over the queryset's ordering, such as `id`
+    or `-cvss_base_score, id`. Pages are addressed by an opaque cursor holding
+    the ordering values of the row at the page boundary, so neither a
+    COUNT nor an OFFSET is issued and deep pages cost the same as the first.
+    Ordering fields must be non-null columns of the model itself; other
+    orderings, like search results ranked by relevance, are refused rather
+    than silently reordered. Cursors expire after `cursor_max_age` seconds.
+    """
+    cursor_query_param = 'cursor'
+    cursor_salt = 'keyset-pagination'
+    page_size = 10
+    cursor_max_age = 60 * 60 * 24
+    invalid_cursor_message = _('Invalid cursor')
+    unsupported_ordering_message = _('This list can only be paged by page number.')
+
+    def __init__(self, page_size=None):
+        if page_size is not None:
+            self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        if unsupported_ordering(queryset):
+            raise ValidationError({"error": self.unsupported_ordering_message})
+        self.ordering = get_ordering(queryset)
+        self.meta = queryset.model._meta
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(self.ordering, position, reverse))
+        if reverse:
+            queryset = queryset.order_by(*reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page = results
+        if reverse:
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return results
+
+    def get_position(self, instance):
+        # `instance` may also be a named values_list() row.
+        meta = self.meta
+        position = []
+        for field in self.ordering:
+            name = field.lstrip('-')
+            model_field = meta.pk if name == 'pk' else meta.get_field(name)
+            value = getattr(instance, model_field.attname)
+            position.append(None if value is None else model_field.value_to_string(instance))
+        return position
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = signing.loads(encoded, salt=self.cursor_salt, max_age=self.cursor_max_age)
+            position, reverse = data['p'], bool(data['r'])
+        except (signing.BadSignature, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if len(position) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        encoded = signing.dumps({'p': position, 'r': reverse}, salt=self.cursor_salt, compress=True)
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class KeysetOptInMixin:
+    """
+    Lets clients of a page-number paginator switch to keyset pagination
+    with `?pagination=keyset`; the returned cursors keep them on it.
+    """
+    keyset_query_param = 'pagination'
+    keyset_query_value = 'keyset'
+
+    def use_keyset(self, request):
+        return (
+            request.query_params.get(self.keyset_query_param) == self.keyset_query_value
+            or KeysetPagination.cursor_query_param in request.query_params
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination(page_size=self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class GroupedResultsSetPagination(KeysetOptInMixin, PageNumberPagination):
     page_size = 5
     page_size_query_param = 'page_size'
     max_page_size = 50
-    
-class StandardResultsSetPagination(PageNumberPagination):
+
+class StandardResultsSetPagination(KeysetOptInMixin, PageNumberPagination):
     page_size = 10
     page_size_query_param = 'page_size'
     max_page_size = 100
-    
-class LargeResultsSetPagination(PageNumberPagination):
+
+class LargeResultsSetPagination(KeysetOptInMixin, PageNumberPagination):
     page_size = 20
     page_size_query_param = 'page_size'
-    max_page_size = 1000
\ No newline at end of file
+    max_page_size = 1000
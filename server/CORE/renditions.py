@@ -0,0 +1,197 @@
+import hashlib
+import io
+import logging
+import os
+import threading
+import uuid
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from PIL import Image, ImageOps
+from rest_framework import serializers, views
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+RENDITION_WIDTHS = [160, 320, 640, 1280]
+RENDITION_DEFAULT_WIDTH = 320
+# Pillow format, content type and encoder options.
+RENDITION_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'avif': ('AVIF', 'image/avif', {'quality': 60}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+# Part of every cache key; bump it when the encoder options change.
+RENDITION_ENCODING_VERSION = 1
+RENDITION_MAX_AGE = 60 * 60 * 24 * 365
+# Eviction removes the least recently used renditions down to this share of the limit.
+RENDITION_EVICTION_TARGET = 0.9
+
+
+def rendition_url(viewname, name, width=RENDITION_DEFAULT_WIDTH, file_format='webp'):
+    if not name:
+        return None
+    return reverse(viewname, kwargs={'width': width, 'file_format': file_format, 'name': name})
+
+
+def rendition_key(name, width, file_format):
+    return hashlib.sha256(f'{RENDITION_ENCODING_VERSION}:{name}:{width}:{file_format}'.encode()).hexdigest()
+
+
+def render(source, width, file_format):
+    """`source` scaled down to at most `width` pixels wide and encoded as `file_format`."""
+    pillow_format, _, options = RENDITION_FORMATS[file_format]
+    with Image.open(source) as image:
+        # JPEGs are decoded at a reduced scale when the target is small
+        # enough; square bounds keep that safe for rotated images.
+        image.draft(None, (width, width))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, image.height), Image.Resampling.LANCZOS)
+        if pillow_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+            background = Image.new('RGB', image.size, 'white')
+            image = image.convert('RGBA')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        elif image.mode not in ('RGB', 'RGBA', 'L', 'LA'):
+            image = image.convert('RGBA')
+        output = io.BytesIO()
+        image.save(output, format=pillow_format, **options)
+    return output.getvalue()
+
+
+class RenditionCache:
+    """
+    Renditions on disk under RENDITION_CACHE_DIR, at most
+    RENDITION_CACHE_MAX_BYTES in total. A hit refreshes the file's mtime;
+    once the limit is passed the files used least recently are evicted.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Bytes in use per cache directory, measured on first write.
+        self.sizes = {}
+
+    @property
+    def directory(self):
+        return getattr(settings, 'RENDITION_CACHE_DIR', os.path.join(settings.BASE_DIR, 'renditions'))
+
+    @property
+    def max_bytes(self):
+        return getattr(settings, 'RENDITION_CACHE_MAX_BYTES', 512 * 1024 * 1024)
+
+    def path(self, key, file_format):
+        return os.path.join(self.directory, key[:2], f'{key}.{file_format}')
+
+    def open(self, path):
+        """The cached rendition at `path`; raises FileNotFoundError on a miss."""
+        os.utime(path)
+        return open(path, 'rb')
+
+    def put(self, path, content):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temporary = f'{path}.{uuid.uuid4().hex}.part'
+        with open(temporary, 'wb') as file:
+            file.write(content)
+        os.replace(temporary, path)
+        with self.lock:
+            directory = self.directory
+            if directory in self.sizes:
+                self.sizes[directory] += len(content)
+            else:
+                self.sizes[directory] = self.disk_usage()[0]
+            if self.sizes[directory] > self.max_bytes:
+                self.sizes[directory] = self.evict()
+
+    def files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.part'):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def disk_usage(self):
+        files = sorted(self.files())
+        return sum(size for _, size, _ in files), files
+
+    def evict(self):
+        """Remove the least recently used renditions and return the bytes left."""
+        # Other processes share the directory, so the size is re-measured here.
+        total, files = self.disk_usage()
+        target = self.max_bytes * RENDITION_EVICTION_TARGET
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+
+rendition_cache = RenditionCache()
+
+
+class RenditionView(views.APIView):
+    """
+    A resized, recompressed variant of a stored image, rendered on first
+    request and then served from the rendition cache. Only images that a
+    row of `queryset` references are served. Stored names change with the
+    content, so responses are marked immutable.
+    """
+    permission_classes = [IsAuthenticated]
+    queryset = None
+    image_field = None
+
+    def get(self, request, *args, **kwargs):
+        width, file_format, name = kwargs['width'], kwargs['file_format'], kwargs['name']
+        if width not in RENDITION_WIDTHS:
+            return Response({"error": f"Unsupported width, use one of {', '.join(map(str, RENDITION_WIDTHS))}"}, status=400)
+        if file_format not in RENDITION_FORMATS:
+            return Response({"error": f"Unsupported format, use one of {', '.join(RENDITION_FORMATS)}"}, status=400)
+        if not self.queryset.filter(**{self.image_field: name}).exists():
+            return Response({"error": "Image not found"}, status=404)
+
+        key = rendition_key(name, width, file_format)
+        etag = f'"{key[:32]}"'
+        if etag in parse_etags(request.headers.get('If-None-Match', '')):
+            response = HttpResponseNotModified()
+        else:
+            content_type = RENDITION_FORMATS[file_format][1]
+            path = rendition_cache.path(key, file_format)
+            try:
+                response = FileResponse(rendition_cache.open(path), content_type=content_type)
+            except FileNotFoundError:
+                storage = self.queryset.model._meta.get_field(self.image_field).storage
+                try:
+                    with storage.open(name, 'rb') as source:
+                        content = render(source, width, file_format)
+                except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+                    logger.warning("Could not render %s: %s", name, e)
+                    return Response({"error": "The image could not be read"}, status=400)
+                rendition_cache.put(path, content)
+                response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=RENDITION_MAX_AGE, immutable=True)
+        return response
+
+
+class RenditionURLField(serializers.Field):
+    """
+    URL of the default rendition of an image field; the other widths and
+    formats differ only in the path segments before the image name.
+    """
+    def __init__(self, viewname, **kwargs):
+        self.viewname = viewname
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        # A FieldFile, or the stored name when rows come from values_list().
+        return rendition_url(self.viewname, getattr(value, 'name', value))
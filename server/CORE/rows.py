@@ -0,0 +1,265 @@
+from operator import itemgetter
+from django.core.exceptions import FieldDoesNotExist
+from django.utils.timezone import is_aware
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from .fieldsets import nested_serializer
+from .middleware import view_timing
+from .pagination import get_ordering
+
+# Fields whose to_representation() returns database values of the right
+# type unchanged.
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+
+
+class Unsupported(Exception):
+    """A serializer field the row plan can't reproduce exactly."""
+
+
+def datetime_converter(field):
+    """
+    DateTimeField.to_representation() for ISO 8601 output with the time
+    zone resolved once per plan instead of once per value.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return convert
+
+
+def scalar_getter(index, field):
+    if isinstance(field, PASSTHROUGH_FIELDS):
+        return itemgetter(index)
+    if type(field) is serializers.DateTimeField:
+        convert = datetime_converter(field)
+    else:
+        convert = field.to_representation
+
+    def get(row, related):
+        value = row[index]
+        return None if value is None else convert(value)
+    return get
+
+
+def nested_getter(null_index, build):
+    def get(row, related):
+        return None if row[null_index] is None else build(row, related)
+    return get
+
+
+def keyed_getter(slot, key_index, default):
+    def get(row, related):
+        return related[slot].get(row[key_index], default)
+    return get
+
+
+def pk_only(index):
+    def build(row, related):
+        return row[index]
+    return build
+
+
+def make_builder(getters):
+    """
+    One function turning a row into a dict. Plain column reads stay C-level
+    itemgetters; the other getters also receive the page's related rows.
+    """
+    entries = [(name, isinstance(getter, itemgetter), getter) for name, getter in getters]
+
+    def build(row, related):
+        return {name: getter(row) if plain else getter(row, related) for name, plain, getter in entries}
+    return build
+
+
+class RelatedFetch:
+    """Rows of a relation loaded in one query for a whole page, keyed like the parent's column."""
+    def __init__(self, plan, key_index, lookup, many):
+        self.plan = plan
+        self.key_index = key_index
+        self.lookup = lookup
+        self.many = many
+
+    def load(self, keys):
+        rows = list(self.plan.rows(self.plan.queryset.filter(**{f'{self.lookup}__in': keys})))
+        items = self.plan.build(rows)
+        key_index = self.plan.key_index
+        if not self.many:
+            return {row[key_index]: item for row, item in zip(rows, items)}
+        grouped = {}
+        for row, item in zip(rows, items):
+            grouped.setdefault(row[key_index], []).append(item)
+        return grouped
+
+
+class RowPlan:
+    """
+    Read-only representation of a (possibly pruned) serializer built from
+    `values_list()` tuples instead of model instances. The serializer is
+    compiled once into a list of column getters; each row then becomes a
+    dict in a single comprehension, with the same keys, order and values
+    the serializer would produce.
+
+    Nested serializers over forward relations are joined into the same
+    query. To-many relations, and relations listed in `related_querysets`,
+    are loaded with one extra query per page, like prefetch_related().
+    Raises Unsupported for fields it can't reproduce.
+    """
+    def __init__(self, serializer, queryset, related_querysets=None, key=None, path=''):
+        self.queryset = queryset
+        self.model = queryset.model
+        self.related_querysets = related_querysets or {}
+        self.annotations = set(queryset.query.annotations)
+        self.columns = []
+        self.fetches = []
+        self.key_index = self.column(key) if key else None
+        if serializer is None:
+            # Only the primary keys, as for a PrimaryKeyRelatedField(many=True).
+            self.builder = pk_only(self.column(self.model._meta.pk.name))
+        else:
+            self.builder = self.compile(serializer, self.model, '', path)
+
+    def column(self, lookup):
+        if lookup not in self.columns:
+            self.columns.append(lookup)
+        return self.columns.index(lookup)
+
+    def fetch(self, plan, key_lookup, lookup, many):
+        self.fetches.append(RelatedFetch(plan, self.column(key_lookup), lookup, many))
+        return len(self.fetches) - 1
+
+    def compile(self, serializer, model, prefix, path):
+        serializer = nested_serializer(serializer)
+        getters = []
+        for name, field in serializer.fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or ('.' in field.source and nested_serializer(field) is not None):
+                raise Unsupported(name)
+            getters.append((name, self.compile_field(field, model, prefix, path)))
+        return make_builder(getters)
+
+    def compile_field(self, field, model, prefix, path):
+        source = field.source.replace('.', '__')
+        nested = nested_serializer(field)
+
+        if isinstance(field, (serializers.ListSerializer, ManyRelatedField)):
+            relation = self.relation(model, source)
+            if not relation.one_to_many:
+                raise Unsupported(field.field_name)
+            plan = RowPlan(
+                nested, self.related_queryset(f'{path}{source}', relation.related_model),
+                self.related_querysets, key=relation.field.attname, path=f'{path}{source}__',
+            )
+            key_lookup = f'{prefix}{model._meta.pk.name}'
+            slot = self.fetch(plan, key_lookup, relation.field.name, many=True)
+            return keyed_getter(slot, self.column(key_lookup), [])
+
+        if nested is not None:
+            relation = self.relation(model, source)
+            if not (relation.many_to_one or relation.one_to_one) or not relation.concrete:
+                raise Unsupported(field.field_name)
+            related_model = relation.related_model
+            if f'{path}{source}' in self.related_querysets:
+                plan = RowPlan(
+                    nested, self.related_queryset(f'{path}{source}', related_model),
+                    self.related_querysets, key=related_model._meta.pk.name, path=f'{path}{source}__',
+                )
+                slot = self.fetch(plan, f'{prefix}{source}', related_model._meta.pk.name, many=False)
+                return keyed_getter(slot, self.column(f'{prefix}{source}'), None)
+            null_index = self.column(f'{prefix}{source}__{related_model._meta.pk.name}')
+            build = self.compile(nested, related_model, f'{prefix}{source}__', f'{path}{source}__')
+            return nested_getter(null_index, build)
+
+        if isinstance(field, RelatedField):
+            return itemgetter(self.column(f'{prefix}{source}'))
+
+        if not prefix and source in self.annotations:
+            return scalar_getter(self.column(source), field)
+        self.check_lookup(model, source, field)
+        return scalar_getter(self.column(f'{prefix}{source}'), field)
+
+    def relation(self, model, name):
+        try:
+            relation = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            raise Unsupported(name)
+        if not relation.is_relation:
+            raise Unsupported(name)
+        return relation
+
+    def check_lookup(self, model, source, field):
+        parts = source.split('__')
+        for part in parts[:-1]:
+            model = self.relation(model, part).related_model
+        try:
+            model_field = model._meta.get_field(parts[-1])
+        except FieldDoesNotExist:
+            raise Unsupported(field.field_name)
+        if model_field.is_relation:
+            raise Unsupported(field.field_name)
+
+    def related_queryset(self, path, model):
+        factory = self.related_querysets.get(path)
+        return factory() if factory is not None else model._default_manager.all()
+
+    def rows(self, queryset=None):
+        """Named tuples of the plan's columns, plus the ordering fields pagination seeks on."""
+        queryset = self.queryset if queryset is None else queryset
+        columns = list(self.columns)
+        meta = queryset.model._meta
+        for field in get_ordering(queryset):
+            name = field.lstrip('-')
+            attname = meta.pk.attname if name == 'pk' else meta.get_field(name).attname
+            if attname not in columns:
+                columns.append(attname)
+        return queryset.prefetch_related(None).values_list(*columns, named=True)
+
+    def build(self, rows):
+        with view_timing():
+            related = []
+            for fetch in self.fetches:
+                keys = {row[fetch.key_index] for row in rows}
+                keys.discard(None)
+                related.append(fetch.load(keys) if keys else {})
+            build = self.builder
+            return [build(row, related) for row in rows]
+
+
+class ValuesListMixin:
+    """
+    Serves GET list responses through a RowPlan when the view's serializer
+    can be compiled into one, falling back to the serializer otherwise.
+    Views opt in with `values_representation = True` once their output has
+    been checked against the serializer's.
+    """
+    values_representation = False
+
+    def get_row_plan(self, queryset):
+        if not self.values_representation:
+            return None
+        related_querysets = self.get_related_querysets() if hasattr(self, 'get_related_querysets') else None
+        try:
+            return RowPlan(self.get_serializer(), queryset, related_querysets)
+        except Unsupported:
+            return None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        plan = self.get_row_plan(queryset)
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+
+        rows = plan.rows(queryset)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(plan.build(page))
+        return Response(plan.build(list(rows)))
@@ -0,0 +1,114 @@
+import re
+from django.db import connection, connections
+from django.db.models import Case, IntegerField, Q, Value, When
+from .models import Vulnerabilities
+
+VULNERABILITY_FTS_TABLE = 'CORE_vulnerabilities_fts'
+VULNERABILITY_FTS_COLUMNS = ['name', 'description', 'impact']
+# bm25 weight of each column, matches in the name rank highest.
+VULNERABILITY_FTS_WEIGHTS = [10.0, 2.0, 1.0]
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def vulnerability_fts_triggers():
+    """The triggers keeping the index in step with its table, by name."""
+    table, fts = Vulnerabilities._meta.db_table, VULNERABILITY_FTS_TABLE
+    columns = ', '.join(VULNERABILITY_FTS_COLUMNS)
+    new = ', '.join(f'new.{column}' for column in VULNERABILITY_FTS_COLUMNS)
+    old = ', '.join(f'old.{column}' for column in VULNERABILITY_FTS_COLUMNS)
+    delete = f'INSERT INTO "{fts}"("{fts}", rowid, {columns}) VALUES (\'delete\', old.id, {old});'
+    insert = f'INSERT INTO "{fts}"(rowid, {columns}) VALUES (new.id, {new});'
+    return {
+        f'{fts}_ai': f'CREATE TRIGGER "{fts}_ai" AFTER INSERT ON "{table}" BEGIN {insert} END',
+        f'{fts}_ad': f'CREATE TRIGGER "{fts}_ad" AFTER DELETE ON "{table}" BEGIN {delete} END',
+        f'{fts}_au': f'CREATE TRIGGER "{fts}_au" AFTER UPDATE ON "{table}" BEGIN {delete} {insert} END',
+    }
+
+
+def ensure_fts_triggers(using='default', **kwargs):
+    """
+    post_migrate receiver recreating missing index triggers. SQLite drops
+    the triggers of a table whenever a migration rebuilds it, as it does
+    for most AddField and AlterField operations.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite' or VULNERABILITY_FTS_TABLE not in connection.introspection.table_names():
+        return
+    triggers = vulnerability_fts_triggers()
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [Vulnerabilities._meta.db_table])
+        missing = set(triggers) - {name for name, in cursor.fetchall()}
+        for name in sorted(missing):
+            cursor.execute(triggers[name])
+        if missing:
+            # Rows written while the triggers were missing.
+            cursor.execute(f'INSERT INTO "{VULNERABILITY_FTS_TABLE}"("{VULNERABILITY_FTS_TABLE}") VALUES (\'rebuild\')')
+
+# (database, table) pairs known to exist. Missing tables are looked up
+# again, so search uses the index as soon as its migration has run.
+fts_tables = set()
+
+
+def fts_table_exists(database_name, table):
+    if (database_name, table) in fts_tables:
+        return True
+    if table not in connection.introspection.table_names():
+        return False
+    fts_tables.add((database_name, table))
+    return True
+
+
+def fts_available(table):
+    return connection.vendor == 'sqlite' and fts_table_exists(str(connection.settings_dict['NAME']), table)
+
+
+def fts_match_expression(term):
+    """
+    FTS5 query requiring every word of `term`, the last one as a prefix
+    so that partially typed words match while the user is still typing.
+    """
+    tokens = TOKEN_RE.findall(term)
+    if not tokens:
+        return None
+    quoted = [f'"{token}"' for token in tokens]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def search_vulnerabilities(queryset, term):
+    """
+    Filter `queryset` to the vulnerabilities matching `term` in their name,
+    description or impact, best matches first. Uses the FTS5 index on
+    SQLite, full-text search on PostgreSQL and LIKE elsewhere.
+    """
+    if fts_available(VULNERABILITY_FTS_TABLE):
+        match = fts_match_expression(term)
+        if match is None:
+            return queryset
+        table = Vulnerabilities._meta.db_table
+        weights = ', '.join(str(weight) for weight in VULNERABILITY_FTS_WEIGHTS)
+        return queryset.extra(
+            tables=[VULNERABILITY_FTS_TABLE],
+            where=[
+                f'"{VULNERABILITY_FTS_TABLE}"."rowid" = "{table}"."id"',
+                f'"{VULNERABILITY_FTS_TABLE}" MATCH %s',
+            ],
+            params=[match],
+            select={'search_rank': f'bm25("{VULNERABILITY_FTS_TABLE}", {weights})'},
+            order_by=['search_rank', 'id'],
+        )
+
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+
+        vector = SearchVector('name', weight='A') + SearchVector('description', weight='B') + SearchVector('impact', weight='C')
+        query = SearchQuery(term, search_type='websearch')
+        return queryset.annotate(search_rank=SearchRank(vector, query)) \
+            .filter(search_rank__gt=0).order_by('-search_rank', 'id')
+
+    return queryset.filter(
+        Q(name__icontains=term) | Q(description__icontains=term) | Q(impact__icontains=term)
+    ).annotate(
+        search_rank=Case(When(name__icontains=term, then=Value(0)), default=Value(1), output_field=IntegerField())
+    ).order_by('search_rank', 'id')
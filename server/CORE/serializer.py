@@ -1,7 +1,20 @@
 from django.contrib.auth import authenticate
 from rest_framework.serializers import ModelSerializer
 from rest_framework import serializers
-from .models import CompilanceType, AssessmentType, Vulnerabilities, TeamsManagement, User
+from .cvss import base_score
+from .models import CompilanceType, AssessmentType, Vulnerabilities, TeamsManagement, User, Job
+
+
+def check_cvss(value):
+    # Unreadable scores would be stored as 0.0 with no severity, sorting
+    # last and missing from severity filters and stats.
+    if value and base_score(value) is None:
+        raise serializers.ValidationError(
+            "Enter a base score from 0.0 to 10.0 or a CVSS v3.x vector. "
+            "CVSS v4 vectors need their score in front, e.g. '9.3 CVSS:4.0/...'."
+        )
+    return value
+
 
 class CompilanceSerializer(ModelSerializer):
     class Meta:
@@ -19,7 +32,12 @@ class VulnerabilitySerializer(ModelSerializer):
     
     class Meta:
         model = Vulnerabilities
-        fields = ['id', 'name', 'description', 'remediations', 'impact', 'reference', 'cvss','category_of_testing_id', 'category_of_testing']
+        fields = ['id', 'name', 'description', 'remediations', 'impact', 'reference', 'cvss', 'cvss_base_score', 'severity', 'category_of_testing_id', 'category_of_testing']
+        read_only_fields = ['cvss_base_score', 'severity']
+        extra_kwargs = {'cvss_base_score': {'coerce_to_string': False}}
+
+    def validate_cvss(self, value):
+        return check_cvss(value)
         
     
 class TeamsManagementSerializer(ModelSerializer):
@@ -117,3 +135,11 @@ class UserSerializer(serializers.ModelSerializer):
         return instance
             
 
+
+class JobSerializer(ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'name', 'status', 'attempts', 'max_attempts', 'progress', 'total', 'message', 'result', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
@@ -0,0 +1,17 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import invalidate_user_snapshot
+from .cache import invalidate_model
+from .models import User
+
+
+@receiver([post_save, post_delete])
+def invalidate_reference_cache(sender, **kwargs):
+    invalidate_model(sender)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_snapshot_on_change(sender, instance, **kwargs):
+    user_id = instance.pk
+    transaction.on_commit(lambda: invalidate_user_snapshot(user_id))
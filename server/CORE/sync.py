@@ -0,0 +1,163 @@
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.core import signing
+from django.db.models.signals import post_save, pre_delete, post_delete
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework.response import Response
+from .commit import commit_batch
+from .middleware import view_timing
+from .models import Tombstone
+from .pagination import keyset_filter
+
+SYNC_ORDERING = ('updated_at', 'id')
+TOMBSTONE_ORDERING = ('deleted_at', 'id')
+
+pending = threading.local()
+
+
+def overlap():
+    return timedelta(seconds=getattr(settings, 'SYNC_OVERLAP_SECONDS', 5))
+
+
+class Restamp:
+    """
+    Commit hook stamping the `field` of the `model` rows written since
+    `since` again when the transaction commits too late for the overlap
+    of sync tokens to cover them; `key` is (model, field).
+    """
+
+    def __init__(self, key):
+        self.key, self.since = key, None
+
+    def run(self):
+        model, field = self.key
+        now = timezone.now()
+        # Half the overlap is left for the restamp itself to commit.
+        if now - self.since < overlap() / 2:
+            return
+        rows = {f'{field}__gte': self.since, f'{field}__lt': now}
+        model._default_manager.filter(**rows).update(**{field: now})
+
+
+def stamped(model, moment, field='updated_at'):
+    """Note that the current transaction set `field` of `model` rows to `moment` or later."""
+    restamp = commit_batch(Restamp, (model, field))
+    if restamp is not None:
+        restamp.since = moment if restamp.since is None else min(restamp.since, moment)
+
+
+def touch(queryset):
+    """Mark the rows of `queryset` as changed, e.g. when rows they embed change."""
+    now = timezone.now()
+    stamped(queryset.model, now)
+    return queryset.update(updated_at=now)
+
+
+def remember_delete(sender, instance, origin=None, **kwargs):
+    if getattr(pending, 'origin', None) is not origin:
+        pending.origin, pending.tombstones = origin, []
+    pending.tombstones.append(Tombstone(model=sender._meta.label_lower, object_id=instance.pk))
+
+
+def record_deletes(sender, instance, origin=None, **kwargs):
+    # A delete sends every pre_delete before the first post_delete, so the
+    # tombstones of a whole cascade are written by one INSERT, in its transaction.
+    if getattr(pending, 'origin', None) is origin and pending.tombstones:
+        Tombstone.objects.bulk_create(pending.tombstones)
+        stamped(Tombstone, min(t.deleted_at for t in pending.tombstones), 'deleted_at')
+        pending.tombstones = []
+
+
+def track_deletes(*models):
+    """Record a tombstone for every deleted row of `models`, cascades included."""
+    for model in models:
+        pre_delete.connect(remember_delete, sender=model, dispatch_uid=f'sync-pre-{model._meta.label_lower}')
+        post_delete.connect(record_deletes, sender=model, dispatch_uid=f'sync-post-{model._meta.label_lower}')
+
+
+def record_save(sender, instance, **kwargs):
+    stamped(sender, instance.updated_at)
+
+
+def track_updates(*models):
+    """Restamp saved rows of `models` whose transaction commits late; see Restamp."""
+    for model in models:
+        post_save.connect(record_save, sender=model, dispatch_uid=f'sync-save-{model._meta.label_lower}')
+
+
+def prune_tombstones():
+    cutoff = timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+    return Tombstone.objects.filter(deleted_at__lt=cutoff).delete()[0]
+
+
+class SyncMixin:
+    """
+    `sync` action for a list view: the rows changed and the ids deleted
+    since the `since` token of the previous response, `sync_page_size` at
+    a time. Follow `since` while `more` is true, then poll with it. A
+    missing token starts a full sync. Rows are seeked on (updated_at, id)
+    and tombstones on (deleted_at, id); once caught up, the token steps
+    back SYNC_OVERLAP_SECONDS so that rows committed late with an earlier
+    timestamp are still picked up, and may repeat a few recent rows. Rows
+    whose transaction outlasts half the overlap are stamped again when it
+    commits, which needs every write to go through track_updates,
+    track_deletes, touch or stamped.
+    Map the action in urls.py, e.g. `URLViewset.as_view({'get': 'sync'})`.
+    """
+    sync_query_param = 'since'
+    sync_page_size = 500
+
+    def sync(self, request, *args, **kwargs):
+        now = timezone.now()
+        label = self.get_queryset().model._meta.label_lower
+        salt = f'sync:{label}'
+        encoded = request.query_params.get(self.sync_query_param)
+        if encoded:
+            try:
+                token = signing.loads(encoded, salt=salt)
+                rows_after, deleted_after = token['r'], token['d']
+            except (signing.BadSignature, KeyError, TypeError):
+                return Response({"error": "Invalid sync token"}, status=400)
+            expired = now - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_DAYS', 30))
+            if parse_datetime(deleted_after[0]) < expired:
+                return Response({"error": "Sync token expired, sync again without one"}, status=410)
+        else:
+            rows_after, deleted_after = None, [(now - overlap()).isoformat(), 0]
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if rows_after is not None:
+            queryset = queryset.filter(keyset_filter(SYNC_ORDERING, rows_after))
+        queryset = queryset.order_by(*SYNC_ORDERING)
+        plan = self.get_row_plan(queryset) if hasattr(self, 'get_row_plan') else None
+        rows = list((plan.rows(queryset) if plan is not None else queryset)[:self.sync_page_size + 1])
+        tombstones = list(
+            Tombstone.objects.filter(keyset_filter(TOMBSTONE_ORDERING, deleted_after), model=label)
+            .order_by(*TOMBSTONE_ORDERING).values_list('deleted_at', 'id', 'object_id')[:self.sync_page_size + 1]
+        )
+        more = len(rows) > self.sync_page_size or len(tombstones) > self.sync_page_size
+        rows, tombstones = rows[:self.sync_page_size], tombstones[:self.sync_page_size]
+
+        if rows:
+            rows_after = [rows[-1].updated_at.isoformat(), rows[-1].id]
+        if tombstones:
+            deleted_after = [tombstones[-1][0].isoformat(), tombstones[-1][1]]
+        if not more:
+            rows_after = self.rewind(rows_after, now - overlap())
+            deleted_after = self.rewind(deleted_after, now - overlap())
+
+        with view_timing():
+            results = plan.build(rows) if plan is not None else self.get_serializer(rows, many=True).data
+        return Response({
+            'results': results,
+            'deleted': [object_id for _, _, object_id in tombstones],
+            'since': signing.dumps({'r': rows_after, 'd': deleted_after}, salt=salt),
+            'more': more,
+        })
+
+    @staticmethod
+    def rewind(position, limit):
+        if position is None or parse_datetime(position[0]) > limit:
+            return [limit.isoformat(), 0]
+        return position
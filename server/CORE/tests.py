@@ -1,3 +1,503 @@
-from django.test import TestCase
+import asyncio
+import json
+from datetime import timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.core.cache import cache
+from django.core.management.sql import emit_post_migrate_signal
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .cache import LocalCache, invalidate, local_cache
+from .cvss import backfill_score_columns, base_score, score_columns
+from .checks import check_shared_cache
+from .events import PROCESS_ID, SUBSCRIBER_QUEUE_SIZE, bus, send, stream_changes
+from .fieldsets import optimize_queryset, parse_paths, shape_serializer
+from .jobs import JobFailed, enqueue, job, report_progress, run_pending
+from .models import AssessmentType, ChangeEvent, Job, TeamsManagement, User, Vulnerabilities
+from .pagination import KeysetPagination, unsupported_ordering
+from .search import VULNERABILITY_FTS_TABLE, fts_available, fts_tables, search_vulnerabilities, vulnerability_fts_triggers
+from .serializer import UserSerializer, VulnerabilitySerializer
 
-# Create your tests here.
+
+class QueryInstrumentationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(5):
+            team = TeamsManagement.objects.create(team_name=f'Team {index}')
+            User.objects.create(email=f'user{index}@example.com', team=team)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(email='staff@example.com', is_staff=True))
+
+    def test_server_timing_header(self):
+        with self.assertLogs('CORE.middleware', 'DEBUG') as logs:
+            response = self.client.get('/api/users/')
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('desc="2 queries"', response['Server-Timing'])
+        record = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((logs.records[-1].levelname, record['path'], record['queries'], record['repeated_queries']), ('DEBUG', '/api/users/', 2, []))
+        self.assertGreater(record['view_ms'], 0)
+
+    def test_timings_are_only_sent_to_staff(self):
+        self.client.force_authenticate(User.objects.first())
+        self.assertNotIn('Server-Timing', self.client.get('/api/users/'))
+        with override_settings(DEBUG=True):
+            self.assertIn('Server-Timing', self.client.get('/api/users/'))
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=3)
+    def test_flags_repeated_queries(self):
+        with mock.patch('CORE.fieldsets.optimize_queryset', lambda queryset, *args, **kwargs: queryset), \
+                self.assertLogs('CORE.middleware', 'WARNING') as logs:
+            response = self.client.get('/api/users/')
+        self.assertIn('nplusone', response['Server-Timing'])
+        repeated = json.loads(logs.records[-1].getMessage())['repeated_queries']
+        self.assertEqual(repeated[0]['count'], 5)
+        self.assertIn('CORE_teamsmanagement', repeated[0]['sql'])
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create(email=f'user{index}@example.com') for index in range(5)]
+        web = AssessmentType.objects.create(name='Web')
+        Vulnerabilities.objects.create(
+            name='XSS', description='-', remediations='-', impact='-', reference='https://example.com', category_of_testing=web,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def pages(self, path, link='next'):
+        ids = []
+        while path:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200, response.content)
+            ids.append([user['id'] for user in response.json()['results']])
+            path = response.json()[link]
+        return ids
+
+    def test_cursors_round_trip(self):
+        pages = self.pages('/api/users/?pagination=keyset&page_size=2')
+        self.assertEqual(pages, [[user.pk for user in self.users[start:start + 2]] for start in (0, 2, 4)])
+        last = self.client.get('/api/users/?pagination=keyset&page_size=2').json()['next']
+        last = self.client.get(last).json()['next']
+        self.assertEqual(self.pages(last, link='previous'), pages[::-1])
+
+    def test_rejects_tampered_and_expired_cursors(self):
+        cursor = parse_qs(urlsplit(self.client.get('/api/users/?pagination=keyset&page_size=2').json()['next']).query)['cursor'][0]
+        tampered = cursor[:-1] + ('y' if cursor.endswith('x') else 'x')
+        self.assertEqual(self.client.get('/api/users/', {'cursor': tampered}).status_code, 404)
+        wrong_length = signing.dumps({'p': [1, 2], 'r': False}, salt=KeysetPagination.cursor_salt)
+        self.assertEqual(self.client.get('/api/users/', {'cursor': wrong_length}).status_code, 404)
+        with mock.patch.object(signing.TimestampSigner, 'timestamp', lambda signer: '0'):
+            expired = signing.dumps({'p': [str(self.users[1].pk)], 'r': False}, salt=KeysetPagination.cursor_salt)
+        self.assertEqual(self.client.get('/api/users/', {'cursor': expired}).status_code, 404)
+
+    def test_refuses_orderings_it_cannot_seek_on(self):
+        self.assertEqual(unsupported_ordering(Vulnerabilities.objects.order_by('-cvss_base_score', 'id')), [])
+        self.assertEqual(unsupported_ordering(Vulnerabilities.objects.order_by('category_of_testing__name')), ['category_of_testing__name'])
+        # Search results are ordered by their rank.
+        response = self.client.get('/api/vulnerabilities/?name=xss&pagination=keyset')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/vulnerabilities/?name=xss').status_code, 200)
+
+
+class VulnerabilitySearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        web = AssessmentType.objects.create(name='Web')
+        rows = [
+            ('Reflected XSS', 'Script injection through a query parameter.'),
+            ('Missing CSP header', 'Makes reflected XSS easier to exploit.'),
+            ('SQL injection', 'Unsanitised input reaches a query.'),
+        ]
+        cls.xss, cls.csp, cls.sqli = [
+            Vulnerabilities.objects.create(
+                name=name, description=description, remediations='-', impact='-', reference='https://example.com', category_of_testing=web,
+            )
+            for name, description in rows
+        ]
+
+    def search(self, term):
+        return list(search_vulnerabilities(Vulnerabilities.objects.all(), term))
+
+    def test_index_matches_words_and_prefixes(self):
+        self.assertTrue(fts_available(VULNERABILITY_FTS_TABLE))
+        self.assertEqual(self.search('reflected xs'), [self.xss, self.csp])
+        self.assertEqual(self.search('injec'), [self.sqli, self.xss])
+        self.assertEqual(self.search('csrf'), [])
+
+    def test_index_follows_updates(self):
+        Vulnerabilities.objects.filter(pk=self.sqli.pk).update(name='Blind SQL injection')
+        self.assertEqual(self.search('blind'), [self.sqli])
+
+    def fts_triggers(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = %s", [Vulnerabilities._meta.db_table])
+            return dict(cursor.fetchall())
+
+    def test_migrations_leave_the_index_triggers(self):
+        self.assertEqual(self.fts_triggers(), vulnerability_fts_triggers())
+
+    def test_missing_triggers_are_recreated_after_migrate(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER "{VULNERABILITY_FTS_TABLE}_au"')
+        Vulnerabilities.objects.filter(pk=self.sqli.pk).update(name='Blind SQL injection')
+        emit_post_migrate_signal(0, False, 'default')
+        self.assertEqual(self.fts_triggers(), vulnerability_fts_triggers())
+        self.assertEqual(self.search('blind'), [self.sqli])
+
+    def test_like_fallback_ranks_names_first(self):
+        with mock.patch('CORE.search.fts_available', return_value=False):
+            self.assertEqual(self.search('xss'), [self.xss, self.csp])
+
+    def test_missing_index_is_looked_up_again(self):
+        fts_tables.clear()
+        with mock.patch.object(connection.introspection, 'table_names', return_value=[]):
+            self.assertFalse(fts_available(VULNERABILITY_FTS_TABLE))
+        self.assertTrue(fts_available(VULNERABILITY_FTS_TABLE))
+
+
+class CVSSTests(TestCase):
+    def test_base_scores(self):
+        cases = {
+            '9.8': 9.8,
+            '7.3 (High)': 7.3,
+            'CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H': 9.8,
+            'CVSS:3.1/AV:N/AC:L/PR:N/UI:R/S:C/C:L/I:L/A:N': 6.1,
+            'CVSS:3.0/AV:N/AC:L/PR:L/UI:N/S:C/C:H/I:H/A:H': 9.9,
+            '9.3 CVSS:4.0/AV:N/AC:L/AT:N/PR:N/UI:N/VC:H/VI:H/VA:H/SC:N/SI:N/SA:N': 9.3,
+            'CVSS:3.1/AV:N/AC:L': None,
+            'n/a': None,
+            '12': None,
+        }
+        for value, expected in cases.items():
+            self.assertEqual(base_score(value), expected, value)
+
+    def test_score_columns(self):
+        self.assertEqual(score_columns('10.0'), {'cvss_base_score': Decimal('10.0'), 'severity': 'critical'})
+        self.assertEqual(score_columns('n/a'), {'cvss_base_score': Decimal('0.0'), 'severity': ''})
+
+    def test_serializers_reject_unreadable_scores(self):
+        web = AssessmentType.objects.create(name='Web')
+        data = {'name': 'XSS', 'description': '-', 'remediations': '-', 'impact': '-', 'reference': 'https://example.com', 'category_of_testing_id': web.pk}
+        v4 = 'CVSS:4.0/AV:N/AC:L/AT:N/PR:N/UI:N/VC:H/VI:H/VA:H/SC:N/SI:N/SA:N'
+        for cvss in (v4, 'n/a', '12'):
+            serializer = VulnerabilitySerializer(data={**data, 'cvss': cvss})
+            self.assertFalse(serializer.is_valid(), cvss)
+            self.assertIn('cvss', serializer.errors)
+        for cvss in (f'9.3 {v4}', '', None):
+            self.assertTrue(VulnerabilitySerializer(data={**data, 'cvss': cvss}).is_valid(), cvss)
+
+
+class FieldsetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for index in range(3):
+            User.objects.create(email=f'user{index}@example.com', team=TeamsManagement.objects.create(team_name=f'Team {index}'))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.first())
+
+    def test_parse_paths(self):
+        self.assertEqual(parse_paths('id,team.team_name,team.id'), {'id': {}, 'team': {'team_name': {}, 'id': {}}})
+        self.assertEqual(parse_paths(' a..b , ,.c,'), {'a': {'b': {}}, 'c': {}})
+        self.assertEqual(parse_paths(None), {})
+
+    def test_shape_serializer(self):
+        serializer = UserSerializer()
+        shape_serializer(serializer, parse_paths('id,team.team_name,unknown'))
+        self.assertEqual(list(serializer.fields), ['id', 'team'])
+        self.assertEqual(list(serializer.fields['team'].fields), ['team_name'])
+
+        serializer = UserSerializer()
+        shape_serializer(serializer, parse_paths('id,team'), expand={})
+        self.assertIsInstance(serializer.fields['team'], PrimaryKeyRelatedField)
+
+    def test_optimize_queryset_follows_shape(self):
+        queryset = User.objects.all()
+        self.assertEqual(optimize_queryset(queryset, UserSerializer()).query.select_related, {'team': {}})
+        serializer = UserSerializer()
+        shape_serializer(serializer, parse_paths('id,email'))
+        self.assertFalse(optimize_queryset(queryset, serializer).query.select_related)
+
+    def test_shaped_responses(self):
+        # Count and page only: the team is joined, or not read at all.
+        with self.assertNumQueries(2):
+            rows = self.client.get('/api/users/?fields=id,team.team_name').json()['results']
+        self.assertEqual(rows[0], {'id': rows[0]['id'], 'team': {'team_name': 'Team 0'}})
+        with self.assertNumQueries(2):
+            rows = self.client.get('/api/users/?fields=email,team&expand=').json()['results']
+        self.assertEqual(rows[0], {'email': 'user0@example.com', 'team': TeamsManagement.objects.get(team_name='Team 0').pk})
+
+
+class CachedReferenceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.web = AssessmentType.objects.create(name='Web')
+        Vulnerabilities.objects.create(
+            name='XSS', description='-', remediations='-', impact='-', reference='-', cvss='6.1', category_of_testing=cls.web,
+        )
+
+    def setUp(self):
+        cache.clear()
+        local_cache.entries.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create(email='viewer@example.com'))
+
+    def test_if_none_match_is_answered_without_queries(self):
+        response = self.client.get('/api/vulnerabilities/')
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            revalidated = self.client.get('/api/vulnerabilities/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(revalidated['ETag'], response['ETag'])
+
+    def test_repeat_is_served_from_cache(self):
+        first = self.client.get('/api/vulnerabilities/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/vulnerabilities/')
+        self.assertEqual(second.content, first.content)
+
+    def test_write_changes_version(self):
+        first = self.client.get('/api/assessments/')
+        with self.captureOnCommitCallbacks(execute=True):
+            AssessmentType.objects.create(name='API')
+        response = self.client.get('/api/assessments/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn('API', [row['name'] for row in response.json()['results']])
+        # Vulnerabilities embed their assessment type, so they are keyed by both tables.
+        self.assertNotEqual(self.client.get('/api/vulnerabilities/')['ETag'], first['ETag'])
+
+    def test_bulk_update_changes_version(self):
+        first = self.client.get('/api/vulnerabilities/')
+        Vulnerabilities.objects.update(cvss='9.8')
+        with self.captureOnCommitCallbacks(execute=True):
+            backfill_score_columns(Vulnerabilities, 'cvss')
+        response = self.client.get('/api/vulnerabilities/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['severity'], 'critical')
+
+    def test_version_changes_when_the_write_commits(self):
+        first = self.client.get('/api/assessments/')
+        with self.captureOnCommitCallbacks() as callbacks:
+            AssessmentType.objects.create(name='API')
+            # Until the commit, requests keep the old version rather than
+            # caching what they read under the new one.
+            self.assertEqual(self.client.get('/api/assessments/')['ETag'], first['ETag'])
+        for callback in callbacks:
+            callback()
+        response = self.client.get('/api/assessments/')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertIn('API', [row['name'] for row in response.json()['results']])
+
+    def test_rolled_back_write_keeps_version(self):
+        first = self.client.get('/api/assessments/')
+        with self.captureOnCommitCallbacks(execute=True), self.assertRaises(IntegrityError), transaction.atomic():
+            AssessmentType.objects.create(name='API')
+            AssessmentType.objects.create(pk=self.web.pk, name='Duplicate')
+        self.assertEqual(self.client.get('/api/assessments/', HTTP_IF_NONE_MATCH=first['ETag']).status_code, 304)
+
+    def test_local_entries_follow_shared_version(self):
+        first = self.client.get('/api/vulnerabilities/')
+        # Another process writes: only the shared version token changes,
+        # the entry in this process's LRU is left behind under its old key.
+        Vulnerabilities.objects.filter(pk__gt=0).update(name='Stored XSS')
+        invalidate('vulnerabilities')
+        response = self.client.get('/api/vulnerabilities/')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+        self.assertEqual(response.json()['results'][0]['name'], 'Stored XSS')
+
+    def test_local_cache_evicts_least_recently_used(self):
+        lru = LocalCache(2)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.team = TeamsManagement.objects.create(team_name='Red')
+        cls.user = User.objects.create_user(email='tester@example.com', password='secret', first_name='Test', team=cls.team, is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+        response = APIClient().post('/api/auth/token/', {'email': 'tester@example.com', 'password': 'secret'})
+        self.access = response.json()['access']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.access}')
+
+    def test_token_claims(self):
+        token = AccessToken(self.access)
+        self.assertEqual((token['is_staff'], token['is_active'], token['team_id']), (True, True, self.team.pk))
+
+    def test_cached_user_skips_user_query(self):
+        self.client.get('/api/pentest/in-progress/')
+        # Only the count, as the tester has no URLs; no user lookup.
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/pentest/in-progress/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_save_invalidates_snapshot(self):
+        self.assertEqual(self.client.get('/api/pentest/in-progress/').status_code, 200)
+        self.user.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.user.save()
+            # The snapshot is dropped once the save commits, so that a
+            # request in between cannot cache the old row again.
+            self.assertEqual(self.client.get('/api/pentest/in-progress/').status_code, 200)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.client.get('/api/pentest/in-progress/').status_code, 401)
+
+    def test_profile_loads_user(self):
+        response = self.client.get('/api/profile/')
+        self.assertEqual((response.json()['email'], response.json()['team']['team_name']), ('tester@example.com', 'Red'))
+
+
+calls = []
+
+
+@job('tests.flaky', max_attempts=3)
+def flaky(failures, value):
+    calls.append(value)
+    report_progress(len(calls), total=failures + 1)
+    if len(calls) <= failures:
+        raise RuntimeError("transient")
+    return {'value': value}
+
+
+@job('tests.invalid')
+def invalid():
+    raise JobFailed("Bad input")
+
+
+@override_settings(JOB_RETRY_DELAY=0)
+class JobTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(email='user@example.com')
+        cls.other = User.objects.create(email='other@example.com')
+
+    def setUp(self):
+        calls.clear()
+
+    def test_retries_until_success(self):
+        queued = enqueue('tests.flaky', {'failures': 2, 'value': 'ok'}, user=self.user)
+        with self.assertLogs('CORE.jobs', 'WARNING'):
+            self.assertEqual(run_pending(), 3)
+        queued.refresh_from_db()
+        self.assertEqual(
+            (queued.status, queued.attempts, queued.result, queued.progress, queued.total),
+            (Job.SUCCEEDED, 3, {'value': 'ok'}, 3, 3),
+        )
+
+    def test_fails_after_max_attempts_or_on_job_failed(self):
+        exhausted = enqueue('tests.flaky', {'failures': 5, 'value': 'x'})
+        rejected = enqueue('tests.invalid')
+        with self.assertLogs('CORE.jobs'):
+            run_pending()
+        exhausted.refresh_from_db()
+        rejected.refresh_from_db()
+        self.assertEqual((exhausted.status, exhausted.attempts), (Job.FAILED, 3))
+        self.assertIn('RuntimeError: transient', exhausted.error)
+        self.assertEqual((rejected.status, rejected.attempts, rejected.error), (Job.FAILED, 1, "Bad input"))
+
+    def test_expired_lease_is_reclaimed(self):
+        lost = enqueue('tests.flaky', {'failures': 0, 'value': 'again'})
+        Job.objects.filter(pk=lost.pk).update(status=Job.RUNNING, attempts=1, locked_until=timezone.now() - timedelta(seconds=1))
+        run_pending()
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.attempts, calls), (Job.SUCCEEDED, 2, ['again']))
+
+    def test_status_api_is_scoped_to_owner(self):
+        own = enqueue('tests.invalid', user=self.user)
+        enqueue('tests.invalid', user=self.other)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual([item['id'] for item in client.get('/api/jobs/').json()['results']], [own.pk])
+        self.assertEqual(client.get(f'/api/jobs/{own.pk}/').json()['status'], Job.QUEUED)
+        self.assertEqual(client.get(f'/api/jobs/{own.pk + 1}/').status_code, 404)
+
+
+class SharedCacheCheckTests(TestCase):
+    def test_warns_about_process_local_cache(self):
+        with override_settings(DEBUG=False):
+            self.assertEqual([warning.id for warning in check_shared_cache(None)], ['CORE.W001'])
+            with override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+                self.assertEqual(check_shared_cache(None), [])
+        with override_settings(DEBUG=True):
+            self.assertEqual(check_shared_cache(None), [])
+
+
+class ChangeStreamTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tester = User.objects.create(email='tester@example.com')
+
+    async def test_tester_only_receives_own_events(self):
+        stream = stream_changes(SimpleNamespace(pk=1, is_staff=False))
+        self.assertIn('event: ready', await anext(stream))
+        await sync_to_async(send)({'type': 'url', 'action': 'updated', 'id': 5, 'tester_id': 2})
+        await sync_to_async(send)({'type': 'url', 'action': 'updated', 'id': 6, 'tester_id': 2, 'previous_tester_id': 1})
+        self.assertEqual(
+            await anext(stream),
+            'event: url\ndata: {"type":"url","action":"updated","id":6,"tester_id":2,"previous_tester_id":1}\n\n',
+        )
+        await stream.aclose()
+        self.assertFalse(bus.subscribers)
+
+    async def test_slow_subscribers_are_told_to_resync(self):
+        stream = stream_changes(SimpleNamespace(pk=1, is_staff=True))
+        await anext(stream)
+        for index in range(SUBSCRIBER_QUEUE_SIZE + 1):
+            await sync_to_async(send)({'type': 'url', 'action': 'updated', 'id': index, 'tester_id': 1})
+        self.assertIn('event: resync', await anext(stream))
+        await stream.aclose()
+
+    @override_settings(CHANGE_POLL_INTERVAL=0.01)
+    async def test_events_of_other_processes_are_relayed(self):
+        stream = stream_changes(SimpleNamespace(pk=1, is_staff=True))
+        await anext(stream)
+        # Lets the poller read where the log currently ends.
+        await asyncio.sleep(0.05)
+        create = sync_to_async(ChangeEvent.objects.create)
+        await create(events=[{'type': 'url', 'action': 'updated', 'id': 1, 'tester_id': 1}], origin=PROCESS_ID)
+        await create(events=[{'type': 'url', 'action': 'updated', 'id': 2, 'tester_id': 1}], origin='worker')
+        self.assertIn('"id":2', await anext(stream))
+        await stream.aclose()
+
+    def test_closed_loops_are_dropped(self):
+        loop = asyncio.new_event_loop()
+        queue = asyncio.Queue()
+        bus.subscribers.add((loop, queue))
+        loop.close()
+        send({'type': 'url', 'action': 'updated', 'id': 1, 'tester_id': 1})
+        self.assertFalse(bus.subscribers)
+        self.assertEqual(ChangeEvent.objects.get().events, [{'type': 'url', 'action': 'updated', 'id': 1, 'tester_id': 1}])
+
+    async def test_stream_requires_a_token(self):
+        response = await self.async_client.get('/api/pentest/changes/stream/')
+        self.assertEqual(response.status_code, 401)
+
+        token = str(AccessToken.for_user(self.tester))
+        response = await self.async_client.get(f'/api/pentest/changes/stream/?token={token}')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        content = response.streaming_content
+        self.assertIn(b'event: ready', await anext(content))
+        await content.aclose()
@@ -3,7 +3,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from .views import TeamViewset, RegisterView, ProfileView, UserViewset, AssessmentViewSet, VulnerabilityViewSet, CompilanceViewSet
+from .views import TeamViewset, RegisterView, ProfileView, UserViewset, AssessmentViewSet, VulnerabilityViewSet, CompilanceViewSet, JobViewSet
 
 router = DefaultRouter()
 router.register(r'compliance', CompilanceViewSet)
@@ -11,6 +11,7 @@ router.register(r'assessments', AssessmentViewSet)
 router.register(r'vulnerabilities', VulnerabilityViewSet)
 router.register(r'teams', TeamViewset)
 router.register(r'users', UserViewset)
+router.register(r'jobs', JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),        
@@ -3,28 +3,35 @@ from rest_framework import generics
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated, IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
-from .models import User, TeamsManagement, Vulnerabilities, AssessmentType, CompilanceType
+from .models import User, TeamsManagement, Vulnerabilities, AssessmentType, CompilanceType, Job
 from .serializer import UserSerializer, TeamsManagementSerializer, RegisterUserSerializer, ProfileSerializer, AssessmentSerializer, \
-    VulnerabilitySerializer, CompilanceSerializer
+    VulnerabilitySerializer, CompilanceSerializer, JobSerializer
+from .cache import CachedReferenceMixin
+from .fieldsets import ShapedQuerysetMixin
+from .middleware import ViewTimingMixin
+from .search import search_vulnerabilities
 from .pagination import StandardResultsSetPagination, GroupedResultsSetPagination
 
-class CompilanceViewSet(viewsets.ModelViewSet):
+class CompilanceViewSet(ViewTimingMixin, CachedReferenceMixin, viewsets.ModelViewSet):
+    cache_tables = ['compliance']
     queryset = CompilanceType.objects.all()
     serializer_class = CompilanceSerializer
     pagination_class = StandardResultsSetPagination
     
-class AssessmentViewSet(viewsets.ModelViewSet):
+class AssessmentViewSet(ViewTimingMixin, CachedReferenceMixin, viewsets.ModelViewSet):
+    cache_tables = ['assessments']
     queryset = AssessmentType.objects.all()
     serializer_class = AssessmentSerializer
     pagination_class = StandardResultsSetPagination
 
-class VulnerabilityViewSet(viewsets.ModelViewSet):
+class VulnerabilityViewSet(ViewTimingMixin, CachedReferenceMixin, ShapedQuerysetMixin, viewsets.ModelViewSet):
+    cache_tables = ['vulnerabilities', 'assessments']
     queryset = Vulnerabilities.objects.select_related("category_of_testing").all()
     serializer_class = VulnerabilitySerializer
     pagination_class = StandardResultsSetPagination
     
     def get_queryset(self):
-        queryset = Vulnerabilities.objects.select_related('category_of_testing').all()
+        queryset = Vulnerabilities.objects.all()
         
         name = self.request.query_params.get('name')
         
@@ -34,11 +41,12 @@ class VulnerabilityViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(category_of_testing__name=assessment_type)
             
         if name is not None:
-            queryset = queryset.filter(name__icontains=name)
+            queryset = search_vulnerabilities(queryset, name)
             
         return queryset
 
-class TeamViewset(viewsets.ModelViewSet):
+class TeamViewset(ViewTimingMixin, CachedReferenceMixin, viewsets.ModelViewSet):
+    cache_tables = ['teams']
     queryset =  TeamsManagement.objects.all()
     serializer_class = TeamsManagementSerializer
     pagination_class = GroupedResultsSetPagination
@@ -48,15 +56,33 @@ class RegisterView(generics.CreateAPIView):
     permission_classes = [IsAdminUser]
     serializer_class = RegisterUserSerializer
         
-class ProfileView(generics.RetrieveUpdateAPIView):
+class ProfileView(ViewTimingMixin, generics.RetrieveUpdateAPIView):
     serializer_class = ProfileSerializer
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user is the cached snapshot, not a model instance.
+        return User.objects.select_related('team').get(pk=self.request.user.pk)
     
-class UserViewset(ModelViewSet):
+class UserViewset(ViewTimingMixin, ShapedQuerysetMixin, ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     # permission_classes = [IsAuthenticated]
-    pagination_class = StandardResultsSetPagination
\ No newline at end of file
+    pagination_class = StandardResultsSetPagination
+
+
+class JobViewSet(ViewTimingMixin, viewsets.ReadOnlyModelViewSet):
+    """Status of background jobs; users see the jobs they started, staff see all."""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = StandardResultsSetPagination
+    
+    def get_queryset(self):
+        queryset = Job.objects.order_by('-id')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by_id=self.request.user.pk)
+        status = self.request.query_params.get('status')
+        if status is not None:
+            queryset = queryset.filter(status=status)
+        return queryset
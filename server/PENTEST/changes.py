@@ -0,0 +1,82 @@
+from collections import Counter, defaultdict
+from CORE.events import publish
+from .models import URL, Findings, POCS
+
+# Change events for the dashboard stream (CORE.events). They carry ids and
+# the tester of the URL concerned, which decides who receives them.
+
+
+def url_tester(url_id):
+    return URL.objects.filter(pk=url_id).values_list('tester_id', flat=True).first()
+
+
+def url_changed(url, action, previous_tester_id=None):
+    event = {'type': 'url', 'action': action, 'id': url.pk, 'tester_id': url.tester_id}
+    if previous_tester_id is not None and previous_tester_id != url.tester_id:
+        # The URL left this tester's queue.
+        event['previous_tester_id'] = previous_tester_id
+    publish(event)
+
+
+def urls_updated(testers):
+    """URLs updated without signals; `testers` maps URL ids to (tester, previous tester)."""
+    per_tester = defaultdict(list)
+    for url_id, (tester_id, previous_tester_id) in testers.items():
+        per_tester[tester_id, previous_tester_id if previous_tester_id != tester_id else None].append(url_id)
+    for (tester_id, previous_tester_id), url_ids in per_tester.items():
+        event = {'type': 'url', 'action': 'updated', 'ids': url_ids, 'tester_id': tester_id}
+        if previous_tester_id is not None:
+            event['previous_tester_id'] = previous_tester_id
+        publish(event)
+
+
+def finding_url(finding_id):
+    """(URL id, tester id) of a stored finding."""
+    return Findings.objects.filter(pk=finding_id).values_list('url_id', 'url__tester_id').first() or (None, None)
+
+
+def finding_changed(finding, action, key=None):
+    """`key` is the finding's rollup key (PENTEST.stats), when the caller has it; it holds the tester."""
+    if key is not None:
+        tester_id = key[2] or None
+    elif Findings.url.is_cached(finding):
+        tester_id = finding.url.tester_id
+    else:
+        tester_id = url_tester(finding.url_id)
+    publish({
+        'type': 'finding', 'action': action, 'id': finding.pk, 'url_id': finding.url_id,
+        'tester_id': tester_id,
+    })
+
+
+def poc_changed(poc, action, url=None):
+    """`url` is the (URL id, tester id) of the POC's finding, when the caller already knows it."""
+    if url is None and POCS.finding.is_cached(poc) and Findings.url.is_cached(poc.finding):
+        url = (poc.finding.url_id, poc.finding.url.tester_id)
+    url_id, tester_id = url or finding_url(poc.finding_id)
+    publish({
+        'type': 'poc', 'action': action, 'id': poc.pk, 'finding_id': poc.finding_id, 'url_id': url_id,
+        'tester_id': tester_id,
+    })
+
+
+def urls_created(client_assessment_id, count):
+    """URLs inserted without signals; new URLs have no tester yet."""
+    publish({'type': 'url', 'action': 'created', 'client_assessment_id': client_assessment_id, 'count': count, 'tester_id': None})
+
+
+def findings_created(findings):
+    """Findings inserted without signals, one event per URL."""
+    per_url = Counter(finding.url_id for finding in findings)
+    testers = dict(URL.objects.filter(pk__in=per_url).values_list('id', 'tester_id'))
+    for url_id, count in per_url.items():
+        publish({'type': 'finding', 'action': 'created', 'url_id': url_id, 'count': count, 'tester_id': testers.get(url_id)})
+
+
+def pocs_created(pocs):
+    """POCs inserted without signals, one event per URL."""
+    findings = Findings.objects.filter(pk__in={poc.finding_id for poc in pocs}).values_list('id', 'url_id', 'url__tester_id')
+    urls = {finding_id: (url_id, tester_id) for finding_id, url_id, tester_id in findings}
+    per_url = Counter(urls[poc.finding_id] for poc in pocs if poc.finding_id in urls)
+    for (url_id, tester_id), count in per_url.items():
+        publish({'type': 'poc', 'action': 'created', 'url_id': url_id, 'count': count, 'tester_id': tester_id})
@@ -0,0 +1,223 @@
+import csv
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.db.models import Count
+from django.utils import timezone
+from .manager import severity_filter
+from .models import Findings
+
+# Rows fetched from the database cursor at a time.
+EXPORT_CHUNK_SIZE = 2000
+# Rows encoded before a chunk of output is handed to the response.
+EXPORT_FLUSH_ROWS = 500
+
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+FINDING_COLUMNS = [
+    ('Client', 'url__client_assessment__client__name'),
+    ('Assessment type', 'url__client_assessment__assessment_type__name'),
+    ('URL', 'url__url'),
+    ('Tester', 'url__tester__email'),
+    ('Start date', 'url__start_date'),
+    ('End date', 'url__end_date'),
+    ('Completed', 'url__is_completed'),
+    ('Vulnerability', 'vulnerability__name'),
+    ('CVSS', 'cvss_score'),
+    ('Base score', 'cvss_base_score'),
+    ('Severity', 'severity'),
+    ('POCs', 'poc_count'),
+]
+
+URL_COLUMNS = [
+    ('Client', 'client_assessment__client__name'),
+    ('Assessment type', 'client_assessment__assessment_type__name'),
+    ('URL', 'url'),
+    ('Tester', 'tester__email'),
+    ('Compliance', 'compliance__name'),
+    ('Start date', 'start_date'),
+    ('End date', 'end_date'),
+    ('QA date', 'qa_date'),
+    ('Completed', 'is_completed'),
+    ('Findings', 'finding_count'),
+    ('Critical', 'critical_count'),
+    ('High', 'high_count'),
+    ('Medium', 'medium_count'),
+    ('Low', 'low_count'),
+]
+
+
+def finding_rows(urls):
+    """Export rows of the findings of `urls`, a URL queryset."""
+    queryset = Findings.objects.filter(url__in=urls.values('pk')).annotate(poc_count=Count('pocs'))
+    return queryset.order_by('url_id', '-cvss_base_score', 'id').values_list(*(lookup for _, lookup in FINDING_COLUMNS))
+
+
+def url_rows(urls):
+    counts = {f'{severity}_count': Count('findings', filter=condition) for severity, condition in severity_filter('findings__').items()}
+    queryset = urls.annotate(finding_count=Count('findings'), **counts)
+    return queryset.order_by('id').values_list(*(lookup for _, lookup in URL_COLUMNS))
+
+
+EXPORTS = {
+    'findings': (FINDING_COLUMNS, finding_rows),
+    'urls': (URL_COLUMNS, url_rows),
+}
+
+
+def cell_converter():
+    """Converts row values to cells, with the current time zone resolved once per export."""
+    current_timezone = timezone.get_current_timezone()
+
+    def convert(value):
+        if isinstance(value, datetime):
+            return (value.astimezone(current_timezone) if timezone.is_aware(value) else value).isoformat()
+        if isinstance(value, date):
+            return value.isoformat()
+        return value
+    return convert
+
+
+class Echo:
+    """File-like object handing back whatever is written to it."""
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    # Spreadsheets evaluate text starting with these as a formula.
+    if isinstance(value, str) and value[:1] in FORMULA_PREFIXES:
+        return f"'{value}"
+    return value
+
+
+def stream_csv(header, rows):
+    writer = csv.writer(Echo())
+    convert = cell_converter()
+    yield writer.writerow(header)
+    buffer = []
+    for row in rows:
+        buffer.append(writer.writerow([csv_cell(convert(value)) for value in row]))
+        if len(buffer) >= EXPORT_FLUSH_ROWS:
+            yield ''.join(buffer)
+            buffer.clear()
+    if buffer:
+        yield ''.join(buffer)
+
+
+class ChunkSink:
+    """
+    Write-only, unseekable file that collects what zipfile writes to it,
+    so the archive can be sent while it is being built.
+    """
+    def __init__(self):
+        self.chunks = []
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def xlsx_workbook(sheet_name):
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+    )
+
+
+def xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    # Inline strings avoid a shared string table, which would have to be
+    # complete before the sheet could be written.
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(str(value))}</t></is></c>'
+
+
+def xlsx_row(values, convert):
+    return f"<row>{''.join(xlsx_cell(convert(value)) for value in values)}</row>"
+
+
+def stream_xlsx(header, rows, sheet_name):
+    """
+    A single-sheet .xlsx workbook, written with zipfile to an unseekable
+    sink and sent every EXPORT_FLUSH_ROWS rows, so memory stays flat.
+    """
+    sink = ChunkSink()
+    convert = cell_converter()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', xlsx_workbook(sheet_name))
+        yield sink.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'.encode()
+            )
+            sheet.write(xlsx_row(header, convert).encode())
+            buffer = []
+            for row in rows:
+                buffer.append(xlsx_row(row, convert))
+                if len(buffer) >= EXPORT_FLUSH_ROWS:
+                    sheet.write(''.join(buffer).encode())
+                    buffer.clear()
+                    yield sink.take()
+            sheet.write(''.join(buffer).encode())
+            sheet.write(b'</sheetData></worksheet>')
+    yield sink.take()
+
+
+def export(kind, urls, file_format):
+    """Chunks of the `kind` export of `urls` in `file_format`, 'csv' or 'xlsx'."""
+    columns, build_rows = EXPORTS[kind]
+    header = [title for title, _ in columns]
+    rows = build_rows(urls).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    if file_format == 'csv':
+        return stream_csv(header, rows)
+    return stream_xlsx(header, rows, kind.capitalize())
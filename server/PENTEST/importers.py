@@ -0,0 +1,214 @@
+import csv
+import io
+import json
+import os
+import re
+import zipfile
+from itertools import islice
+from xml.etree.ElementTree import iterparse
+from django.db import transaction
+from CORE.cvss import score_columns
+from CORE.jobs import report_progress
+from CORE.sync import stamped, touch
+from . import changes, stats
+from .models import ClientAssessmentType, URL, Findings
+
+IMPORT_BATCH_SIZE = 500
+URL_IMPORT_EXTENSIONS = ('.csv', '.xlsx', '.json')
+URL_MAX_LENGTH = URL._meta.get_field('url').max_length
+
+SPREADSHEET_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+CELL_REF_RE = re.compile(r'^([A-Z]+)')
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def iter_csv_rows(upload):
+    text = io.TextIOWrapper(upload, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        text.detach()
+
+
+def column_index(ref, default):
+    match = CELL_REF_RE.match(ref or '')
+    if match is None:
+        return default
+    index = 0
+    for char in match.group(1):
+        index = index * 26 + ord(char) - ord('A') + 1
+    return index - 1
+
+
+def read_shared_strings(archive):
+    try:
+        source = archive.open('xl/sharedStrings.xml')
+    except KeyError:
+        return []
+    strings = []
+    with source:
+        for _, element in iterparse(source):
+            if element.tag == f'{SPREADSHEET_NS}si':
+                strings.append(''.join(node.text or '' for node in element.iter(f'{SPREADSHEET_NS}t')))
+                element.clear()
+    return strings
+
+
+def iter_xlsx_rows(upload):
+    """
+    Rows of the first worksheet of an .xlsx workbook, parsed one <row>
+    element at a time so the sheet is never held in memory.
+    """
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid .xlsx file")
+    with archive:
+        sheets = sorted(name for name in archive.namelist() if re.match(r'^xl/worksheets/sheet\d+\.xml$', name))
+        if not sheets:
+            raise ValueError("The workbook has no worksheets")
+        sheet = 'xl/worksheets/sheet1.xml' if 'xl/worksheets/sheet1.xml' in sheets else sheets[0]
+        shared_strings = read_shared_strings(archive)
+
+        with archive.open(sheet) as source:
+            sheet_data = None
+            for event, element in iterparse(source, events=('start', 'end')):
+                if event == 'start':
+                    if element.tag == f'{SPREADSHEET_NS}sheetData':
+                        sheet_data = element
+                    continue
+                if element.tag != f'{SPREADSHEET_NS}row':
+                    continue
+                row = []
+                for position, cell in enumerate(element.iter(f'{SPREADSHEET_NS}c')):
+                    index = column_index(cell.get('r'), position)
+                    cell_type = cell.get('t')
+                    if cell_type == 'inlineStr':
+                        value = ''.join(node.text or '' for node in cell.iter(f'{SPREADSHEET_NS}t'))
+                    else:
+                        node = cell.find(f'{SPREADSHEET_NS}v')
+                        value = node.text if node is not None and node.text else ''
+                        if cell_type == 's' and value:
+                            # A broken reference leaves the cell empty, so
+                            # its row is counted as invalid.
+                            try:
+                                value = shared_strings[int(value)]
+                            except (IndexError, ValueError):
+                                value = None
+                    row.extend([''] * (index + 1 - len(row)))
+                    row[index] = value
+                yield row
+                if sheet_data is not None:
+                    sheet_data.clear()
+
+
+def iter_urls_from_rows(rows):
+    """
+    URL values of a sheet: the `url` column when the first row is a
+    header naming one, otherwise the first column of every row.
+    """
+    rows = iter(rows)
+    first = next(rows, None)
+    if first is None:
+        return
+    header = [str(cell).strip().lower() for cell in first]
+    if 'url' in header:
+        column = header.index('url')
+    else:
+        column = 0
+        rows = (row for source in ([first], rows) for row in source)
+    for row in rows:
+        yield row[column] if column < len(row) else None
+
+
+def iter_urls_from_upload(upload):
+    extension = os.path.splitext(upload.name or '')[1].lower()
+    if extension == '.csv':
+        return iter_urls_from_rows(iter_csv_rows(upload))
+    if extension == '.xlsx':
+        return iter_urls_from_rows(iter_xlsx_rows(upload))
+    if extension == '.json':
+        try:
+            data = json.load(upload)
+        except ValueError:
+            raise ValueError("Not a valid JSON file")
+        return iter_urls_from_data(data.get('data') if isinstance(data, dict) else data)
+    raise ValueError("Unsupported file type, upload a .csv, .xlsx or .json file")
+
+
+def iter_urls_from_data(data):
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of rows")
+    return (row.get('url') if isinstance(row, dict) else row for row in data)
+
+
+def import_urls(urls, client_assessment_id, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Insert `urls` for a client assessment in batches of `batch_size`, one
+    transaction per batch, and count what was inserted, skipped as a
+    duplicate or rejected as invalid.
+    """
+    result = {'inserted': 0, 'duplicates': 0, 'invalid': 0}
+    client_id, assessment_type_id = ClientAssessmentType.objects.values_list(
+        'client_id', 'assessment_type_id'
+    ).get(pk=client_assessment_id)
+    # bulk_create skips the signals that keep the dashboard rollups current.
+    stat_key = stats.make_url_key(client_id, assessment_type_id, None, None, False)
+
+    for batch in batched(urls, batch_size):
+        candidates = []
+        for value in batch:
+            value = value.strip() if isinstance(value, str) else ''
+            if not value or len(value) > URL_MAX_LENGTH:
+                result['invalid'] += 1
+            else:
+                candidates.append(value)
+
+        unique = list(dict.fromkeys(candidates))
+        result['duplicates'] += len(candidates) - len(unique)
+
+        with transaction.atomic():
+            existing = set(
+                URL.objects.filter(client_assessment_id=client_assessment_id, url__in=unique)
+                .values_list('url', flat=True)
+            )
+            new = [URL(url=value, client_assessment_id=client_assessment_id) for value in unique if value not in existing]
+            URL.objects.bulk_create(new, ignore_conflicts=True)
+            inserted = 0
+            if new:
+                # A concurrent import may have added some of them since the
+                # check; the rows written here are those with our timestamps.
+                stamps = {url.url: url.updated_at for url in new}
+                inserted = sum(
+                    stamps[value] == updated_at for value, updated_at in
+                    URL.objects.filter(client_assessment_id=client_assessment_id, url__in=stamps).values_list('url', 'updated_at')
+                )
+                stamped(URL, min(stamps.values()))
+            if inserted:
+                stats.url_created(stat_key, count=inserted)
+                changes.urls_created(client_assessment_id, inserted)
+
+        result['duplicates'] += len(unique) - inserted
+        result['inserted'] += inserted
+        report_progress(sum(result.values()), message=f"{result['inserted']} URLs added")
+
+    return result
+
+
+def create_findings(findings, batch_size=IMPORT_BATCH_SIZE):
+    """bulk_create `findings` in batches and count them in the dashboard rollups."""
+    for finding in findings:
+        for name, value in score_columns(finding.cvss_score).items():
+            setattr(finding, name, value)
+    created = Findings.objects.bulk_create(findings, batch_size=batch_size)
+    if created:
+        stamped(Findings, min(finding.updated_at for finding in created))
+    stats.findings_created(created)
+    changes.findings_created(created)
+    touch(URL.objects.filter(pk__in={finding.url_id for finding in created}))
+    return created
@@ -0,0 +1,159 @@
+import json
+import logging
+import statistics
+import time
+import warnings
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+from rest_framework.test import APIClient
+from CORE.models import User
+
+
+def router_endpoints():
+    """(name, list path, basename, viewset) of every viewset registered on an app router."""
+    for pattern in get_resolver().url_patterns:
+        router = getattr(getattr(pattern, 'urlconf_module', None), 'router', None)
+        if router is None:
+            continue
+        for prefix, viewset, basename in router.registry:
+            name = f'{pattern.pattern}{prefix}'
+            yield name, reverse(f'{basename}-list'), basename, viewset
+
+
+def get_host():
+    """A host name the test client's requests pass ALLOWED_HOSTS with."""
+    hosts = [host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')]
+    return hosts[0] if hosts else 'localhost'
+
+
+def percentiles(timings):
+    if len(timings) < 2:
+        return {'p50': timings[0], 'p95': timings[0], 'p99': timings[0]}
+    cuts = statistics.quantiles(timings, n=100, method='inclusive')
+    return {'p50': cuts[49], 'p95': cuts[94], 'p99': cuts[98]}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the list and detail endpoint of every registered viewset against the current "
+        "database, e.g. after generate_data, and compare with a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the user to authenticate as; defaults to the first superuser.")
+        parser.add_argument('--requests', type=int, default=20, help="Timed requests per endpoint.")
+        parser.add_argument('--warmup', type=int, default=2, help="Untimed requests per endpoint.")
+        parser.add_argument('--query', default='', help="Query string added to list requests, e.g. 'page_size=100'.")
+        parser.add_argument('--endpoint', action='append', default=[], help="Only run endpoints whose name contains this; repeatable.")
+        parser.add_argument('--output', help="Write the results as JSON to this file, to be used as a baseline.")
+        parser.add_argument('--baseline', help="JSON file of an earlier run to compare against.")
+        parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p95 slowdown over the baseline (0.2 is 20%%).")
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError("--requests must be at least 1.")
+        self.client = APIClient(SERVER_NAME=get_host())
+        self.client.force_authenticate(self.get_user(options['user']))
+        self.options = options
+
+        # One log line per request would drown the report.
+        middleware_logger = logging.getLogger('CORE.middleware')
+        disabled, middleware_logger.disabled = middleware_logger.disabled, True
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore', UnorderedObjectListWarning)
+                results = self.run(options)
+        finally:
+            middleware_logger.disabled = disabled
+
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+        if options['baseline']:
+            self.compare(results)
+
+    def run(self, options):
+        results = {}
+        for name, path, basename, viewset in router_endpoints():
+            if options['endpoint'] and not any(part in name for part in options['endpoint']):
+                continue
+            list_path = f"{path}?{options['query']}" if options['query'] else path
+            results[f'{name} list'], first = self.measure(list_path)
+            if first is None and viewset.queryset is not None:
+                # Serializers that leave out the id.
+                first = viewset.queryset.model._default_manager.order_by('pk').values_list('pk', flat=True).first()
+            if first is not None:
+                results[f'{name} detail'], _ = self.measure(reverse(f'{basename}-detail', args=[first]))
+        return results
+
+    def get_user(self, email):
+        if email:
+            user = User.objects.filter(email=email).first()
+        else:
+            user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+        if user is None:
+            raise CommandError("No user to authenticate as; create a superuser or pass --user.")
+        return user
+
+    def measure(self, path):
+        """Latency percentiles in ms and queries per request of one endpoint, with the first object's id."""
+        for _ in range(self.options['warmup']):
+            self.client.get(path)
+        timings, queries = [], []
+        for _ in range(self.options['requests']):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = self.client.get(path)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+        if response.status_code != 200:
+            raise CommandError(f"GET {path} returned {response.status_code}: {response.content[:200]!r}")
+
+        result = {key: round(value, 2) for key, value in percentiles(timings).items()}
+        result['queries'] = max(queries)
+        result['status'] = response.status_code
+
+        data = response.json()
+        if isinstance(data, dict):
+            data = data.get('results', [])
+        first = data[0].get('id') if data and isinstance(data[0], dict) else None
+        return result, first
+
+    def report(self, results):
+        width = max((len(name) for name in results), default=0)
+        self.stdout.write(f"{'endpoint'.ljust(width)}  {'p50':>8}  {'p95':>8}  {'p99':>8}  queries")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name.ljust(width)}  {result['p50']:8.1f}  {result['p95']:8.1f}  {result['p99']:8.1f}  {result['queries']:>7}"
+            )
+
+    def compare(self, results):
+        with open(self.options['baseline']) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = []
+        for name, result in results.items():
+            previous = baseline.get(name)
+            if previous is None:
+                self.stdout.write(f"{name}: not in the baseline")
+                continue
+            if result['queries'] > previous['queries']:
+                regressions.append(f"{name}: {previous['queries']} -> {result['queries']} queries")
+            if result['p95'] > previous['p95'] * (1 + self.options['tolerance']):
+                regressions.append(f"{name}: p95 {previous['p95']:.1f} -> {result['p95']:.1f} ms")
+        if not self.options['endpoint']:
+            for name in baseline.keys() - results.keys():
+                self.stdout.write(f"{name}: in the baseline but not measured")
+
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+            return
+        for regression in regressions:
+            self.stdout.write(self.style.WARNING(regression))
+        if self.options['fail_on_regression']:
+            raise CommandError(f"{len(regressions)} regressions against the baseline.")
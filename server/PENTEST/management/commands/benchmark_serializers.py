@@ -0,0 +1,96 @@
+import statistics
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from CLIENT.models import ClientAddress, ClientDetail
+from CORE.cvss import score_columns
+from CORE.fieldsets import optimize_queryset
+from CORE.models import AssessmentType, CompilanceType, TeamsManagement, User, Vulnerabilities
+from CORE.rows import RowPlan
+from PENTEST.models import ClientAssessmentType, URL, Findings, POCS
+from PENTEST.serializer import URLSerializer, FindingSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the serializer and values_list() representations of the URL "
+        "and finding lists on sample rows created in a rolled-back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000, help="Rows per list.")
+        parser.add_argument('--page-size', type=int, default=100, help="Rows per page, as requested from the API.")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per representation.")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.create_rows(options['rows'])
+            endpoints = [
+                ('url', URLSerializer, URL.objects.with_finding_counts().order_by('id'), {}),
+                ('findings', FindingSerializer, Findings.objects.order_by('-cvss_base_score', 'id'), {'url': URL.objects.with_finding_counts}),
+            ]
+            for name, serializer_class, queryset, related_querysets in endpoints:
+                self.compare(name, serializer_class, queryset, related_querysets, options)
+            transaction.set_rollback(True)
+
+    def create_rows(self, count):
+        team = TeamsManagement.objects.create(team_name='benchmark team')
+        tester = User.objects.create(email='benchmark@example.com', first_name='Bench', team=team)
+        assessment_type = AssessmentType.objects.create(name='benchmark assessment')
+        compliance = CompilanceType.objects.create(name='benchmark compliance')
+        address = ClientAddress.objects.create(address='-', city='-', postal_code='-', country='-')
+        client = ClientDetail.objects.create(name='Benchmark client', email='client@benchmark.example', phone_code='+1', phone='0', address=address)
+        client_assessment = ClientAssessmentType.objects.create(client=client, assessment_type=assessment_type)
+        vulnerability = Vulnerabilities.objects.create(
+            name='benchmark vulnerability', description='-', remediations='-', impact='-',
+            reference='https://example.com', cvss='7.5', category_of_testing=assessment_type,
+        )
+        now = timezone.now()
+        urls = URL.objects.bulk_create([
+            URL(url=f'https://{index}.benchmark.example', client_assessment=client_assessment, tester=tester,
+                compliance=compliance, start_date=now, end_date=now, qa_date=now)
+            for index in range(count)
+        ])
+        findings = Findings.objects.bulk_create([
+            Findings(url=url, vulnerability=vulnerability, cvss_score=score, **score_columns(score))
+            for url, score in ((url, f'{index % 100 / 10:.1f}') for index, url in enumerate(urls))
+        ])
+        POCS.objects.bulk_create([
+            POCS(finding=finding, steps=step, poc_image=f'poc/{finding.pk}_{step}.png', description='-')
+            for finding in findings for step in (1, 2)
+        ])
+
+    def compare(self, name, serializer_class, queryset, related_querysets, options):
+        renderer = JSONRenderer()
+        count, page_size = options['rows'], options['page_size']
+        pages = [(start, min(start + page_size, count)) for start in range(0, count, page_size)]
+
+        def serialized():
+            optimized = optimize_queryset(queryset, serializer_class(), related_querysets)
+            return [
+                renderer.render(serializer_class(list(optimized[start:stop]), many=True).data)
+                for start, stop in pages
+            ]
+
+        def from_rows():
+            plan = RowPlan(serializer_class(), queryset, related_querysets)
+            rows = plan.rows(queryset)
+            return [renderer.render(plan.build(list(rows[start:stop]))) for start, stop in pages]
+
+        identical = serialized() == from_rows()
+        slow = self.time(serialized, options['repeat'])
+        fast = self.time(from_rows, options['repeat'])
+        self.stdout.write(
+            f"{name}: {count} rows in pages of {page_size}, serializer {slow * 1000:.1f} ms, "
+            f"rows {fast * 1000:.1f} ms, {slow / fast:.1f}x faster, identical output: {identical}"
+        )
+
+    def time(self, function, repeat):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            function()
+            timings.append(time.perf_counter() - start)
+        return statistics.median(timings)
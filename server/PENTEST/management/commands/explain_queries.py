@@ -0,0 +1,90 @@
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from CORE.models import User
+from PENTEST.models import ClientAssessmentType, URL, Findings
+from .benchmark_api import get_host
+
+
+def is_full_scan(line, tables):
+    # SQLite reports "SCAN <table>" without "USING ... INDEX"; PostgreSQL a "Seq Scan".
+    words = line.split()
+    if words[:1] == ['SCAN']:
+        return len(words) > 1 and words[1] in tables and 'USING' not in words
+    return 'Seq Scan' in line
+
+
+class Command(BaseCommand):
+    help = (
+        "Request the hot list and detail endpoints, the tester work queues first, and "
+        "print the EXPLAIN plan of every query they run, flagging full table scans."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Email of the tester whose queues are explained; defaults to the busiest tester.")
+
+    def handle(self, *args, **options):
+        tester = self.get_tester(options['user'])
+        # Completed pentests are admin-only; the flag is never saved.
+        tester.is_staff = True
+        self.client = APIClient(SERVER_NAME=get_host())
+        self.client.force_authenticate(tester)
+
+        in_progress = URL.objects.filter(
+            tester=tester, start_date__isnull=False, end_date__isnull=False, qa_date__isnull=False, compliance__isnull=False,
+        ).values_list('pk', flat=True).first()
+        project = Findings.objects.values_list('url_id', flat=True).first()
+        client = ClientAssessmentType.objects.values_list('client_id', flat=True).first()
+        endpoints = [
+            ('In-progress queue', '/api/pentest/in-progress/'),
+            ('In-progress detail', in_progress and f'/api/pentest/in-progress/{in_progress}/'),
+            ('Completed pentests', '/api/pentest/completed/'),
+            ("A client's URLs", client and f'/api/pentest/url/?client_id={client}'),
+            ("A client's assessments", client and f'/api/pentest/client_assessment/?client={client}'),
+            ("A URL's findings", project and f'/api/pentest/findings/?project_id={project}'),
+        ]
+
+        middleware_logger = logging.getLogger('CORE.middleware')
+        disabled, middleware_logger.disabled = middleware_logger.disabled, True
+        try:
+            scans = sum(self.explain(name, path) for name, path in endpoints if path)
+        finally:
+            middleware_logger.disabled = disabled
+        if scans:
+            self.stdout.write(self.style.WARNING(f"{scans} full table scans."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No full table scans."))
+
+    def get_tester(self, email):
+        if email:
+            tester = User.objects.filter(email=email).first()
+        else:
+            tester = User.objects.annotate(url_count=Count('url')).order_by('-url_count', 'id').first()
+        if tester is None:
+            raise CommandError("No tester found; pass --user or generate data first.")
+        return tester
+
+    def explain(self, name, path):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(path)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{name}: GET {path} ({response.status_code}, {len(captured)} queries)"))
+
+        tables = set(connection.introspection.table_names())
+        scans = 0
+        for query in captured:
+            if not query['sql'].lstrip().upper().startswith('SELECT'):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"{connection.ops.explain_query_prefix()} {query['sql']}")
+                rows = cursor.fetchall()
+            self.stdout.write(f"  {query['sql'][:160]}{'...' if len(query['sql']) > 160 else ''}")
+            for row in rows:
+                line = str(row[-1]) if connection.vendor == 'sqlite' else ' '.join(str(column) for column in row)
+                if is_full_scan(line, tables):
+                    scans += 1
+                    line = self.style.WARNING(line)
+                self.stdout.write(f"    {line}")
+        return scans
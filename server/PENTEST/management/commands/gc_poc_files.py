@@ -0,0 +1,52 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from PENTEST.models import POCS
+from PENTEST.storage import POC_DIRECTORY
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete POC image files that no POCS row references, such as those left by "
+        "rolled back uploads or deletes that bypassed the model signals."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--min-age', type=int, default=getattr(settings, 'POC_FILE_MIN_AGE', 3600),
+            help="Only delete files stored or reused more than this many seconds ago, so uploads still being committed are kept.",
+        )
+        parser.add_argument('--dry-run', action='store_true', help="List the files without deleting them.")
+
+    def handle(self, *args, **options):
+        storage = POCS._meta.get_field('poc_image').storage
+        cutoff = timezone.now() - timedelta(seconds=options['min_age'])
+        if not storage.exists(POC_DIRECTORY):
+            self.stdout.write("No POC files stored.")
+            return
+
+        deleted = 0
+        shards, _ = storage.listdir(POC_DIRECTORY)
+        # One query per top-level shard keeps the referenced names in memory small.
+        for shard in sorted(shards):
+            prefix = f'{POC_DIRECTORY}/{shard}/'
+            referenced = set(POCS.objects.filter(poc_image__startswith=prefix).values_list('poc_image', flat=True))
+            for name in self.files(storage, prefix.rstrip('/')):
+                if name in referenced or storage.get_modified_time(name) > cutoff:
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(name)
+                else:
+                    storage.delete(name)
+                deleted += 1
+
+        verb = "Would delete" if options['dry_run'] else "Deleted"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {deleted} unreferenced POC files."))
+
+    def files(self, storage, directory):
+        directories, files = storage.listdir(directory)
+        for name in files:
+            yield f'{directory}/{name}'
+        for child in directories:
+            yield from self.files(storage, f'{directory}/{child}')
@@ -0,0 +1,160 @@
+import random
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from CLIENT.models import ClientAddress, ClientDetail, normalize_name
+from CORE.cache import invalidate_model
+from CORE.cvss import score_columns
+from CORE.models import AssessmentType, CompilanceType, TeamsManagement, User, Vulnerabilities
+from PENTEST.models import ClientAssessmentType, URL, Findings, POCS
+from PENTEST.stats import rebuild_stats
+
+DEFAULT_ASSESSMENT_TYPES = ['Web Application', 'API', 'Mobile Application', 'Network', 'Cloud Configuration']
+DEFAULT_COMPLIANCE_TYPES = ['CERT-In Security Audit', 'PCI DSS', 'ISO 27001', 'SOC 2']
+CITIES = [('Delhi', 'Delhi', 'India'), ('Mumbai', 'Maharashtra', 'India'), ('Aarhus', 'Central Denmark Region', 'Denmark'), ('Austin', 'Texas', 'USA')]
+WORDS = ['Acme', 'Globex', 'Initech', 'Umbrella', 'Stark', 'Wayne', 'Tyrell', 'Cyberdyne', 'Soylent', 'Hooli', 'Vandelay', 'Wonka']
+SCORES = ['9.8', '9.1', '8.8', '7.5', '7.2', '6.5', '5.3', '4.3', '3.7', '2.6', '0.0']
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a reproducible synthetic data set of clients, client assessments, URLs, "
+        "findings and POCs for load testing, e.g. --clients 10000 --findings-per-url 10."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--assessments-per-client', type=int, default=2)
+        parser.add_argument('--urls-per-assessment', type=int, default=5)
+        parser.add_argument('--findings-per-url', type=int, default=10)
+        parser.add_argument('--pocs-per-finding', type=int, default=1)
+        parser.add_argument('--testers', type=int, default=25)
+        parser.add_argument('--vulnerabilities-per-type', type=int, default=40,
+                            help="Library size for assessment types that have no vulnerabilities yet.")
+        parser.add_argument('--seed', type=int, default=0, help="Same seed and volumes give the same data set.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Clients written per transaction.")
+
+    def handle(self, *args, **options):
+        self.random = random.Random(options['seed'])
+        self.seed = options['seed']
+        if ClientDetail.objects.filter(email=self.client_email(0)).exists():
+            raise CommandError(f"Data for seed {self.seed} already exists; pick another --seed.")
+
+        assessment_types, vulnerabilities = self.create_library(options['vulnerabilities_per_type'])
+        if options['assessments_per_client'] > len(assessment_types):
+            raise CommandError(f"--assessments-per-client can be at most {len(assessment_types)}.")
+        compliance_ids = list(CompilanceType.objects.values_list('id', flat=True))
+        tester_ids = self.create_testers(options['testers'])
+
+        totals = {'clients': 0, 'urls': 0, 'findings': 0, 'pocs': 0}
+        for start in range(0, options['clients'], options['batch_size']):
+            stop = min(start + options['batch_size'], options['clients'])
+            with transaction.atomic():
+                counts = self.create_batch(range(start, stop), options, assessment_types, vulnerabilities, compliance_ids, tester_ids)
+            for key, value in counts.items():
+                totals[key] += value
+            self.stdout.write(f"{totals['clients']} clients, {totals['urls']} URLs, {totals['findings']} findings, {totals['pocs']} POCs")
+
+        rebuild_stats()
+        self.stdout.write(self.style.SUCCESS("Synthetic data generated and dashboard statistics rebuilt."))
+
+    def client_email(self, index):
+        return f'client{index}.seed{self.seed}@generated.example'
+
+    def create_library(self, per_type):
+        if not AssessmentType.objects.exists():
+            AssessmentType.objects.bulk_create([AssessmentType(name=name) for name in DEFAULT_ASSESSMENT_TYPES])
+        if not CompilanceType.objects.exists():
+            CompilanceType.objects.bulk_create([CompilanceType(name=name) for name in DEFAULT_COMPLIANCE_TYPES])
+
+        assessment_types = list(AssessmentType.objects.order_by('id').values_list('id', 'name'))
+        for type_id, type_name in assessment_types:
+            if not Vulnerabilities.objects.filter(category_of_testing_id=type_id).exists():
+                Vulnerabilities.objects.bulk_create([
+                    Vulnerabilities(
+                        name=f'{type_name} issue {number}', description=f'Generated {type_name} vulnerability {number}.',
+                        remediations='Apply the vendor guidance.', impact='Varies.', reference='https://owasp.org/',
+                        cvss=SCORES[number % len(SCORES)], category_of_testing_id=type_id,
+                        **score_columns(SCORES[number % len(SCORES)]),
+                    )
+                    for number in range(1, per_type + 1)
+                ])
+        for model in (AssessmentType, CompilanceType, Vulnerabilities):
+            invalidate_model(model)
+        vulnerabilities = {type_id: [] for type_id, _ in assessment_types}
+        for vulnerability_id, type_id in Vulnerabilities.objects.order_by('id').values_list('id', 'category_of_testing_id'):
+            vulnerabilities[type_id].append(vulnerability_id)
+        return [type_id for type_id, _ in assessment_types], vulnerabilities
+
+    def create_testers(self, count):
+        team, _ = TeamsManagement.objects.get_or_create(team_name='Generated testers')
+        emails = [f'tester{number}.seed{self.seed}@generated.example' for number in range(count)]
+        existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+        User.objects.bulk_create([
+            User(email=email, first_name='Tester', last_name=str(number), team=team, password='!')
+            for number, email in enumerate(emails) if email not in existing
+        ])
+        return list(User.objects.filter(email__in=emails).order_by('id').values_list('id', flat=True))
+
+    def create_batch(self, indexes, options, assessment_types, vulnerabilities, compliance_ids, tester_ids):
+        rand = self.random
+        now = timezone.now()
+
+        addresses = ClientAddress.objects.bulk_create([
+            ClientAddress(address=f'Suite {rand.randint(1, 999)}', city=city, state=state, postal_code=str(rand.randint(100000, 999999)), country=country)
+            for city, state, country in (rand.choice(CITIES) for _ in indexes)
+        ])
+        clients = []
+        for index, address in zip(indexes, addresses):
+            name = f'{rand.choice(WORDS)} {rand.choice(WORDS)} {index}'
+            clients.append(ClientDetail(
+                name=name, name_normalized=normalize_name(name), email=self.client_email(index),
+                phone_code='+91', phone=str(rand.randint(7000000000, 9999999999)), address=address,
+            ))
+        clients = ClientDetail.objects.bulk_create(clients)
+
+        client_assessments = ClientAssessmentType.objects.bulk_create([
+            ClientAssessmentType(client=client, assessment_type_id=type_id)
+            for client in clients
+            for type_id in rand.sample(assessment_types, options['assessments_per_client'])
+        ])
+        client_indexes = {client.pk: index for index, client in zip(indexes, clients)}
+
+        urls = []
+        for client_assessment in client_assessments:
+            host = f'client{client_indexes[client_assessment.client_id]}.seed{self.seed}.generated.example'
+            for number in range(options['urls_per_assessment']):
+                start = now - timedelta(days=rand.randint(0, 365))
+                assigned = rand.random() < 0.8
+                urls.append(URL(
+                    url=f'https://app{number}.{host}/{client_assessment.assessment_type_id}/',
+                    client_assessment=client_assessment,
+                    tester_id=rand.choice(tester_ids) if assigned and tester_ids else None,
+                    compliance_id=rand.choice(compliance_ids) if assigned and compliance_ids else None,
+                    start_date=start if assigned else None,
+                    end_date=start + timedelta(days=14) if assigned else None,
+                    qa_date=start + timedelta(days=21) if assigned else None,
+                    is_completed=assigned and rand.random() < 0.5,
+                ))
+        urls = URL.objects.bulk_create(urls)
+
+        findings = []
+        for url in urls:
+            library = vulnerabilities[url.client_assessment.assessment_type_id]
+            pairs = set()
+            while library and len(pairs) < min(options['findings_per_url'], len(library) * len(SCORES)):
+                pairs.add((rand.choice(library), rand.choice(SCORES)))
+            findings.extend(
+                Findings(url=url, vulnerability_id=vulnerability_id, cvss_score=score, **score_columns(score))
+                for vulnerability_id, score in sorted(pairs)
+            )
+        findings = Findings.objects.bulk_create(findings, batch_size=5000)
+
+        pocs = POCS.objects.bulk_create([
+            POCS(finding=finding, steps=step, poc_image='', description=f'Step {step}: reproduce against {finding.url.url}')
+            for finding in findings
+            for step in range(1, options['pocs_per_finding'] + 1)
+        ], batch_size=5000)
+
+        return {'clients': len(clients), 'urls': len(urls), 'findings': len(findings), 'pocs': len(pocs)}
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from PENTEST.stats import rebuild_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard rollup tables from the URL, Findings and POCS rows."
+
+    def handle(self, *args, **options):
+        rebuild_stats()
+        self.stdout.write(self.style.SUCCESS("Dashboard statistics rebuilt."))
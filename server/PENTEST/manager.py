@@ -0,0 +1,20 @@
+from django.db import models
+from django.db.models import Count, Q
+from CORE.cvss import SEVERITY_BANDS
+
+
+def severity_filter(prefix=''):
+    """
+    Q filters selecting the findings of each severity band, keyed by
+    band name. `prefix` is the path to the findings relation.
+    """
+    return {severity: Q(**{f'{prefix}severity': severity}) for severity, _ in SEVERITY_BANDS}
+
+
+class URLQuerySet(models.QuerySet):
+    def with_finding_counts(self):
+        counts = {
+            f'{severity}_findings': Count('findings', filter=condition)
+            for severity, condition in severity_filter('findings__').items()
+        }
+        return self.annotate(finding_counts=Count('findings'), **counts)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PENTEST', '0003_alter_findings_options_pocs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pocs',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('ready', 'Ready'), ('rejected', 'Rejected')], default='ready', max_length=10),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PENTEST', '0004_pocs_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FindingStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.PositiveBigIntegerField()),
+                ('assessment_type_id', models.PositiveBigIntegerField()),
+                ('tester_id', models.PositiveBigIntegerField(default=0)),
+                ('compliance_id', models.PositiveBigIntegerField(default=0)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('severity', models.CharField(blank=True, default='', max_length=10)),
+                ('finding_count', models.IntegerField(default=0)),
+                ('poc_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed', 'severity'), name='unique_finding_stat')],
+            },
+        ),
+        migrations.CreateModel(
+            name='URLStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('client_id', models.PositiveBigIntegerField()),
+                ('assessment_type_id', models.PositiveBigIntegerField()),
+                ('tester_id', models.PositiveBigIntegerField(default=0)),
+                ('compliance_id', models.PositiveBigIntegerField(default=0)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('url_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed'), name='unique_url_stat')],
+            },
+        ),
+    ]
@@ -0,0 +1,80 @@
+import re
+from collections import defaultdict
+from django.db import migrations
+from django.db.models import Count, F
+
+# What PENTEST.stats computed when this migration was written. Migrations
+# keep their own copy so that later changes to the live code can't change
+# or break them.
+URL_KEY = ('client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed')
+URL_DIMENSIONS = [
+    'client_assessment__client_id',
+    'client_assessment__assessment_type_id',
+    'tester_id',
+    'compliance_id',
+    'is_completed',
+]
+SEVERITY_BANDS = [('critical', 9.0), ('high', 7.0), ('medium', 4.0), ('low', 0.1)]
+SCORE_RE = re.compile(r'^\s*(\d+(?:\.\d+)?)')
+
+
+def severity_key(cvss_score):
+    match = SCORE_RE.match(str(cvss_score)) if cvss_score is not None else None
+    if match is None:
+        return ''
+    score = float(match.group(1))
+    return next((severity for severity, lower in SEVERITY_BANDS if score >= lower), '')
+
+
+def make_url_key(client_id, assessment_type_id, tester_id, compliance_id, is_completed):
+    return (client_id, assessment_type_id, tester_id or 0, compliance_id or 0, bool(is_completed))
+
+
+def rebuild(apps, schema_editor):
+    URL = apps.get_model('PENTEST', 'URL')
+    Findings = apps.get_model('PENTEST', 'Findings')
+    POCS = apps.get_model('PENTEST', 'POCS')
+    URLStat = apps.get_model('PENTEST', 'URLStat')
+    FindingStat = apps.get_model('PENTEST', 'FindingStat')
+
+    dimensions = {f'dim_{index}': lookup for index, lookup in enumerate(URL_DIMENSIONS)}
+
+    def key(row):
+        return make_url_key(*(row[name] for name in dimensions))
+
+    url_counts = defaultdict(int)
+    for row in URL.objects.values(**{name: F(lookup) for name, lookup in dimensions.items()}).annotate(total=Count('id')).order_by():
+        url_counts[key(row)] += row['total']
+
+    finding_counts = defaultdict(lambda: [0, 0])
+    finding_dimensions = {name: F(f'url__{lookup}') for name, lookup in dimensions.items()}
+    for row in Findings.objects.values('cvss_score', **finding_dimensions).annotate(total=Count('id')).order_by():
+        finding_counts[key(row) + (severity_key(row['cvss_score']),)][0] += row['total']
+    poc_dimensions = {name: F(f'finding__url__{lookup}') for name, lookup in dimensions.items()}
+    for row in POCS.objects.values(score=F('finding__cvss_score'), **poc_dimensions).annotate(total=Count('id')).order_by():
+        finding_counts[key(row) + (severity_key(row['score']),)][1] += row['total']
+
+    URLStat.objects.all().delete()
+    FindingStat.objects.all().delete()
+    URLStat.objects.bulk_create(
+        [URLStat(url_count=count, **dict(zip(URL_KEY, url_key))) for url_key, count in url_counts.items()],
+        batch_size=1000,
+    )
+    FindingStat.objects.bulk_create(
+        [
+            FindingStat(finding_count=findings, poc_count=pocs, **dict(zip(URL_KEY + ('severity',), finding_key)))
+            for finding_key, (findings, pocs) in finding_counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PENTEST', '0005_dashboard_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:51
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CLIENT', '0003_clientdetail_name_normalized'),
+        ('CORE', '0002_vulnerabilities_fts'),
+        ('PENTEST', '0006_rebuild_dashboard_stats'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clientassessmenttype',
+            index=models.Index(fields=['client', 'assessment_type'], name='client_assessment_client_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='findings',
+            index=models.Index(fields=['url', 'cvss_score'], name='finding_url_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(fields=['tester', 'is_completed', 'id'], name='url_tester_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='url',
+            index=models.Index(condition=models.Q(('compliance__isnull', False), ('end_date__isnull', False), ('is_completed', False), ('qa_date__isnull', False), ('start_date__isnull', False)), fields=['tester', 'id'], name='url_in_progress_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('CORE', '0003_vulnerabilities_score_columns'),
+        ('PENTEST', '0007_work_queue_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='findings',
+            name='finding_url_score_idx',
+        ),
+        migrations.AddField(
+            model_name='findings',
+            name='cvss_base_score',
+            field=models.DecimalField(decimal_places=1, default=0, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='findings',
+            name='severity',
+            field=models.CharField(blank=True, default='', max_length=10),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:02
+
+import PENTEST.models
+import PENTEST.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PENTEST', '0009_backfill_finding_scores'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pocs',
+            name='poc_image',
+            field=models.ImageField(storage=PENTEST.storage.ContentAddressedStorage(), upload_to=PENTEST.models.get_client_poc_path),
+        ),
+        migrations.AddIndex(
+            model_name='pocs',
+            index=models.Index(fields=['poc_image'], name='poc_image_idx'),
+        ),
+    ]
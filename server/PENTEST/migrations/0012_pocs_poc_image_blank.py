@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-18 20:39
+
+import PENTEST.models
+import PENTEST.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('PENTEST', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pocs',
+            name='poc_image',
+            field=models.ImageField(blank=True, storage=PENTEST.storage.ContentAddressedStorage(), upload_to=PENTEST.models.get_client_poc_path),
+        ),
+    ]
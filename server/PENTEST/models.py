@@ -1,8 +1,14 @@
 import os
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
+from CORE.cvss import score_columns
 from CORE.models import AssessmentType, CompilanceType, Vulnerabilities
 from CLIENT.models import ClientDetail
 from django.contrib.auth import get_user_model
+from .manager import URLQuerySet
+from .storage import ContentAddressedStorage, content_hash, poc_path
 
 TESTER = get_user_model()
 
@@ -12,6 +18,10 @@ class ClientAssessmentType(models.Model):
     
     class Meta:
         unique_together = ('assessment_type', 'client')
+        indexes = [
+            # The unique index leads with assessment_type; lookups start from the client.
+            models.Index(fields=['client', 'assessment_type'], name='client_assessment_client_idx'),
+        ]
         
     def __str__(self):
         return f"{self.client.name} - {self.assessment_type.name}"
@@ -26,9 +36,29 @@ class URL(models.Model):
     tester = models.ForeignKey(TESTER, on_delete=models.DO_NOTHING, null=True, blank=True)
     compliance = models.ForeignKey(CompilanceType, on_delete=models.CASCADE, null=True, blank=True)
     is_completed=models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    objects = URLQuerySet.as_manager()
     
     class Meta:
         unique_together = ('url', 'client_assessment')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'], name='url_updated_idx'),
+            # A tester's completed URLs, and their open ones on the detail view.
+            models.Index(fields=['tester', 'is_completed', 'id'], name='url_tester_queue_idx'),
+            # A tester's in-progress queue: scheduled, assigned and not completed.
+            models.Index(
+                fields=['tester', 'id'],
+                name='url_in_progress_idx',
+                condition=models.Q(
+                    is_completed=False,
+                    start_date__isnull=False,
+                    end_date__isnull=False,
+                    qa_date__isnull=False,
+                    compliance__isnull=False,
+                ),
+            ),
+        ]
     
     def __str__(self):
         return f"{self.client_assessment.assessment_type}-{self.url})"
@@ -38,26 +68,113 @@ class Findings(models.Model):
     url = models.ForeignKey(URL, related_name="findings", on_delete=models.CASCADE)
     vulnerability = models.ForeignKey(Vulnerabilities, on_delete=models.SET_NULL, null=True)
     cvss_score = models.CharField(max_length=255, null=False)
+    # Parsed from cvss_score on save; bulk inserts fill them with CORE.cvss.score_columns.
+    cvss_base_score = models.DecimalField(max_digits=3, decimal_places=1, default=0)
+    severity = models.CharField(max_length=10, blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ('url', 'vulnerability', 'cvss_score')
         verbose_name = 'Vulnerabily Findings'
+        indexes = [
+            # All findings, and a URL's findings, ordered by score.
+            models.Index(fields=['-cvss_base_score', 'id'], name='finding_base_score_idx'),
+            models.Index(fields=['url', '-cvss_base_score', 'id'], name='finding_url_base_score_idx'),
+            models.Index(fields=['severity', '-cvss_base_score', 'id'], name='finding_severity_idx'),
+            models.Index(fields=['updated_at', 'id'], name='finding_updated_idx'),
+        ]
+        
+    def save(self, *args, **kwargs):
+        for name, value in score_columns(self.cvss_score).items():
+            setattr(self, name, value)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'cvss_score' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'cvss_base_score', 'severity'}
+        super().save(*args, **kwargs)
         
   
 def get_client_poc_path(instance, filename):
-    try:
-        client_name = instance.finding.url.client_assessment.client.name
-        clean_client_name = "".join(x for x in client_name if x.isalnum() or x in " _-").strip().replace(" ", "_")
-    except AttributeError:
-        clean_client_name = "unknown_client"
-    return os.path.join('clients', clean_client_name, 'pocs', filename)
+    """POC images are stored by the sha256 of their content, shared by every POC with the same bytes."""
+    ext = os.path.splitext(filename)[1].lower().lstrip('.')
+    return poc_path(content_hash(instance.poc_image), ext)
         
         
 class POCS(models.Model):
+    PENDING = 'pending'
+    READY = 'ready'
+    REJECTED = 'rejected'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (READY, 'Ready'),
+        (REJECTED, 'Rejected'),
+    ]
+    
     steps = models.PositiveBigIntegerField()
-    poc_image = models.ImageField(upload_to=get_client_poc_path)
+    # Blank for POCs without a screenshot, e.g. scanner imports: they get
+    # no thumbnail and no image in reports.
+    poc_image = models.ImageField(upload_to=get_client_poc_path, storage=ContentAddressedStorage(), blank=True)
     description = models.TextField()
     finding = models.ForeignKey(Findings, on_delete=models.CASCADE, related_name='pocs') 
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=READY)
+    
+    class Meta:
+        indexes = [
+            # Images are reference counted by the rows naming them.
+            models.Index(fields=['poc_image'], name='poc_image_idx'),
+        ]
+    
+    @classmethod
+    def release_image(cls, name):
+        """
+        Delete the stored image `name` unless a POC still references it or
+        it was stored or reused within POC_FILE_MIN_AGE seconds.
+        """
+        if not name or cls.objects.filter(poc_image=name).exists():
+            return
+        storage = cls._meta.get_field('poc_image').storage
+        cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'POC_FILE_MIN_AGE', 3600))
+        try:
+            if storage.get_modified_time(name) <= cutoff:
+                storage.delete(name)
+        except FileNotFoundError:
+            pass
+    
     
+        
+
+# Dashboard rollups, kept up to date by PENTEST.stats. Dimensions are plain
+# ids (0 when unassigned) so that every combination has exactly one row.
+class URLStat(models.Model):
+    client_id = models.PositiveBigIntegerField()
+    assessment_type_id = models.PositiveBigIntegerField()
+    tester_id = models.PositiveBigIntegerField(default=0)
+    compliance_id = models.PositiveBigIntegerField(default=0)
+    is_completed = models.BooleanField(default=False)
+    url_count = models.IntegerField(default=0)
     
-        
\ No newline at end of file
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed'],
+                name='unique_url_stat',
+            ),
+        ]
+        
+        
+class FindingStat(models.Model):
+    client_id = models.PositiveBigIntegerField()
+    assessment_type_id = models.PositiveBigIntegerField()
+    tester_id = models.PositiveBigIntegerField(default=0)
+    compliance_id = models.PositiveBigIntegerField(default=0)
+    is_completed = models.BooleanField(default=False)
+    severity = models.CharField(max_length=10, blank=True, default='')
+    finding_count = models.IntegerField(default=0)
+    poc_count = models.IntegerField(default=0)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed', 'severity'],
+                name='unique_finding_stat',
+            ),
+        ]
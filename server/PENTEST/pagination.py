@@ -1,17 +1 @@
-from rest_framework.pagination import PageNumberPagination
-
-
-class GroupedResultsSetPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = 'page_size'
-    max_page_size = 50
-    
-class StandardResultsSetPagination(PageNumberPagination):
-    page_size = 10
-    page_size_query_param = 'page_size'
-    max_page_size = 100
-    
-class LargeResultsSetPagination(PageNumberPagination):
-    page_size = 20
-    page_size_query_param = 'page_size'
-    max_page_size = 1000
\ No newline at end of file
+from CORE.pagination import GroupedResultsSetPagination, StandardResultsSetPagination, LargeResultsSetPagination
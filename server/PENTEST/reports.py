@@ -0,0 +1,121 @@
+import base64
+import logging
+import mimetypes
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from django.db.models import Count, Prefetch
+from django.template.loader import render_to_string
+from django.utils import timezone
+from CORE.cvss import SEVERITY_BANDS
+from .manager import severity_filter
+from .models import Findings, POCS
+
+logger = logging.getLogger(__name__)
+
+REPORT_IMAGE_WORKERS = 4
+# Findings whose POC images are loaded at once; bounds the report's memory.
+REPORT_WINDOW = 16
+
+image_executor = ThreadPoolExecutor(max_workers=REPORT_IMAGE_WORKERS, thread_name_prefix='report-images')
+
+
+def encode_image(field_file):
+    """The image as a data: URI, or None if it can't be read."""
+    if not field_file:
+        return None
+    content_type = mimetypes.guess_type(field_file.name)[0] or 'application/octet-stream'
+    try:
+        with field_file.open('rb') as source:
+            content = base64.b64encode(source.read()).decode('ascii')
+    except OSError as e:
+        logger.warning("Could not embed POC image %s: %s", field_file.name, e)
+        return None
+    return f"data:{content_type};base64,{content}"
+
+
+class ReportBuilder:
+    """
+    Renders the findings of a client assessment, or of a single URL, as
+    an HTML report streamed chunk by chunk. Findings are read in one pass
+    over a prefetched query. The POC images of each window of findings are
+    encoded in parallel on a thread pool while the previous window is sent,
+    so at most two windows of images are held in memory.
+    """
+    def __init__(self, client_assessment=None, url=None):
+        if (client_assessment is None) == (url is None):
+            raise ValueError("Pass either a client assessment or a URL")
+        self.client_assessment = client_assessment
+        self.url = url
+
+    @property
+    def title(self):
+        if self.url is not None:
+            return f"Penetration test report: {self.url.url}"
+        client_assessment = self.client_assessment
+        return f"{client_assessment.client.name} - {client_assessment.assessment_type.name} penetration test report"
+
+    @property
+    def filename(self):
+        if self.url is not None:
+            return f"report_url_{self.url.pk}.html"
+        return f"report_client_assessment_{self.client_assessment.pk}.html"
+
+    def get_findings(self):
+        if self.url is not None:
+            queryset = Findings.objects.filter(url=self.url)
+        else:
+            queryset = Findings.objects.filter(url__client_assessment=self.client_assessment)
+        return queryset
+
+    def get_summary(self):
+        counts = self.get_findings().aggregate(
+            total=Count('id'),
+            **{severity: Count('id', filter=condition) for severity, condition in severity_filter().items()}
+        )
+        summary = [(severity, counts[severity]) for severity, _ in SEVERITY_BANDS]
+        return summary, counts['total']
+
+    def iter_findings(self):
+        pocs = POCS.objects.exclude(status=POCS.REJECTED).order_by('steps', 'id')
+        return self.get_findings().select_related(
+            'url', 'url__tester', 'url__compliance', 'url__client_assessment__assessment_type',
+            'vulnerability',
+        ).prefetch_related(
+            Prefetch('pocs', queryset=pocs)
+        ).order_by('url__url', 'url_id', '-cvss_base_score', 'id').iterator(chunk_size=REPORT_WINDOW * 4)
+
+    def load_window(self, findings):
+        return [
+            (finding, [(poc, image_executor.submit(encode_image, poc.poc_image)) for poc in finding.pocs.all()])
+            for finding in islice(findings, REPORT_WINDOW)
+        ]
+
+    def render(self):
+        summary, total = self.get_summary()
+        yield render_to_string('PENTEST/report/header.html', {
+            'title': self.title,
+            'generated_at': timezone.now(),
+            'summary': summary,
+            'total': total,
+        })
+
+        findings = self.iter_findings()
+        current_url = None
+        window = self.load_window(findings)
+        while window:
+            # Start encoding the next window's images before this one is sent.
+            following = self.load_window(findings)
+            for finding, pocs in window:
+                chunk = ''
+                if finding.url_id != current_url:
+                    current_url = finding.url_id
+                    chunk += render_to_string('PENTEST/report/url.html', {'url': finding.url})
+                chunk += render_to_string('PENTEST/report/finding.html', {
+                    'finding': finding,
+                    'severity': finding.severity,
+                    'pocs': [(poc, future.result()) for poc, future in pocs],
+                })
+                yield chunk
+            window = following
+
+        yield render_to_string('PENTEST/report/footer.html')
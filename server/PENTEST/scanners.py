@@ -0,0 +1,232 @@
+from xml.etree.ElementTree import ParseError, iterparse
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils.html import strip_tags
+from CLIENT.models import normalize_name
+from CORE.cvss import CRITICAL, HIGH, MEDIUM, LOW, SEVERITY_BANDS, parse_score
+from CORE.models import Vulnerabilities
+from CORE.sync import touch
+from . import changes, stats
+from .importers import IMPORT_BATCH_SIZE, create_findings
+from .models import Findings, POCS
+
+# Scanners report a qualitative severity; findings get the lower bound of its band.
+SEVERITY_SCORES = {severity: f'{score:.1f}' for severity, score in SEVERITY_BANDS}
+
+BURP_SEVERITIES = {'high': HIGH, 'medium': MEDIUM, 'low': LOW}
+NESSUS_SEVERITIES = {'4': CRITICAL, '3': HIGH, '2': MEDIUM, '1': LOW}
+ZAP_SEVERITIES = {'3': HIGH, '2': MEDIUM, '1': LOW}
+
+
+class ScanFormatError(ValueError):
+    pass
+
+
+def text(element, tag):
+    child = element.find(tag)
+    return strip_tags(child.text or '').strip() if child is not None else ''
+
+
+def issue(name, category, score, detail):
+    """One occurrence of a scanner issue; informational ones have no score."""
+    return {'name': name, 'category': category, 'score': score, 'detail': detail}
+
+
+def iter_burp(events):
+    for event, element in events:
+        if event == 'end' and element.tag == 'issue':
+            severity = BURP_SEVERITIES.get(text(element, 'severity').lower())
+            location = text(element, 'host') + text(element, 'location')
+            detail = '\n\n'.join(part for part in (location, text(element, 'issueDetail')) if part)
+            yield issue(text(element, 'name'), text(element, 'type'), SEVERITY_SCORES.get(severity), detail)
+
+
+def iter_nessus(events):
+    host = ''
+    for event, element in events:
+        if event == 'start' and element.tag == 'ReportHost':
+            host = element.get('name', '')
+        elif event == 'end' and element.tag == 'ReportItem':
+            score = text(element, 'cvss3_base_score') or text(element, 'cvss_base_score')
+            if parse_score(score) is None:
+                score = SEVERITY_SCORES.get(NESSUS_SEVERITIES.get(element.get('severity')))
+            location = f"{host}:{element.get('port', '')}/{element.get('protocol', '')} ({element.get('svc_name', '')})"
+            detail = '\n\n'.join(part for part in (location, text(element, 'plugin_output')) if part)
+            yield issue(element.get('pluginName', ''), element.get('pluginFamily', ''), score, detail)
+
+
+def iter_zap(events):
+    for event, element in events:
+        if event == 'end' and element.tag == 'alertitem':
+            name = text(element, 'alert') or text(element, 'name')
+            score = SEVERITY_SCORES.get(ZAP_SEVERITIES.get(text(element, 'riskcode')))
+            category = f"CWE-{text(element, 'cweid')}" if text(element, 'cweid') else ''
+            instances = element.findall('instances/instance') or [element]
+            for instance in instances:
+                lines = [f"{text(instance, 'method')} {text(instance, 'uri')}".strip()]
+                for field in ('param', 'attack', 'evidence'):
+                    if text(instance, field):
+                        lines.append(f"{field}: {text(instance, field)}")
+                yield issue(name, category, score, '\n'.join(line for line in lines if line))
+
+
+# Root tag: (issue parser, tags of the elements to drop once they are parsed).
+SCANNER_FORMATS = {
+    'issues': (iter_burp, {'issue'}),
+    'NessusClientData_v2': (iter_nessus, {'ReportItem', 'ReportHost'}),
+    'OWASPZAPReport': (iter_zap, {'alertitem', 'site'}),
+}
+
+
+def scan_parser(root):
+    if root.tag not in SCANNER_FORMATS:
+        raise ScanFormatError(f"Unsupported scan format '{root.tag}'; expected a Burp, Nessus or ZAP XML export")
+    return SCANNER_FORMATS[root.tag]
+
+
+def check_scan_format(source):
+    """Raise ScanFormatError unless `source` starts like a supported export; rewinds it."""
+    try:
+        _, root = next(iterparse(source, events=('start',)))
+    except StopIteration:
+        raise ScanFormatError("The scan file is empty")
+    except ParseError as e:
+        raise ScanFormatError(f"The scan file is malformed ({e})")
+    finally:
+        source.seek(0)
+    scan_parser(root)
+
+
+def iter_scan_issues(source):
+    """
+    Issues of a Burp, Nessus or ZAP XML export, read in a single pass.
+    Issue and host elements are cleared and detached from their parent as
+    soon as the parser is done with them, so memory stays bounded by the
+    largest single issue rather than by the file.
+    """
+    events = iterparse(source, events=('start', 'end'))
+    try:
+        _, root = next(events)
+    except StopIteration:
+        raise ScanFormatError("The scan file is empty")
+    parser, released = scan_parser(root)
+
+    def stream():
+        parents = [root]
+        for event, element in events:
+            if event == 'start':
+                parents.append(element)
+                yield event, element
+                continue
+            parents.pop()
+            yield event, element
+            # The parser asks for the next event only once it is done with this one.
+            if element.tag in released:
+                element.clear()
+                parents[-1].remove(element)
+
+    yield from parser(stream())
+
+
+class VulnerabilityMatcher:
+    """
+    Picks the library vulnerability for a scanner issue, among those of
+    the URL's assessment type: by name, then through the
+    SCANNER_VULNERABILITY_MAP setting (issue name or category to
+    vulnerability name), then the default vulnerability.
+    """
+    def __init__(self, assessment_type_id, default=None):
+        names = Vulnerabilities.objects.filter(category_of_testing_id=assessment_type_id).values_list('id', 'name')
+        self.by_name = {normalize_name(name): pk for pk, name in names}
+        self.mapping = {
+            normalize_name(key): self.by_name.get(normalize_name(value))
+            for key, value in getattr(settings, 'SCANNER_VULNERABILITY_MAP', {}).items()
+        }
+        if default is None and getattr(settings, 'SCANNER_DEFAULT_VULNERABILITY', None):
+            default = self.by_name.get(normalize_name(settings.SCANNER_DEFAULT_VULNERABILITY))
+        self.default = default
+
+    def match(self, name, category):
+        name, category = normalize_name(name), normalize_name(category)
+        return self.by_name.get(name) or self.mapping.get(name) or self.mapping.get(category) or self.default
+
+
+def import_scan(source, url, default_vulnerability_id=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Add the issues of a scanner export to `url`, one transaction per
+    `batch_size` issues. Each (vulnerability, score) pair becomes one
+    finding, reusing an existing one, and every occurrence of an issue
+    becomes one of its POCs. Scanners provide no screenshot, so these
+    POCs have no image. A batch that fails on a database constraint, e.g.
+    because a concurrent import created one of its findings, is skipped and
+    counted as `failed` with its error. If the file turns out to be
+    malformed part way, the batches before the error stay imported; the
+    ScanFormatError raised carries their counts as `result`.
+    """
+    matcher = VulnerabilityMatcher(url.client_assessment.assessment_type_id, default_vulnerability_id)
+    result = {'issues': 0, 'findings': 0, 'pocs': 0, 'informational': 0, 'unmatched': 0, 'failed': 0, 'errors': []}
+
+    findings, steps = {}, {}
+    existing = url.findings.values_list('id', 'vulnerability_id', 'cvss_score').annotate(last_step=Max('pocs__steps'))
+    for pk, vulnerability_id, score, last_step in existing.order_by():
+        findings[vulnerability_id, score] = pk
+        steps[vulnerability_id, score] = last_step or 0
+    pending = []
+
+    @transaction.atomic
+    def save_batch():
+        missing = list(dict.fromkeys(key for key, _ in pending if key not in findings))
+        created = create_findings([
+            Findings(url=url, vulnerability_id=vulnerability_id, cvss_score=score)
+            for vulnerability_id, score in missing
+        ], batch_size=batch_size)
+        findings.update({key: finding.pk for key, finding in zip(missing, created)})
+        pocs = POCS.objects.bulk_create([
+            POCS(finding_id=findings[key], **fields) for key, fields in pending
+        ], batch_size=batch_size)
+        stats.pocs_created(pocs)
+        changes.pocs_created(pocs)
+        touch(Findings.objects.filter(pk__in={poc.finding_id for poc in pocs}))
+        return len(created), len(pocs)
+
+    def flush():
+        try:
+            created, pocs = save_batch()
+        except IntegrityError as e:
+            result['failed'] += len(pending)
+            result['errors'].append(str(e))
+            # The batch was rolled back; later ones reuse the findings that did commit.
+            findings.clear()
+            findings.update({(vulnerability_id, score): pk for pk, vulnerability_id, score in url.findings.values_list('id', 'vulnerability_id', 'cvss_score')})
+        else:
+            result['findings'] += created
+            result['pocs'] += pocs
+        pending.clear()
+
+    try:
+        for found in iter_scan_issues(source):
+            result['issues'] += 1
+            if found['score'] is None:
+                result['informational'] += 1
+                continue
+            vulnerability_id = matcher.match(found['name'], found['category'])
+            if vulnerability_id is None:
+                result['unmatched'] += 1
+                continue
+            key = (vulnerability_id, found['score'])
+            steps[key] = steps.get(key, 0) + 1
+            pending.append((key, {
+                'steps': steps[key],
+                'poc_image': '',
+                'description': f"{found['name']}\n\n{found['detail']}".strip(),
+            }))
+            if len(pending) >= batch_size:
+                flush()
+    except ParseError as e:
+        error = ScanFormatError(f"The scan file is malformed ({e}); {result['pocs']} issues before the error were imported")
+        error.result = result
+        raise error from e
+    flush()
+
+    return result
@@ -1,10 +1,32 @@
 import base64
+import logging
+import os
 import uuid
 from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 from .models import ClientAssessmentType, URL, Findings, POCS
-from CORE.models import CompilanceType, User, Vulnerabilities
-from CORE.serializer import CompilanceSerializer, UserSerializer, VulnerabilitySerializer
+from .tasks import schedule_poc_processing
+from .importers import create_findings
+from . import changes, stats
+from CORE.cvss import CRITICAL, HIGH, MEDIUM, LOW
+from CORE.renditions import RenditionURLField
+from CORE.sync import stamped
+from CORE.models import AssessmentType, CompilanceType, User, Vulnerabilities
+from CORE.serializer import CompilanceSerializer, UserSerializer, VulnerabilitySerializer, check_cvss
+
+logger = logging.getLogger(__name__)
+
+POC_UPLOAD_EXTENSIONS = ['png', 'jpg', 'jpeg', 'gif', 'webp', 'bmp', 'tiff']
+BULK_FINDINGS_LIMIT = 1000
+BULK_URLS_LIMIT = 5000
+# Ids per UPDATE, within the parameter limits of every backend.
+BULK_UPDATE_BATCH_SIZE = 900
+
+
+def category_mismatch(assessment_name, category_name):
+    return f"Mismatch: URL Assessment is '{assessment_name}', but Vulnerability Category is '{category_name}'."
  
 class ClientAssessmentTypeSerializer(serializers.ModelSerializer):
     client_name = serializers.CharField(source="client.name", read_only=True)
@@ -14,6 +36,25 @@ class ClientAssessmentTypeSerializer(serializers.ModelSerializer):
         fields = ['id', 'client', 'client_name', 'assessment_type', 'assessment_type_name']
        
        
+class FindingCountField(serializers.IntegerField):
+    """
+    Reads the counts annotated by `URL.objects.with_finding_counts()`.
+    Instances loaded without them are logged and give null rather than
+    a COUNT query per row and field.
+    """
+    def __init__(self, severity=None, **kwargs):
+        self.severity = severity
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        try:
+            return getattr(instance, self.field_name)
+        except AttributeError:
+            logger.warning("URL %s serialized without with_finding_counts()", instance.pk)
+            return None
+
+
 class URLSerializer(serializers.ModelSerializer):
     client_assessment = ClientAssessmentTypeSerializer(read_only=True)
     client_assessment_id = serializers.PrimaryKeyRelatedField(source="client_assessment", queryset=ClientAssessmentType.objects.all(), write_only=True)
@@ -25,25 +66,58 @@ class URLSerializer(serializers.ModelSerializer):
     tester_id = serializers.PrimaryKeyRelatedField(source="tester", queryset=User.objects.all(), write_only=True, allow_null=True, required=False)
     
     # findings = FindingSerializer(read_only=True)
-    finding_counts = serializers.IntegerField(source="findings.count", read_only=True)
+    finding_counts = FindingCountField()
+    critical_findings = FindingCountField(severity=CRITICAL)
+    high_findings = FindingCountField(severity=HIGH)
+    medium_findings = FindingCountField(severity=MEDIUM)
+    low_findings = FindingCountField(severity=LOW)
     
     class Meta:
         model = URL
         fields = ["id", "start_date", "end_date", "qa_date", "url", 
             "client_assessment", "client_assessment_id", "tester","tester_id", 
-            "compliance", "compliance_id", "is_completed", "finding_counts"]
+            "compliance", "compliance_id", "is_completed", "finding_counts",
+            "critical_findings", "high_findings", "medium_findings", "low_findings"]
 
 
 class POCSerializer(serializers.ModelSerializer):
     poc_image = serializers.CharField(required=False, allow_blank=True)
+    thumbnail = RenditionURLField('poc-rendition', source='poc_image')
     class Meta:
         model = POCS
-        fields = ['steps', 'poc_image', 'description']
+        fields = ['steps', 'poc_image', 'thumbnail', 'description', 'status']
+        read_only_fields = ['status']
+
+
+class POCUploadSerializer(serializers.ModelSerializer):
+    poc_image = serializers.FileField()
+    thumbnail = RenditionURLField('poc-rendition', source='poc_image')
+    
+    class Meta:
+        model = POCS
+        fields = ['id', 'finding', 'steps', 'poc_image', 'thumbnail', 'description', 'status']
+        read_only_fields = ['finding', 'status']
+        
+    def validate_poc_image(self, value):
+        ext = os.path.splitext(value.name)[1].lower().lstrip('.')
+        if ext not in POC_UPLOAD_EXTENSIONS:
+            raise serializers.ValidationError(
+                f"Unsupported image type '{ext}'. Allowed: {', '.join(POC_UPLOAD_EXTENSIONS)}."
+            )
+        value.name = f"poc_{uuid.uuid4()}.{ext}"
+        return value
+    
+    def create(self, validated_data):
+        validated_data['status'] = POCS.PENDING
+        poc = super().create(validated_data)
+        # Queued in the same transaction, so a worker only sees saved POCs.
+        schedule_poc_processing(poc.id, user=getattr(self.context.get('request'), 'user', None))
+        return poc
 
 
 class FindingSerializer(serializers.ModelSerializer):
     url = URLSerializer(read_only=True)
-    url_id = serializers.PrimaryKeyRelatedField(source="url", queryset=URL.objects.all(), write_only=True)
+    url_id = serializers.PrimaryKeyRelatedField(source="url", queryset=URL.objects.select_related('client_assessment'), write_only=True)
     
     vulnerability = VulnerabilitySerializer(read_only=True)
     vulnerability_id = serializers.PrimaryKeyRelatedField(source="vulnerability", queryset=Vulnerabilities.objects.all(), write_only=True)
@@ -52,21 +126,25 @@ class FindingSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Findings
-        fields = ['id', 'url', 'url_id', 'vulnerability', 'vulnerability_id', 'cvss_score', 'pocs']
+        fields = ['id', 'url', 'url_id', 'vulnerability', 'vulnerability_id', 'cvss_score', 'cvss_base_score', 'severity', 'pocs']
+        read_only_fields = ['cvss_base_score', 'severity']
+        extra_kwargs = {'cvss_base_score': {'coerce_to_string': False}}
+
+    def validate_cvss_score(self, value):
+        return check_cvss(value)
         
     def validate(self, data):
-        url_instance = data.get('url_id')
-        vul_instance = data.get('vulnerability_id')
+        url_instance = data.get('url')
+        vul_instance = data.get('vulnerability')
         
         if url_instance and vul_instance:
-            assessment_name = url_instance.client_assessment.assessment_type.name
-            vuln_category = vul_instance.category_of_testing.name
-
-            if assessment_name != vuln_category:
-                raise serializers.ValidationError(
-                    f"Mismatch: URL Assessment is '{assessment_name}', "
-                    f"but Vulnerability Category is '{vuln_category}'."
-                )
+            assessment_type_id = url_instance.client_assessment.assessment_type_id
+            # Assessment type names are unique, so comparing ids is enough.
+            if assessment_type_id != vul_instance.category_of_testing_id:
+                raise serializers.ValidationError(category_mismatch(
+                    AssessmentType.objects.get(pk=assessment_type_id).name,
+                    vul_instance.category_of_testing.name,
+                ))
 
         return data
     
@@ -87,9 +165,153 @@ class FindingSerializer(serializers.ModelSerializer):
                     file_name = f"poc_{uuid.uuid4()}.{ext}"
                     data = ContentFile(base64.b64decode(imgstr), name=file_name)
                     poc_instance.poc_image = data
-                except Exception as e:
-                    print(f"Error processing image: {e}")
+                    poc_instance.status = POCS.PENDING
+                except Exception:
+                    logger.exception("Could not decode the POC image of finding %s", finding.pk)
 
             poc_instance.save()
+            if poc_instance.status == POCS.PENDING:
+                # Verified and re-encoded by a worker, like uploaded POCs.
+                schedule_poc_processing(poc_instance.id, user=getattr(self.context.get('request'), 'user', None))
+
+        return finding
+
+class BulkFindingItemSerializer(serializers.Serializer):
+    url_id = serializers.IntegerField(required=False)
+    vulnerability_id = serializers.IntegerField()
+    cvss_score = serializers.CharField(max_length=Findings._meta.get_field('cvss_score').max_length, validators=[check_cvss])
+
+
+class BulkFindingSerializer(serializers.Serializer):
+    """
+    Many findings for one URL, or for URLs of one client assessment.
+    URLs, vulnerabilities and existing findings are each read in a single
+    query; findings that already exist, or repeat an earlier item, are
+    skipped as duplicates.
+    """
+    url_id = serializers.IntegerField(required=False)
+    client_assessment_id = serializers.IntegerField(required=False)
+    findings = BulkFindingItemSerializer(many=True, allow_empty=False, max_length=BULK_FINDINGS_LIMIT)
+
+    def validate(self, data):
+        url_id = data.get('url_id')
+        client_assessment_id = data.get('client_assessment_id')
+        if (url_id is None) == (client_assessment_id is None):
+            raise serializers.ValidationError("Provide either url_id or client_assessment_id.")
+
+        items = data['findings']
+        for item in items:
+            item.setdefault('url_id', url_id)
+
+        urls = URL.objects.filter(pk__in={item['url_id'] for item in items if item['url_id'] is not None})
+        if client_assessment_id is not None:
+            urls = urls.filter(client_assessment_id=client_assessment_id)
+        url_types = dict(urls.values_list('id', 'client_assessment__assessment_type_id'))
+        if url_id is not None and url_id not in url_types:
+            raise serializers.ValidationError({'url_id': "URL not found."})
+
+        categories = dict(
+            Vulnerabilities.objects.filter(pk__in={item['vulnerability_id'] for item in items})
+            .values_list('id', 'category_of_testing_id')
+        )
+        type_names = dict(AssessmentType.objects.filter(
+            pk__in={*url_types.values(), *categories.values()}
+        ).values_list('id', 'name'))
+        existing = set(
+            Findings.objects.filter(url_id__in=url_types, vulnerability_id__in=categories)
+            .values_list('url_id', 'vulnerability_id', 'cvss_score')
+        )
+
+        errors = []
+        new = {}
+        for item in items:
+            key = (item['url_id'], item['vulnerability_id'], item['cvss_score'])
+            error = {}
+            if item['url_id'] is None:
+                error['url_id'] = ["This field is required."]
+            elif item['url_id'] != (url_id or item['url_id']):
+                error['url_id'] = ["Must match the top-level url_id."]
+            elif item['url_id'] not in url_types:
+                error['url_id'] = ["URL not found in this client assessment." if client_assessment_id else "URL not found."]
+            if item['vulnerability_id'] not in categories:
+                error['vulnerability_id'] = ["Vulnerability not found."]
+            if not error and url_types[item['url_id']] != categories[item['vulnerability_id']]:
+                error['non_field_errors'] = [category_mismatch(
+                    type_names[url_types[item['url_id']]], type_names[categories[item['vulnerability_id']]]
+                )]
+            errors.append(error)
+            if not error and key not in existing:
+                new.setdefault(key, item)
+
+        if any(errors):
+            raise serializers.ValidationError({'findings': errors})
+        data['new'] = list(new.values())
+        data['duplicates'] = len(items) - len(new)
+        return data
+
+    def create(self, validated_data):
+        with transaction.atomic():
+            return create_findings([
+                Findings(url_id=item['url_id'], vulnerability_id=item['vulnerability_id'], cvss_score=item['cvss_score'])
+                for item in validated_data['new']
+            ])
+
+
+class BulkURLAssignmentSerializer(serializers.Serializer):
+    """
+    One assignment of tester, compliance and dates for many URLs, by id,
+    by client assessment or both. Omitted fields are left as they are.
+    The URLs are updated with a single UPDATE, and the dashboard rollups
+    moved once per distinct change rather than once per URL.
+    """
+    ASSIGNED_FIELDS = ['tester', 'compliance', 'start_date', 'end_date', 'qa_date']
+
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False, allow_empty=False, max_length=BULK_URLS_LIMIT)
+    client_assessment_id = serializers.IntegerField(required=False)
+    tester_id = serializers.PrimaryKeyRelatedField(source='tester', queryset=User.objects.all(), allow_null=True, required=False)
+    compliance_id = serializers.PrimaryKeyRelatedField(source='compliance', queryset=CompilanceType.objects.all(), allow_null=True, required=False)
+    start_date = serializers.DateTimeField(allow_null=True, required=False)
+    end_date = serializers.DateTimeField(allow_null=True, required=False)
+    qa_date = serializers.DateTimeField(allow_null=True, required=False)
+
+    def validate(self, data):
+        if 'ids' not in data and 'client_assessment_id' not in data:
+            raise serializers.ValidationError("Provide ids, client_assessment_id or both.")
+        if not any(field in data for field in self.ASSIGNED_FIELDS):
+            raise serializers.ValidationError("Nothing to assign.")
+        if data.get('start_date') and data.get('end_date') and data['end_date'] < data['start_date']:
+            raise serializers.ValidationError({'end_date': "Must not be before start_date."})
+        return data
+
+    def create(self, validated_data):
+        urls = URL.objects.all()
+        if 'ids' in validated_data:
+            urls = urls.filter(pk__in=validated_data['ids'])
+        if 'client_assessment_id' in validated_data:
+            urls = urls.filter(client_assessment_id=validated_data['client_assessment_id'])
+        assignment = {
+            URL._meta.get_field(field).attname: getattr(validated_data[field], 'pk', validated_data[field])
+            for field in self.ASSIGNED_FIELDS if field in validated_data
+        }
+
+        with transaction.atomic():
+            rows = urls.select_for_update().values_list('id', *stats.URL_DIMENSIONS.values())
+            keys = {row[0]: stats.make_url_key(*row[1:]) for row in rows}
+            url_ids = list(keys)
+            now = timezone.now()
+            stamped(URL, now)
+            # The ids read above rather than the filter, so the rollups match the rows changed.
+            for start in range(0, len(url_ids), BULK_UPDATE_BATCH_SIZE):
+                URL.objects.filter(pk__in=url_ids[start:start + BULK_UPDATE_BATCH_SIZE]).update(**assignment, updated_at=now)
+
+            moves, testers = {}, {}
+            for url_id, key in keys.items():
+                dimensions = dict(zip(stats.URL_KEY, key))
+                dimensions.update({field: assignment[field] for field in ('tester_id', 'compliance_id') if field in assignment})
+                moves[url_id] = (key, stats.make_url_key(**dimensions))
+                testers[url_id] = (dimensions['tester_id'] or None, key[2] or None)
+            stats.urls_moved(moves)
+            changes.urls_updated(testers)
 
-        return finding
\ No newline at end of file
+        requested = validated_data.get('ids', url_ids)
+        return [{'id': url_id, 'status': 'updated' if url_id in keys else 'not_found'} for url_id in dict.fromkeys(requested)]
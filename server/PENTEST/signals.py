@@ -0,0 +1,181 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.dispatch import receiver
+from CORE.models import Vulnerabilities
+from CORE.sync import touch, track_deletes, track_updates
+from . import changes, stats
+from .models import URL, Findings, POCS, FindingStat
+
+
+def deleted_directly(model, origin):
+    """
+    Whether a delete signal comes from deleting `model` rows themselves
+    rather than from a cascade, which the parent's handler accounts for.
+    """
+    origin_model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return origin_model is model
+
+
+@receiver(pre_save, sender=URL)
+def remember_url_key(sender, instance, **kwargs):
+    instance._stat_key = stats.stored_url_key(instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=URL)
+def update_url_stats(sender, instance, created, **kwargs):
+    key = stats.url_key(instance)
+    previous = getattr(instance, '_stat_key', None)
+    if created or previous is None:
+        stats.url_created(key)
+    else:
+        stats.url_moved(instance.pk, previous, key)
+
+
+@receiver(pre_delete, sender=URL)
+def remove_url_stats(sender, instance, **kwargs):
+    stats.url_deleted(instance.pk)
+
+
+@receiver(pre_save, sender=Findings)
+def remember_finding_key(sender, instance, **kwargs):
+    previous = Findings.objects.filter(pk=instance.pk).values_list('url_id', 'severity').first() if instance.pk else None
+    instance._stored = previous
+    instance._stat_key = stats.finding_key(*previous) if previous else None
+
+
+@receiver(post_save, sender=Findings)
+def update_finding_stats(sender, instance, created, **kwargs):
+    key = stats.finding_key(instance.url_id, instance.severity)
+    previous = getattr(instance, '_stat_key', None)
+    # Spares the change event a lookup of the URL's tester.
+    instance._saved_key = key
+    if created or previous is None:
+        stats.add(FindingStat, key, finding_count=1)
+    elif previous != key:
+        poc_count = instance.pocs.count()
+        stats.add(FindingStat, previous, finding_count=-1, poc_count=-poc_count)
+        stats.add(FindingStat, key, finding_count=1, poc_count=poc_count)
+
+
+@receiver(pre_delete, sender=Findings)
+def remove_finding_stats(sender, instance, origin=None, **kwargs):
+    if not deleted_directly(Findings, origin):
+        return
+    key = stats.finding_key(instance.url_id, instance.severity)
+    instance._saved_key = key
+    if key is not None:
+        stats.add(FindingStat, key, finding_count=-1, poc_count=-instance.pocs.count())
+
+
+def poc_key(finding_id, poc=None):
+    finding = Findings.objects.filter(pk=finding_id).values_list('url_id', 'severity').first()
+    key = stats.finding_key(*finding) if finding else None
+    if poc is not None and key is not None:
+        # Spares the change event a lookup of the finding's URL and tester.
+        poc._saved_url = (finding[0], key[2] or None)
+    return key
+
+
+@receiver(pre_save, sender=POCS)
+def remember_poc_key(sender, instance, **kwargs):
+    previous = POCS.objects.filter(pk=instance.pk).values_list('finding_id', flat=True).first() if instance.pk else None
+    instance._stat_finding = previous
+
+
+@receiver(post_save, sender=POCS)
+def update_poc_stats(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stat_finding', None)
+    if not created and previous == instance.finding_id:
+        return
+    if previous is not None:
+        stats.add(FindingStat, poc_key(previous), poc_count=-1)
+    stats.add(FindingStat, poc_key(instance.finding_id, instance), poc_count=1)
+
+
+@receiver(pre_delete, sender=POCS)
+def remove_poc_stats(sender, instance, origin=None, **kwargs):
+    if not deleted_directly(POCS, origin):
+        return
+    key = poc_key(instance.finding_id, instance)
+    if key is not None:
+        stats.add(FindingStat, key, poc_count=-1)
+
+
+@receiver(post_delete, sender=POCS)
+def release_poc_image(sender, instance, **kwargs):
+    # Also runs for the POCs of deleted findings, URLs and clients.
+    name = instance.poc_image.name
+    if name:
+        transaction.on_commit(lambda: POCS.release_image(name))
+
+
+@receiver(post_save, sender=URL)
+def publish_url_change(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stat_key', None)
+    changes.url_changed(instance, 'created' if created else 'updated', previous_tester_id=(previous[2] or None) if previous else None)
+
+
+@receiver(post_save, sender=Findings)
+def publish_finding_change(sender, instance, created, **kwargs):
+    changes.finding_changed(instance, 'created' if created else 'updated', key=instance.__dict__.pop('_saved_key', None))
+
+
+@receiver(post_save, sender=POCS)
+def publish_poc_change(sender, instance, created, **kwargs):
+    changes.poc_changed(instance, 'created' if created else 'updated', url=instance.__dict__.pop('_saved_url', None))
+
+
+# Cascaded rows are covered by the event of the row deleted.
+@receiver(post_delete, sender=URL)
+def publish_url_delete(sender, instance, origin=None, **kwargs):
+    if deleted_directly(URL, origin):
+        changes.url_changed(instance, 'deleted')
+
+
+@receiver(post_delete, sender=Findings)
+def publish_finding_delete(sender, instance, origin=None, **kwargs):
+    if deleted_directly(Findings, origin):
+        changes.finding_changed(instance, 'deleted', key=instance.__dict__.pop('_saved_key', None))
+
+
+@receiver(post_delete, sender=POCS)
+def publish_poc_delete(sender, instance, origin=None, **kwargs):
+    if deleted_directly(POCS, origin):
+        changes.poc_changed(instance, 'deleted', url=instance.__dict__.pop('_saved_url', None))
+
+
+track_deletes(URL, Findings)
+track_updates(URL, Findings)
+
+
+# A URL carries the counts of its findings and a finding its POCs, so
+# sync clients see those change through the parent's updated_at.
+@receiver(post_save, sender=Findings)
+def touch_finding_url(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_stored', None)
+    if created or previous != (instance.url_id, instance.severity):
+        touch(URL.objects.filter(pk__in={instance.url_id, previous[0] if previous else None}))
+
+
+@receiver(post_delete, sender=Findings)
+def touch_deleted_finding_url(sender, instance, origin=None, **kwargs):
+    if deleted_directly(Findings, origin):
+        touch(URL.objects.filter(pk=instance.url_id))
+
+
+@receiver(post_save, sender=POCS)
+def touch_poc_finding(sender, instance, **kwargs):
+    touch(Findings.objects.filter(pk__in={instance.finding_id, getattr(instance, '_stat_finding', None)}))
+
+
+@receiver(post_delete, sender=POCS)
+def touch_deleted_poc_finding(sender, instance, origin=None, **kwargs):
+    if deleted_directly(POCS, origin):
+        touch(Findings.objects.filter(pk=instance.finding_id))
+
+
+@receiver(pre_delete, sender=Vulnerabilities)
+def touch_vulnerability_findings(sender, instance, **kwargs):
+    # The delete sets their vulnerability to NULL with a plain UPDATE.
+    touch(Findings.objects.filter(vulnerability=instance))
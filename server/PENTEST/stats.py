@@ -0,0 +1,190 @@
+from collections import Counter, defaultdict
+from django.apps import apps as global_apps
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .models import ClientAssessmentType, URL, Findings, URLStat, FindingStat
+
+# The model signals keep the rollups current for save() and delete().
+# QuerySet.update(), bulk_create() and raw SQL send no signals: code using
+# them adjusts the rollups itself (url_created, urls_moved,
+# findings_created, pocs_created) or runs `manage.py rebuild_stats`.
+URL_KEY = ('client_id', 'assessment_type_id', 'tester_id', 'compliance_id', 'is_completed')
+FINDING_KEY = URL_KEY + ('severity',)
+
+# Lookups from a URL row to each of its dimensions.
+URL_DIMENSIONS = {
+    'client_id': 'client_assessment__client_id',
+    'assessment_type_id': 'client_assessment__assessment_type_id',
+    'tester_id': 'tester_id',
+    'compliance_id': 'compliance_id',
+    'is_completed': 'is_completed',
+}
+
+
+def make_url_key(client_id, assessment_type_id, tester_id, compliance_id, is_completed):
+    return (client_id, assessment_type_id, tester_id or 0, compliance_id or 0, bool(is_completed))
+
+
+def url_key(url):
+    """Dimensions of an in-memory URL instance."""
+    if URL.client_assessment.is_cached(url):
+        client_assessment = url.client_assessment
+        client_id, assessment_type_id = client_assessment.client_id, client_assessment.assessment_type_id
+    else:
+        client_id, assessment_type_id = ClientAssessmentType.objects.values_list(
+            'client_id', 'assessment_type_id'
+        ).get(pk=url.client_assessment_id)
+    return make_url_key(client_id, assessment_type_id, url.tester_id, url.compliance_id, url.is_completed)
+
+
+def stored_url_key(url_id):
+    """Dimensions of a URL as currently stored, or None if it doesn't exist."""
+    row = URL.objects.filter(pk=url_id).values_list(*URL_DIMENSIONS.values()).first()
+    return make_url_key(*row) if row is not None else None
+
+
+def stored_url_keys(url_ids):
+    """Dimensions of many stored URLs at once, by URL id."""
+    rows = URL.objects.filter(pk__in=url_ids).values_list('id', *URL_DIMENSIONS.values())
+    return {row[0]: make_url_key(*row[1:]) for row in rows}
+
+
+def add(model, key, **deltas):
+    """Add `deltas` to the counters of the rollup row for `key`."""
+    fields = FINDING_KEY if model is FindingStat else URL_KEY
+    filters = dict(zip(fields, key))
+    expressions = {field: F(field) + delta for field, delta in deltas.items()}
+    if model.objects.filter(**filters).update(**expressions):
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**filters, **deltas)
+    except IntegrityError:
+        model.objects.filter(**filters).update(**expressions)
+
+
+def findings_by_severity(findings):
+    """(finding count, poc count) of `findings` per severity."""
+    totals = defaultdict(lambda: [0, 0])
+    rows = findings.values('severity').annotate(findings=Count('id', distinct=True), pocs=Count('pocs')).order_by()
+    for row in rows:
+        total = totals[row['severity']]
+        total[0] += row['findings']
+        total[1] += row['pocs']
+    return totals
+
+
+def add_findings(key, findings, sign=1):
+    for severity, (finding_count, poc_count) in findings_by_severity(findings).items():
+        add(FindingStat, key + (severity,), finding_count=sign * finding_count, poc_count=sign * poc_count)
+
+
+def url_created(key, count=1):
+    add(URLStat, key, url_count=count)
+
+
+def url_moved(url_id, old_key, new_key):
+    if old_key == new_key:
+        return
+    add(URLStat, old_key, url_count=-1)
+    add(URLStat, new_key, url_count=1)
+    findings = Findings.objects.filter(url_id=url_id)
+    add_findings(old_key, findings, sign=-1)
+    add_findings(new_key, findings)
+
+
+def urls_moved(moves, batch_size=900):
+    """url_moved() for many URLs, updated without signals; `moves` maps URL ids to (old key, new key)."""
+    by_change = defaultdict(list)
+    for url_id, (old_key, new_key) in moves.items():
+        if old_key != new_key:
+            by_change[old_key, new_key].append(url_id)
+    for (old_key, new_key), url_ids in by_change.items():
+        add(URLStat, old_key, url_count=-len(url_ids))
+        add(URLStat, new_key, url_count=len(url_ids))
+        for start in range(0, len(url_ids), batch_size):
+            findings = Findings.objects.filter(url_id__in=url_ids[start:start + batch_size])
+            add_findings(old_key, findings, sign=-1)
+            add_findings(new_key, findings)
+
+
+def url_deleted(url_id):
+    key = stored_url_key(url_id)
+    if key is None:
+        return
+    add(URLStat, key, url_count=-1)
+    add_findings(key, Findings.objects.filter(url_id=url_id), sign=-1)
+
+
+def findings_created(findings):
+    """Count findings inserted without signals, e.g. by bulk_create()."""
+    keys = stored_url_keys({finding.url_id for finding in findings})
+    counts = Counter(keys[finding.url_id] + (finding.severity,) for finding in findings)
+    for key, count in counts.items():
+        add(FindingStat, key, finding_count=count)
+
+
+def pocs_created(pocs):
+    """Count POCs inserted without signals, e.g. by bulk_create()."""
+    per_finding = Counter(poc.finding_id for poc in pocs)
+    findings = Findings.objects.filter(pk__in=per_finding).values_list('id', 'url_id', 'severity')
+    keys = stored_url_keys({url_id for _, url_id, _ in findings})
+    counts = Counter()
+    for finding_id, url_id, severity in findings:
+        counts[keys[url_id] + (severity,)] += per_finding[finding_id]
+    for key, count in counts.items():
+        add(FindingStat, key, poc_count=count)
+
+
+def finding_key(url_id, severity):
+    key = stored_url_key(url_id)
+    return None if key is None else key + (severity,)
+
+
+def rebuild_stats(apps=global_apps):
+    """
+    Recompute every rollup row from scratch. Works with the historical
+    models of a migration as well as the live ones.
+    """
+    URL = apps.get_model('PENTEST', 'URL')
+    Findings = apps.get_model('PENTEST', 'Findings')
+    POCS = apps.get_model('PENTEST', 'POCS')
+    URLStat = apps.get_model('PENTEST', 'URLStat')
+    FindingStat = apps.get_model('PENTEST', 'FindingStat')
+
+    dimensions = {f'dim_{index}': F(lookup) for index, lookup in enumerate(URL_DIMENSIONS.values())}
+
+    url_counts = defaultdict(int)
+    for row in URL.objects.values(**dimensions).annotate(total=Count('id')).order_by():
+        url_counts[make_url_key(*(row[name] for name in dimensions))] += row['total']
+
+    finding_counts = defaultdict(lambda: [0, 0])
+    finding_dimensions = {name: F(f'url__{expression.name}') for name, expression in dimensions.items()}
+    for row in Findings.objects.values('severity', **finding_dimensions).annotate(total=Count('id')).order_by():
+        key = make_url_key(*(row[name] for name in dimensions)) + (row['severity'],)
+        finding_counts[key][0] += row['total']
+    poc_dimensions = {name: F(f'finding__url__{expression.name}') for name, expression in dimensions.items()}
+    for row in POCS.objects.values(finding_severity=F('finding__severity'), **poc_dimensions).annotate(total=Count('id')).order_by():
+        key = make_url_key(*(row[name] for name in dimensions)) + (row['finding_severity'],)
+        finding_counts[key][1] += row['total']
+
+    with transaction.atomic():
+        URLStat.objects.all().delete()
+        FindingStat.objects.all().delete()
+        URLStat.objects.bulk_create(
+            [URLStat(url_count=count, **dict(zip(URL_KEY, key))) for key, count in url_counts.items()],
+            batch_size=1000,
+        )
+        FindingStat.objects.bulk_create(
+            [
+                FindingStat(finding_count=findings, poc_count=pocs, **dict(zip(FINDING_KEY, key)))
+                for key, (findings, pocs) in finding_counts.items()
+            ],
+            batch_size=1000,
+        )
+
+
+def rollup(queryset, dimension, **aggregates):
+    """`aggregates` of `queryset` grouped by `dimension`, as {value: {name: total}}."""
+    rows = queryset.values(dimension).annotate(**aggregates).order_by()
+    return {row[dimension]: {name: row[name] or 0 for name in aggregates} for row in rows}
@@ -0,0 +1,45 @@
+import hashlib
+import os
+import uuid
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+POC_DIRECTORY = 'pocs'
+
+
+def content_hash(content):
+    """sha256 hex digest of a File, read in chunks."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk if isinstance(chunk, bytes) else chunk.encode())
+    return digest.hexdigest()
+
+
+def poc_path(digest, ext):
+    # Two levels of fan-out keep directories small.
+    return os.path.join(POC_DIRECTORY, digest[:2], digest[2:4], f'{digest}.{ext}')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Storage for files named by the hash of their content: a name that
+    already exists holds the same bytes, so it is reused rather than
+    written again or given a suffix. Reusing a file refreshes its
+    modification time, which keeps it from being released while the
+    upload reusing it commits (see POCS.release_image).
+    """
+    def get_available_name(self, name, max_length=None):
+        return name
+
+    def _save(self, name, content):
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        # Written under a temporary name and renamed, so an interrupted
+        # write never leaves a partial file behind a hash.
+        temporary = super()._save(f'{name}.{uuid.uuid4().hex}.part', content)
+        os.replace(self.path(temporary), self.path(name))
+        return name
@@ -0,0 +1,116 @@
+import csv
+import io
+import logging
+from xml.etree.ElementTree import ParseError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+from CORE.jobs import JobFailed, enqueue, job, retries_left
+from .importers import import_urls, iter_urls_from_data, iter_urls_from_upload
+from .models import POCS, URL
+from .scanners import ScanFormatError, import_scan
+from .storage import content_hash, poc_path
+
+logger = logging.getLogger(__name__)
+
+# Formats kept as uploaded; anything else Pillow can read is converted to PNG.
+POC_IMAGE_FORMATS = {'JPEG': 'jpeg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif'}
+
+
+def schedule_poc_processing(poc_id, user=None):
+    return enqueue('pentest.process_poc_image', {'poc_id': poc_id}, user=user)
+
+
+def normalize_image(source):
+    """
+    Re-encode an uploaded image with its EXIF orientation applied and its
+    metadata stripped. Returns the new bytes and file extension.
+    """
+    with Image.open(source) as image:
+        image.verify()
+    source.seek(0)
+    with Image.open(source) as image:
+        ext = POC_IMAGE_FORMATS.get(image.format, 'png')
+        image = ImageOps.exif_transpose(image)
+        if ext == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        output = io.BytesIO()
+        image.save(output, format=ext.upper())
+    return output.getvalue(), ext
+
+
+@job('pentest.process_poc_image')
+def process_poc_image(poc_id):
+    poc = POCS.objects.select_related('finding__url').filter(pk=poc_id, status=POCS.PENDING).first()
+    if poc is None:
+        return
+
+    try:
+        with poc.poc_image.open('rb') as source:
+            content, ext = normalize_image(source)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        logger.warning("Rejected POC image %s: %s", poc_id, e)
+        original = poc.poc_image.name
+        poc.poc_image = ''
+        poc.status = POCS.REJECTED
+        poc.save(update_fields=['poc_image', 'status'])
+        POCS.release_image(original)
+        return
+
+    # The re-encoded image is stored under its own hash; the original is
+    # only deleted once no other POC shares it.
+    original = poc.poc_image.name
+    image = ContentFile(content)
+    poc.poc_image = poc.poc_image.storage.save(poc_path(content_hash(image), ext), image)
+    poc.status = POCS.READY
+    poc.save(update_fields=['poc_image', 'status'])
+    if original != poc.poc_image.name:
+        POCS.release_image(original)
+
+
+@job('pentest.import_urls')
+def import_urls_job(client_assessment_id, upload=None, data=None):
+    """
+    Import URLs from a stashed upload or from JSON rows; invalid files fail
+    without retrying. The upload is deleted once no attempt is left to read it.
+    """
+    try:
+        if upload is not None:
+            with default_storage.open(upload, 'rb') as file:
+                result = import_urls(iter_urls_from_upload(file), client_assessment_id)
+        else:
+            result = import_urls(iter_urls_from_data(data), client_assessment_id)
+    except (ValueError, csv.Error, ParseError) as e:
+        raise JobFailed(str(e))
+    except Exception:
+        if retries_left():
+            upload = None
+        raise
+    finally:
+        if upload is not None:
+            default_storage.delete(upload)
+    return {"message": f"Successfully added {result['inserted']} URLs.", **result}
+
+
+# Batches commit as they go, so a retry would add their POCs again.
+@job('pentest.import_scan', max_attempts=1)
+def import_scan_job(url_id, upload, default_vulnerability_id=None):
+    """
+    Import a stashed scanner export into a URL; the upload is deleted
+    afterwards. A malformed file fails the job, keeping the batches
+    imported before the error.
+    """
+    try:
+        url = URL.objects.select_related('client_assessment').filter(pk=url_id).first()
+        if url is None:
+            raise JobFailed("The URL no longer exists")
+        with default_storage.open(upload, 'rb') as file:
+            result = import_scan(file, url, default_vulnerability_id=default_vulnerability_id)
+    except ScanFormatError as e:
+        raise JobFailed(str(e))
+    finally:
+        default_storage.delete(upload)
+    message = f"Imported {result['pocs']} issues into {result['findings']} new findings."
+    if result['failed']:
+        message += f" {result['failed']} issues could not be saved."
+    return {"message": message, **result}
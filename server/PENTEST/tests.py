@@ -1,3 +1,1130 @@
-from django.test import TestCase
+import base64
+import csv
+import io
+import json
+import os
+import tempfile
+import time
+import zipfile
+from contextlib import ExitStack
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+from django.core import signing
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from CLIENT.models import ClientAddress, ClientDetail
+from CORE.events import EventBatch
+from CORE.jobs import run_pending
+from CORE.models import AssessmentType, CompilanceType, Job, TeamsManagement, Tombstone, User, Vulnerabilities
+from CORE.rows import RowPlan, Unsupported
+from CORE.sync import Restamp
+from .models import ClientAssessmentType, URL, Findings, POCS, FindingStat, URLStat
+from .importers import create_findings, import_urls
+from .scanners import ScanFormatError, import_scan
+from .serializer import URLSerializer
+from . import stats
+from .stats import rebuild_stats
+from .tasks import process_poc_image
+from . import views
 
-# Create your tests here.
+FAST_VIEWS = [views.URLViewset, views.FindingViewset, views.InProgresViews, views.CompletedPentest]
+
+
+def create_client(name='Acme'):
+    address = ClientAddress.objects.create(address='-', city='-', postal_code='-', country='-')
+    return ClientDetail.objects.create(name=name, email=f'{name.lower()}@example.com', phone_code='+1', phone='0', address=address)
+
+
+def create_vulnerability(category, name='XSS', **fields):
+    return Vulnerabilities.objects.create(
+        name=name, description='-', remediations='-', impact='-', reference='https://example.com', category_of_testing=category, **fields,
+    )
+
+
+class PentestTestCase(TestCase):
+    """
+    A tester, the Web assessment type with a vulnerability, and the Acme
+    client with a Web assessment. Test classes add what they need on top
+    in their own setUpTestData.
+    """
+    user_fields = {}
+    vulnerability_name = 'XSS'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = cls.create_user()
+        cls.web = AssessmentType.objects.create(name='Web')
+        cls.vulnerability = create_vulnerability(cls.web, cls.vulnerability_name)
+        cls.client_detail = create_client()
+        cls.client_assessment = ClientAssessmentType.objects.create(client=cls.client_detail, assessment_type=cls.web)
+
+    @classmethod
+    def create_user(cls):
+        return User.objects.create(email='tester@example.com', **cls.user_fields)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def use_media_root(self, **overrides):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name, **overrides)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+
+class RowRepresentationTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        compliance = CompilanceType.objects.create(name='PCI')
+        vulnerabilities = [cls.vulnerability] + [
+            create_vulnerability(cls.web, f'Vulnerability {index}', cvss='7.5') for index in range(1, 3)
+        ]
+        client_assessment = cls.client_assessment
+
+        now = timezone.now()
+        for index in range(6):
+            url = URL.objects.create(
+                url=f'https://{index}.example.com', client_assessment=client_assessment, tester=cls.user,
+                compliance=compliance, start_date=now, end_date=now, qa_date=now, is_completed=index % 2 == 0,
+            )
+            for score in ['9.8', '7.2', '5.0', '2.0', 'n/a'][:index % 5 + 1]:
+                finding = Findings.objects.create(url=url, vulnerability=vulnerabilities[index % 3], cvss_score=score)
+                for step in range(index % 3):
+                    POCS.objects.create(finding=finding, steps=step, poc_image=f'poc/{finding.pk}_{step}.png', description='-')
+        URL.objects.create(url='https://unassigned.example.com', client_assessment=client_assessment)
+        Findings.objects.create(url=URL.objects.get(url='https://unassigned.example.com'), vulnerability=None, cvss_score='4.0')
+
+    @classmethod
+    def create_user(cls):
+        team = TeamsManagement.objects.create(team_name='Red')
+        return User.objects.create(email='tester@example.com', first_name='Test', team=team, is_staff=True)
+
+    def get(self, path, fast):
+        with ExitStack() as stack:
+            for view in FAST_VIEWS:
+                stack.enter_context(mock.patch.object(view, 'values_representation', fast))
+            response = self.client.get(path)
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.content
+
+    def assertSameOutput(self, path):
+        self.assertEqual(self.get(path, fast=True), self.get(path, fast=False), path)
+
+    def test_url_lists_match_serializer(self):
+        for path in ['/api/pentest/url/?page_size=100', '/api/pentest/in-progress/', '/api/pentest/completed/']:
+            self.assertSameOutput(path)
+
+    def test_finding_list_matches_serializer(self):
+        self.assertSameOutput('/api/pentest/findings/?page_size=100')
+        self.assertSameOutput(f'/api/pentest/findings/?project_id={URL.objects.first().pk}')
+
+    def test_sparse_fieldsets_match_serializer(self):
+        for query in ['fields=id,cvss_score', 'fields=id,url.url,url.tester.email,vulnerability.name', 'expand=', 'expand=url.tester']:
+            self.assertSameOutput(f'/api/pentest/findings/?{query}')
+            self.assertSameOutput(f'/api/pentest/url/?{query}')
+
+    def test_keyset_pages_match_serializer(self):
+        path = '/api/pentest/findings/?pagination=keyset&page_size=4'
+        # Cursors are signed with a timestamp; pin it so both runs sign alike.
+        timestamp = signing.TimestampSigner().timestamp()
+        self.enterContext(mock.patch.object(signing.TimestampSigner, 'timestamp', lambda signer: timestamp))
+        while path:
+            fast, slow = self.get(path, fast=True), self.get(path, fast=False)
+            self.assertEqual(fast, slow)
+            path = self.client.get(path).json()['next']
+
+    def test_finding_list_queries(self):
+        with mock.patch.object(views.FindingViewset, 'values_representation', True):
+            # Count, page, URLs with their finding counts, POCs.
+            with self.assertNumQueries(4):
+                self.client.get('/api/pentest/findings/?page_size=100')
+
+    def test_unsupported_fields_fall_back(self):
+        class MethodSerializer(URLSerializer):
+            label = serializers.SerializerMethodField()
+
+            class Meta(URLSerializer.Meta):
+                fields = URLSerializer.Meta.fields + ['label']
+
+            def get_label(self, obj):
+                return obj.url
+
+        with self.assertRaises(Unsupported):
+            RowPlan(MethodSerializer(), URL.objects.with_finding_counts())
+
+        with mock.patch.object(views.URLViewset, 'serializer_class', MethodSerializer):
+            response = self.client.get('/api/pentest/url/')
+        self.assertEqual(response.json()['results'][0]['label'], response.json()['results'][0]['url'])
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_serializers', rows=20, page_size=10, repeat=1, stdout=out)
+        self.assertEqual(out.getvalue().count('identical output: True'), 2)
+
+    def test_findings_sort_by_numeric_score(self):
+        url = URL.objects.first()
+        Findings.objects.create(url=url, vulnerability=None, cvss_score='10.0')
+        Findings.objects.create(url=url, vulnerability=None, cvss_score='CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:H/I:H/A:H')
+        results = self.client.get(f'/api/pentest/findings/?project_id={url.pk}').json()['results']
+        self.assertEqual([result['cvss_base_score'] for result in results[:3]], [10.0, 9.8, 9.8])
+        self.assertEqual(results[1]['severity'], 'critical')
+
+        results = self.client.get('/api/pentest/findings/?severity=high&page_size=100').json()['results']
+        self.assertEqual({result['cvss_score'] for result in results}, {'7.2'})
+
+
+class FindingCountTests(PentestTestCase):
+    user_fields = {'is_staff': True}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        compliance = CompilanceType.objects.create(name='PCI')
+        now = timezone.now()
+        cls.dates = {'tester': cls.user, 'compliance': compliance, 'start_date': now, 'end_date': now, 'qa_date': now}
+        cls.url = URL.objects.create(url='https://a.example.com', client_assessment=cls.client_assessment, **cls.dates)
+        for score in ['9.8', '7.5', '5.0', 'CVSS:3.1/AV:N/AC:L/PR:N/UI:N/S:U/C:L/I:N/A:N', '2.0', 'n/a']:
+            Findings.objects.create(url=cls.url, vulnerability=cls.vulnerability, cvss_score=score)
+        cls.completed = URL.objects.create(url='https://b.example.com', client_assessment=cls.client_assessment, is_completed=True, **cls.dates)
+
+    def add_urls(self, count):
+        for index in range(count):
+            for is_completed in (False, True):
+                url = URL.objects.create(
+                    url=f'https://{index}-{is_completed}.example.com', client_assessment=self.client_assessment,
+                    is_completed=is_completed, **self.dates,
+                )
+                Findings.objects.create(url=url, vulnerability=self.vulnerability, cvss_score='9.8')
+
+    def test_counts_per_severity(self):
+        counts = {
+            row['id']: [row[field] for field in ('finding_counts', 'critical_findings', 'high_findings', 'medium_findings', 'low_findings')]
+            for row in self.client.get('/api/pentest/url/').json()['results']
+        }
+        self.assertEqual(counts, {self.url.pk: [6, 1, 1, 2, 1], self.completed.pk: [0, 0, 0, 0, 0]})
+
+    def test_lists_take_a_fixed_number_of_queries(self):
+        for path in ('/api/pentest/url/', '/api/pentest/in-progress/', '/api/pentest/completed/'):
+            with self.subTest(path=path):
+                with self.assertNumQueries(2):
+                    self.assertEqual(self.client.get(path).status_code, 200)
+        self.add_urls(5)
+        for path in ('/api/pentest/url/', '/api/pentest/in-progress/', '/api/pentest/completed/'):
+            with self.subTest(path=path, urls=12):
+                with self.assertNumQueries(2):
+                    self.assertGreater(len(self.client.get(path).json()['results']), 5)
+
+    def test_unannotated_urls_are_logged_not_counted(self):
+        url = URL.objects.select_related('client_assessment__client', 'client_assessment__assessment_type', 'tester', 'compliance').get(pk=self.url.pk)
+        with self.assertLogs('PENTEST.serializer', 'WARNING'), self.assertNumQueries(0):
+            data = URLSerializer(url).data
+        self.assertIsNone(data['finding_counts'])
+
+    def test_writes_respond_with_counts(self):
+        response = self.client.post('/api/pentest/url/', {'url': 'https://new.example.com', 'client_assessment_id': self.client_assessment.pk})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['finding_counts'], 0)
+        response = self.client.post('/api/pentest/findings/', {'url_id': self.url.pk, 'vulnerability_id': self.vulnerability.pk, 'cvss_score': '9.0'})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.json()['url']['finding_counts'], response.json()['url']['critical_findings']), (7, 2))
+
+
+class ExportTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.client_assessments = [
+            cls.client_assessment, ClientAssessmentType.objects.create(client=create_client('Globex'), assessment_type=cls.web),
+        ]
+        for client_assessment in cls.client_assessments:
+            for index in range(3):
+                url = URL.objects.create(url=f'https://{index}.{client_assessment.pk}.example.com', client_assessment=client_assessment, start_date=timezone.now())
+                Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score='=9.8' if index == 0 else '5.0')
+                Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score='7.5')
+
+    def download(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv_export(self):
+        client_id = self.client_assessments[0].client_id
+        rows = list(csv.reader(StringIO(self.download(f'/api/pentest/exports/findings/csv/?client_id={client_id}').decode())))
+        self.assertEqual(rows[0][:3], ['Client', 'Assessment type', 'URL'])
+        self.assertEqual(len(rows), 7)
+        self.assertEqual({row[0] for row in rows[1:]}, {'Acme'})
+        # Findings of a URL come highest score first; formulas are neutralised.
+        self.assertEqual([row[8] for row in rows[1:3]], ['7.5', "'=9.8"])
+
+        rows = list(csv.reader(StringIO(self.download(f'/api/pentest/exports/urls/csv/?client_assessment_id={self.client_assessments[1].pk}').decode())))
+        self.assertEqual([row[9:12] for row in rows[1:]], [['2', '0', '1']] * 3)
+
+    def test_xlsx_export(self):
+        content = self.download(f'/api/pentest/exports/findings/xlsx/?start={timezone.now():%Y-%m-%d}')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 13)
+        self.assertIn('<t xml:space="preserve">Globex</t>', sheet)
+
+    def test_requires_scope_and_format(self):
+        self.assertEqual(self.client.get('/api/pentest/exports/findings/csv/').status_code, 400)
+        self.assertEqual(self.client.get('/api/pentest/exports/findings/pdf/?client_id=1').status_code, 400)
+        self.assertEqual(self.client.get('/api/pentest/exports/findings/csv/?start=yesterday').status_code, 400)
+
+
+class BulkFindingTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.web_vulnerability = cls.vulnerability
+        cls.mobile_vulnerability = create_vulnerability(AssessmentType.objects.create(name='Mobile'), 'Mobile vulnerability')
+        cls.urls = [URL.objects.create(url=f'https://{index}.example.com', client_assessment=cls.client_assessment) for index in range(3)]
+        Findings.objects.create(url=cls.urls[0], vulnerability=cls.web_vulnerability, cvss_score='9.8')
+
+    def post(self, data):
+        return self.client.post('/api/pentest/bulk/findings/', data, format='json')
+
+    def test_creates_findings_and_skips_duplicates(self):
+        findings = [
+            {'url_id': url.pk, 'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': score}
+            for url in self.urls for score in ('9.8', '5.0')
+        ]
+        response = self.post({'client_assessment_id': self.client_assessment.pk, 'findings': findings + findings[:2]})
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.json()['inserted'], response.json()['duplicates']), (5, 3))
+        self.assertEqual(Findings.objects.count(), 6)
+
+        counts = sorted(FindingStat.objects.values_list('severity', 'finding_count'))
+        rebuild_stats()
+        self.assertEqual(counts, sorted(FindingStat.objects.values_list('severity', 'finding_count')))
+
+    def test_rejects_unreadable_scores(self):
+        vector = 'CVSS:4.0/AV:N/AC:L/AT:N/PR:N/UI:N/VC:H/VI:H/VA:H/SC:N/SI:N/SA:N'
+        response = self.post({'url_id': self.urls[1].pk, 'findings': [{'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': vector}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cvss_score', response.json()['findings']['0'])
+        response = self.client.post('/api/pentest/findings/', {'url_id': self.urls[1].pk, 'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': vector})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('cvss_score', response.json())
+        self.assertFalse(Findings.objects.filter(url=self.urls[1]).exists())
+
+    def test_validation_is_set_based_and_atomic(self):
+        findings = [
+            {'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': '5.0'},
+            {'vulnerability_id': self.mobile_vulnerability.pk, 'cvss_score': '5.0'},
+            {'vulnerability_id': 0, 'cvss_score': '5.0'},
+            {'url_id': self.urls[1].pk, 'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': '5.0'},
+        ]
+        # URLs, vulnerabilities, assessment type names and existing findings.
+        with self.assertNumQueries(4):
+            response = self.post({'url_id': self.urls[0].pk, 'findings': findings})
+        self.assertEqual(response.status_code, 400)
+        errors = response.json()['findings']
+        self.assertEqual(errors[0], {})
+        self.assertIn('Mismatch', errors[1]['non_field_errors'][0])
+        self.assertIn('vulnerability_id', errors[2])
+        self.assertIn('url_id', errors[3])
+        self.assertEqual(Findings.objects.count(), 1)
+
+    def test_requires_url_or_client_assessment(self):
+        response = self.post({'findings': [{'vulnerability_id': self.web_vulnerability.pk, 'cvss_score': '1.0'}]})
+        self.assertEqual(response.status_code, 400)
+
+
+class StatSignalTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.alice, cls.bob = cls.user, User.objects.create(email='bob@example.com')
+
+    def setUp(self):
+        super().setUp()
+        self.urls = [
+            URL.objects.create(url=f'https://{index}.example.com', client_assessment=self.client_assessment, tester=self.alice)
+            for index in range(2)
+        ]
+        self.findings = [
+            Findings.objects.create(url=url, vulnerability=self.vulnerability, cvss_score=score)
+            for url in self.urls for score in ('9.8', '5.0')
+        ]
+        for step, finding in enumerate(self.findings):
+            POCS.objects.create(finding=finding, steps=step, poc_image='', description='-')
+
+    def stats(self):
+        return (
+            sorted(URLStat.objects.exclude(url_count=0).values_list(*stats.URL_KEY, 'url_count')),
+            sorted(FindingStat.objects.exclude(finding_count=0, poc_count=0).values_list(*stats.FINDING_KEY, 'finding_count', 'poc_count')),
+        )
+
+    def assertStatsRebuilt(self):
+        maintained = self.stats()
+        rebuild_stats()
+        self.assertEqual(maintained, self.stats())
+
+    def test_creates(self):
+        self.assertEqual(FindingStat.objects.get(tester_id=self.alice.pk, severity='critical').poc_count, 2)
+        self.assertStatsRebuilt()
+
+    def test_updates_move_urls_findings_and_pocs(self):
+        self.urls[0].tester = self.bob
+        self.urls[0].save()
+        finding = self.findings[1]
+        finding.cvss_score = '7.5'
+        finding.save()
+        poc = POCS.objects.get(finding=self.findings[2])
+        poc.finding = self.findings[0]
+        poc.save()
+        self.assertEqual(URLStat.objects.get(tester_id=self.bob.pk).url_count, 1)
+        self.assertStatsRebuilt()
+
+    def test_direct_deletes(self):
+        POCS.objects.filter(finding=self.findings[0]).delete()
+        self.findings[3].delete()
+        self.urls[0].delete()
+        self.assertStatsRebuilt()
+
+    def test_cascade_deletes_are_counted_once(self):
+        self.client_detail.delete()
+        self.assertEqual(self.stats(), ([], []))
+        self.assertStatsRebuilt()
+
+    def test_queryset_updates_need_a_rebuild(self):
+        # update() sends no signals; see PENTEST.stats.
+        URL.objects.filter(pk=self.urls[0].pk).update(tester=self.bob)
+        maintained = self.stats()
+        call_command('rebuild_stats', stdout=StringIO())
+        self.assertNotEqual(maintained, self.stats())
+        self.assertEqual(URLStat.objects.get(tester_id=self.bob.pk).url_count, 1)
+
+
+    def test_change_events_reuse_rollup_lookups(self):
+        unexpected = mock.Mock(side_effect=AssertionError("extra tester lookup"))
+        with mock.patch('PENTEST.changes.url_tester', unexpected), mock.patch('PENTEST.changes.finding_url', unexpected), \
+                mock.patch('CORE.events.send') as send, self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            finding = Findings.objects.create(url=self.urls[0], vulnerability=self.vulnerability, cvss_score='7.5')
+            finding.cvss_score = '8.0'
+            finding.save()
+            poc = POCS.objects.create(finding=finding, steps=1, poc_image='', description='-')
+            poc.delete()
+            finding.delete()
+        self.assertEqual(
+            [(event['type'], event['action'], event['tester_id']) for call in send.call_args_list for event in call.args],
+            [('finding', 'created', self.alice.pk), ('finding', 'updated', self.alice.pk), ('poc', 'created', self.alice.pk),
+             ('poc', 'deleted', self.alice.pk), ('finding', 'deleted', self.alice.pk)],
+        )
+
+class BenchmarkSuiteTests(TestCase):
+    def test_generate_data_is_reproducible(self):
+        options = {'clients': 3, 'assessments_per_client': 2, 'urls_per_assessment': 2, 'findings_per_url': 3, 'testers': 2, 'stdout': StringIO()}
+        call_command('generate_data', seed=7, **options)
+        self.assertEqual(URL.objects.count(), 12)
+        self.assertEqual(Findings.objects.count(), 36)
+        self.assertEqual(POCS.objects.count(), 36)
+        first = list(Findings.objects.order_by('id').values_list('url__url', 'vulnerability__name', 'cvss_score'))
+
+        Findings.objects.all().delete()
+        ClientDetail.objects.all().delete()
+        call_command('generate_data', seed=7, **options)
+        self.assertEqual(first, list(Findings.objects.order_by('id').values_list('url__url', 'vulnerability__name', 'cvss_score')))
+
+        counts = sorted(FindingStat.objects.values_list('severity', 'finding_count'))
+        rebuild_stats()
+        self.assertEqual(counts, sorted(FindingStat.objects.values_list('severity', 'finding_count')))
+
+    def test_benchmark_api_compares_with_baseline(self):
+        call_command('generate_data', clients=2, urls_per_assessment=2, findings_per_url=2, testers=1, stdout=StringIO())
+        User.objects.create_superuser(email='admin@example.com', password='-')
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, 'baseline.json')
+            call_command('benchmark_api', requests=2, warmup=0, output=baseline, stdout=StringIO())
+            with open(baseline) as baseline_file:
+                results = json.load(baseline_file)
+            self.assertIn('api/pentest/findings list', results)
+            self.assertIn('api/pentest/findings detail', results)
+
+            for result in results.values():
+                result['queries'] = 0
+            with open(baseline, 'w') as baseline_file:
+                json.dump(results, baseline_file)
+            with self.assertRaises(CommandError):
+                call_command('benchmark_api', requests=2, warmup=0, baseline=baseline, fail_on_regression=True, endpoint=['findings'], stdout=StringIO())
+
+    def test_explain_queries_uses_work_queue_index(self):
+        call_command('generate_data', clients=2, urls_per_assessment=5, findings_per_url=2, testers=1, stdout=StringIO())
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        self.assertIn('In-progress queue: GET /api/pentest/in-progress/ (200', out.getvalue())
+        if connection.vendor == 'sqlite':
+            self.assertIn('url_in_progress_idx', out.getvalue())
+
+
+NESSUS_SCAN = b"""<?xml version="1.0"?>
+<NessusClientData_v2><Report name="scan">
+  <ReportHost name="10.0.0.1">
+    <ReportItem port="443" protocol="tcp" svc_name="www" severity="3" pluginName="SQL Injection" pluginFamily="CGI abuses">
+      <cvss3_base_score>9.8</cvss3_base_score><plugin_output>id=1' OR '1'='1</plugin_output>
+    </ReportItem>
+    <ReportItem port="80" protocol="tcp" svc_name="www" severity="2" pluginName="SQL injection" pluginFamily="CGI abuses">
+      <cvss3_base_score>9.8</cvss3_base_score>
+    </ReportItem>
+    <ReportItem port="80" protocol="tcp" svc_name="www" severity="2" pluginName="Weak TLS" pluginFamily="Service detection"/>
+    <ReportItem port="22" protocol="tcp" svc_name="ssh" severity="0" pluginName="SSH Server Type" pluginFamily="Misc."/>
+  </ReportHost>
+</Report></NessusClientData_v2>"""
+
+
+class ScanImportTests(PentestTestCase):
+    vulnerability_name = 'SQL Injection'
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.sqli, cls.tls = cls.vulnerability, create_vulnerability(cls.web, 'Insecure transport')
+        cls.url = URL.objects.create(url='https://example.com', client_assessment=cls.client_assessment)
+
+    def setUp(self):
+        super().setUp()
+        self.use_media_root()
+
+    def upload(self, content, **data):
+        scan = SimpleUploadedFile('scan.nessus', content, content_type='application/xml')
+        return self.client.post(f'/api/pentest/urls/{self.url.pk}/scan/', {'file': scan, **data}, format='multipart')
+
+    def imported(self, content, **data):
+        response = self.upload(content, **data)
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.json()['status_url'], f"/api/jobs/{response.json()['job']['id']}/")
+        queued = Job.objects.get(pk=response.json()['job']['id'])
+        self.assertTrue(default_storage.exists(queued.payload['upload']))
+        run_pending()
+        queued.refresh_from_db()
+        self.assertFalse(default_storage.exists(queued.payload['upload']))
+        return queued
+
+    def test_nessus_import(self):
+        queued = self.imported(NESSUS_SCAN)
+        self.assertEqual(queued.status, Job.SUCCEEDED)
+        self.assertEqual(
+            {key: queued.result[key] for key in ('issues', 'findings', 'pocs', 'informational', 'unmatched', 'failed')},
+            {'issues': 4, 'findings': 1, 'pocs': 2, 'informational': 1, 'unmatched': 1, 'failed': 0},
+        )
+        finding = Findings.objects.get()
+        self.assertEqual((finding.vulnerability, finding.cvss_score), (self.sqli, '9.8'))
+        self.assertEqual(list(finding.pocs.values_list('steps', flat=True)), [1, 2])
+
+        counts = sorted(FindingStat.objects.values_list('severity', 'finding_count', 'poc_count'))
+        rebuild_stats()
+        self.assertEqual(counts, sorted(FindingStat.objects.values_list('severity', 'finding_count', 'poc_count')))
+
+    @override_settings(SCANNER_VULNERABILITY_MAP={'Service detection': 'Insecure transport'})
+    def test_category_mapping_and_default(self):
+        self.imported(NESSUS_SCAN)
+        self.assertEqual(Findings.objects.filter(vulnerability=self.tls, cvss_score='4.0').count(), 1)
+
+        queued = self.imported(NESSUS_SCAN.replace(b'SQL', b'XML'), default_vulnerability_id=self.tls.pk)
+        self.assertEqual(queued.result['unmatched'], 0)
+        # Re-importing adds POCs to the existing findings.
+        self.assertEqual(Findings.objects.count(), 3)
+
+    def test_rejects_unknown_format(self):
+        for content in (b'<report/>', b'', b'not xml'):
+            response = self.upload(content)
+            self.assertEqual(response.status_code, 400, content)
+        self.assertFalse(Job.objects.exists())
+
+    def test_malformed_file_keeps_committed_batches(self):
+        truncated = NESSUS_SCAN[:NESSUS_SCAN.index(b'<ReportItem port="80" protocol="tcp" svc_name="www" severity="2" pluginName="Weak')]
+        url = URL.objects.select_related('client_assessment').get(pk=self.url.pk)
+        with self.assertRaises(ScanFormatError) as caught:
+            import_scan(io.BytesIO(truncated), url, batch_size=1)
+        self.assertEqual(caught.exception.result['pocs'], 2)
+        self.assertEqual(list(POCS.objects.values_list('poc_image', flat=True)), ['', ''])
+
+        # The job imports in larger batches: the unfinished one is dropped.
+        with self.assertLogs('CORE.jobs', 'INFO'):
+            queued = self.imported(truncated)
+        self.assertEqual(queued.status, Job.FAILED)
+        self.assertIn('0 issues before the error were imported', queued.error)
+        self.assertEqual(POCS.objects.count(), 2)
+
+    def test_failed_batches_are_reported(self):
+        calls = []
+
+        def conflicting(findings, **kwargs):
+            calls.append(findings)
+            if len(calls) == 1:
+                raise IntegrityError("UNIQUE constraint failed")
+            return create_findings(findings, **kwargs)
+
+        url = URL.objects.select_related('client_assessment').get(pk=self.url.pk)
+        with mock.patch('PENTEST.scanners.create_findings', conflicting):
+            result = import_scan(io.BytesIO(NESSUS_SCAN), url, batch_size=1)
+        self.assertEqual((result['pocs'], result['failed'], result['errors']), (1, 1, ["UNIQUE constraint failed"]))
+        self.assertEqual(list(Findings.objects.get().pocs.values_list('steps', flat=True)), [2])
+
+
+def png_bytes(color):
+    output = io.BytesIO()
+    Image.new('RGB', (4, 4), color).save(output, format='PNG')
+    return output.getvalue()
+
+
+class ReportTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.url = URL.objects.create(url='https://a.example.com', client_assessment=cls.client_assessment)
+        cls.finding = Findings.objects.create(url=cls.url, vulnerability=cls.vulnerability, cvss_score='9.8')
+        Findings.objects.create(
+            url=URL.objects.create(url='https://b.example.com', client_assessment=cls.client_assessment),
+            vulnerability=cls.vulnerability, cvss_score='5.0',
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.use_media_root()
+
+    def report(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_embeds_poc_images(self):
+        image = png_bytes('red')
+        name = POCS._meta.get_field('poc_image').storage.save('pocs/re/po/report.png', ContentFile(image))
+        POCS.objects.create(finding=self.finding, steps=1, poc_image=name, description='First step')
+        POCS.objects.create(finding=self.finding, steps=2, poc_image=name, description='Rejected', status=POCS.REJECTED)
+
+        html = self.report(f'/api/pentest/reports/client-assessment/{self.client_assessment.pk}/')
+        self.assertIn('Acme - Web penetration test report', html)
+        self.assertEqual(html.count('data:image/png;base64,' + base64.b64encode(image).decode()), 1)
+        self.assertNotIn('Rejected', html)
+        self.assertLess(html.index('https://a.example.com'), html.index('https://b.example.com'))
+        self.assertTrue(html.rstrip().endswith('</html>'))
+
+    def test_missing_images_are_left_out(self):
+        POCS.objects.create(finding=self.finding, steps=1, poc_image='pocs/00/00/missing.png', description='Lost step')
+        with self.assertLogs('PENTEST.reports', 'WARNING'):
+            html = self.report(f'/api/pentest/reports/url/{self.url.pk}/')
+        self.assertIn('Lost step', html)
+        self.assertNotIn('<img', html)
+        self.assertNotIn('https://b.example.com', html)
+
+
+class POCUploadTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        url = URL.objects.create(url='https://example.com', client_assessment=cls.client_assessment)
+        cls.finding = Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score='9.8')
+
+    def setUp(self):
+        super().setUp()
+        self.use_media_root()
+
+    def upload(self, name, content):
+        return self.client.post(
+            f'/api/pentest/findings/{self.finding.pk}/pocs/',
+            {'steps': 1, 'description': '-', 'poc_image': SimpleUploadedFile(name, content)},
+            format='multipart',
+        )
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        self.assertEqual(self.upload('shot.png', png_bytes('red')).status_code, 401)
+        self.assertFalse(POCS.objects.exists())
+
+    def test_rejects_unsupported_extensions(self):
+        for name in ('shot.svg', 'shot.png.html', 'shot'):
+            response = self.upload(name, png_bytes('red'))
+            self.assertEqual(response.status_code, 400, name)
+            self.assertIn('poc_image', response.json())
+        self.assertFalse(POCS.objects.exists())
+        self.assertFalse(Job.objects.exists())
+
+    def test_uploads_are_processed_by_a_worker(self):
+        response = self.upload('shot.png', png_bytes('red'))
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['status'], POCS.PENDING)
+        self.assertEqual(Job.objects.get().name, 'pentest.process_poc_image')
+
+        run_pending()
+        poc = POCS.objects.get(pk=response.json()['id'])
+        self.assertEqual(poc.status, POCS.READY)
+        self.assertRegex(poc.poc_image.name, r'^pocs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+
+    def test_undecodable_inline_images_are_logged(self):
+        pocs = [{'steps': 1, 'description': '-', 'poc_image': 'data:image/png;base64,not base64!'}]
+        with self.assertLogs('PENTEST.serializer', 'ERROR'):
+            response = self.client.post('/api/pentest/findings/', {
+                'url_id': self.finding.url_id, 'vulnerability_id': self.vulnerability.pk, 'cvss_score': '5.0', 'pocs': pocs,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(response.json()['pocs'][0]['status'], POCS.READY)
+        self.assertFalse(Job.objects.exists())
+
+    def test_broken_images_are_rejected(self):
+        response = self.upload('shot.png', b'not an image')
+        self.assertEqual(response.status_code, 201, response.content)
+        with self.assertLogs('PENTEST.tasks', 'WARNING'):
+            run_pending()
+        poc = POCS.objects.get(pk=response.json()['id'])
+        self.assertEqual((poc.status, poc.poc_image.name), (POCS.REJECTED, ''))
+
+
+class POCStorageTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        url = URL.objects.create(url='https://example.com', client_assessment=cls.client_assessment)
+        cls.findings = [Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score=score) for score in ('9.8', '5.0')]
+
+    def setUp(self):
+        super().setUp()
+        self.use_media_root(POC_FILE_MIN_AGE=0)
+        self.storage = POCS._meta.get_field('poc_image').storage
+
+    def upload(self, finding, content, name='shot.PNG'):
+        with mock.patch('PENTEST.serializer.schedule_poc_processing'):
+            response = self.client.post(
+                f'/api/pentest/findings/{finding.pk}/pocs/',
+                {'steps': 1, 'description': '-', 'poc_image': SimpleUploadedFile(name, content, content_type='image/png')},
+                format='multipart',
+            )
+        self.assertEqual(response.status_code, 201, response.content)
+        return POCS.objects.get(pk=response.json()['id'])
+
+    def stored_files(self):
+        return [
+            os.path.relpath(os.path.join(root, name), self.storage.location).replace(os.sep, '/')
+            for root, _, names in os.walk(self.storage.location) for name in names
+        ]
+
+    def test_duplicate_uploads_share_one_file(self):
+        first = self.upload(self.findings[0], png_bytes('red'))
+        second = self.upload(self.findings[1], png_bytes('red'), name='copy.png')
+        self.assertEqual(first.poc_image.name, second.poc_image.name)
+        self.assertRegex(first.poc_image.name, r'^pocs/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.png$')
+        self.assertEqual(self.stored_files(), [first.poc_image.name])
+
+        # The original is kept until the last POC using it has been processed.
+        original = first.poc_image.name
+        process_poc_image(first.pk)
+        self.assertTrue(self.storage.exists(original))
+        process_poc_image(second.pk)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.status, first.poc_image.name), (POCS.READY, second.poc_image.name))
+        self.assertEqual(self.stored_files(), [first.poc_image.name])
+
+    def test_cascading_deletes_release_files(self):
+        shared = self.upload(self.findings[0], png_bytes('red'))
+        self.upload(self.findings[1], png_bytes('red'))
+        other = self.upload(self.findings[1], png_bytes('blue'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.findings[0].delete()
+        self.assertCountEqual(self.stored_files(), [shared.poc_image.name, other.poc_image.name])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client_detail.delete()
+        self.assertEqual(self.stored_files(), [])
+
+    @override_settings(POC_FILE_MIN_AGE=3600)
+    def test_gc_deletes_unreferenced_files(self):
+        poc = self.upload(self.findings[0], png_bytes('red'))
+        orphan = self.storage.save('pocs/00/00/orphan.png', io.BytesIO(png_bytes('blue')))
+
+        call_command('gc_poc_files', stdout=StringIO())
+        self.assertCountEqual(self.stored_files(), [poc.poc_image.name, orphan])
+        call_command('gc_poc_files', '--min-age', '0', stdout=StringIO())
+        self.assertEqual(self.stored_files(), [poc.poc_image.name])
+
+    @override_settings(POC_FILE_MIN_AGE=3600)
+    def test_release_keeps_files_reused_by_pending_uploads(self):
+        name = self.upload(self.findings[0], png_bytes('red')).poc_image.name
+        hour_ago = time.time() - 3600
+        os.utime(self.storage.path(name), (hour_ago, hour_ago))
+
+        # Another upload of the same image stores its file before the
+        # last POC using it is released, and commits its row after.
+        with self.captureOnCommitCallbacks(execute=True):
+            POCS.objects.get(poc_image=name).delete()
+            self.assertEqual(self.storage.save(name, ContentFile(png_bytes('red'))), name)
+        self.assertEqual(self.stored_files(), [name])
+
+        os.utime(self.storage.path(name), (hour_ago, hour_ago))
+        POCS.release_image(name)
+        self.assertEqual(self.stored_files(), [])
+
+
+class POCRenditionTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        url = URL.objects.create(url='https://example.com', client_assessment=cls.client_assessment)
+        cls.finding = Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score='9.8')
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(
+            MEDIA_ROOT=os.path.join(directory.name, 'media'), RENDITION_CACHE_DIR=os.path.join(directory.name, 'renditions'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.cache_dir = os.path.join(directory.name, 'renditions')
+        output = io.BytesIO()
+        Image.new('RGBA', (800, 400), (255, 0, 0, 128)).save(output, format='PNG')
+        self.poc = POCS.objects.create(
+            finding=self.finding, steps=1, description='-', poc_image=SimpleUploadedFile('shot.png', output.getvalue()),
+        )
+
+    def test_thumbnail_is_rendered_once_and_cached(self):
+        thumbnail = self.client.get(f'/api/pentest/findings/?project_id={self.finding.url_id}').json()['results'][0]['pocs'][0]['thumbnail']
+        self.assertEqual(thumbnail, f'/api/pentest/renditions/pocs/320/webp/{self.poc.poc_image.name}')
+
+        response = self.client.get(thumbnail)
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'image/webp'))
+        self.assertIn('immutable', response['Cache-Control'])
+        with Image.open(io.BytesIO(response.content)) as image:
+            self.assertEqual(image.size, (320, 160))
+
+        with mock.patch('CORE.renditions.render') as render:
+            cached = self.client.get(thumbnail)
+            self.assertEqual(b''.join(cached.streaming_content), response.content)
+            self.assertEqual(self.client.get(thumbnail, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        render.assert_not_called()
+
+        jpeg = self.client.get(f'/api/pentest/renditions/pocs/160/jpeg/{self.poc.poc_image.name}')
+        self.assertEqual(jpeg['Content-Type'], 'image/jpeg')
+
+    def test_rejects_unknown_sizes_and_images(self):
+        name = self.poc.poc_image.name
+        self.assertEqual(self.client.get(f'/api/pentest/renditions/pocs/321/webp/{name}').status_code, 400)
+        self.assertEqual(self.client.get(f'/api/pentest/renditions/pocs/320/tiff/{name}').status_code, 400)
+        self.assertEqual(self.client.get('/api/pentest/renditions/pocs/320/webp/../../settings.py').status_code, 404)
+
+    def test_eviction_keeps_cache_under_limit(self):
+        sizes = []
+        with override_settings(RENDITION_CACHE_MAX_BYTES=3000):
+            for width in (160, 320, 640, 1280):
+                response = self.client.get(f'/api/pentest/renditions/pocs/{width}/jpeg/{self.poc.poc_image.name}')
+                sizes.append(len(response.content))
+                total = sum(
+                    os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(self.cache_dir) for name in names
+                )
+                self.assertLessEqual(total, max(3000, sizes[-1]))
+
+
+class URLImportJobTests(PentestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.use_media_root()
+
+    def queue(self, data, format='json'):
+        response = self.client.post('/api/pentest/urls/upload/', {'client_assessment_id': self.client_assessment.pk, **data}, format=format)
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(self.client.get(response.json()['status_url']).json()['status'], Job.QUEUED)
+        return Job.objects.get(pk=response.json()['job']['id'])
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/pentest/urls/upload/', {'client_assessment_id': self.client_assessment.pk, 'data': ['https://a.example.com']}, format='json')
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(Job.objects.exists())
+
+    def test_rows_are_imported_by_a_worker(self):
+        queued = self.queue({'data': [{'url': 'https://a.example.com'}, 'https://b.example.com', 'https://a.example.com']})
+        self.assertFalse(URL.objects.exists())
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.SUCCEEDED)
+        self.assertEqual({key: queued.result[key] for key in ('inserted', 'duplicates', 'invalid')}, {'inserted': 2, 'duplicates': 1, 'invalid': 0})
+        self.assertEqual(queued.progress, 3)
+        self.assertEqual(URL.objects.count(), 2)
+
+    def test_rows_added_concurrently_count_as_duplicates(self):
+        create = URL.objects.bulk_create
+
+        def racing(objs, **kwargs):
+            # Another import commits one of the rows between the check and the insert.
+            URL.objects.create(url='https://b.example.com', client_assessment=self.client_assessment)
+            return create(objs, **kwargs)
+
+        with mock.patch.object(URL.objects, 'bulk_create', racing):
+            result = import_urls(['https://a.example.com', 'https://b.example.com'], self.client_assessment.pk)
+        self.assertEqual(result, {'inserted': 1, 'duplicates': 1, 'invalid': 0})
+        self.assertEqual(URL.objects.count(), 2)
+
+    def test_uploads_are_stashed_for_the_worker(self):
+        queued = self.queue({'file': SimpleUploadedFile('urls.csv', b'url\nhttps://a.example.com\n')}, format='multipart')
+        stashed = queued.payload['upload']
+        self.assertTrue(default_storage.exists(stashed))
+        run_pending()
+        self.assertEqual(list(URL.objects.values_list('url', flat=True)), ['https://a.example.com'])
+        self.assertFalse(default_storage.exists(stashed))
+
+        broken = self.queue({'file': SimpleUploadedFile('urls.xlsx', b'not a zip')}, format='multipart')
+        with self.assertLogs('CORE.jobs', 'INFO'):
+            run_pending()
+        broken.refresh_from_db()
+        self.assertEqual((broken.status, broken.attempts, broken.error), (Job.FAILED, 1, "Not a valid .xlsx file"))
+
+    @override_settings(JOB_RETRY_DELAY=0)
+    def test_upload_is_kept_for_retries_only(self):
+        queued = self.queue({'file': SimpleUploadedFile('urls.csv', b'url\nhttps://a.example.com\n')}, format='multipart')
+        stashed, seen = queued.payload['upload'], []
+
+        def unavailable(urls, client_assessment_id):
+            seen.append(default_storage.exists(stashed))
+            raise OperationalError("database is locked")
+        with mock.patch('PENTEST.tasks.import_urls', unavailable), self.assertLogs('CORE.jobs'):
+            run_pending()
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, seen), (Job.FAILED, [True, True, True]))
+        self.assertFalse(default_storage.exists(stashed))
+
+    @override_settings(JOB_RUN_INLINE=True)
+    def test_inline_jobs_run_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/pentest/urls/upload/', {'client_assessment_id': self.client_assessment.pk, 'data': ['https://a.example.com']}, format='json',
+            )
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(Job.objects.get().status, Job.SUCCEEDED)
+        self.assertEqual(list(URL.objects.values_list('url', flat=True)), ['https://a.example.com'])
+
+    def test_broken_shared_strings_count_as_invalid_rows(self):
+        ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        cells = ['<c r="A1" t="inlineStr"><is><t>url</t></is></c>', '<c r="A2" t="s"><v>0</v></c>', '<c r="A3" t="s"><v>7</v></c>', '<c r="A4" t="s"><v>x</v></c>']
+        workbook = io.BytesIO()
+        with zipfile.ZipFile(workbook, 'w') as archive:
+            archive.writestr('xl/sharedStrings.xml', f'<sst {ns}><si><t>https://a.example.com</t></si></sst>')
+            rows = ''.join(f'<row r="{index}">{cell}</row>' for index, cell in enumerate(cells, 1))
+            archive.writestr('xl/worksheets/sheet1.xml', f'<worksheet {ns}><sheetData>{rows}</sheetData></worksheet>')
+        queued = self.queue({'file': SimpleUploadedFile('urls.xlsx', workbook.getvalue())}, format='multipart')
+        run_pending()
+        queued.refresh_from_db()
+        self.assertEqual(queued.status, Job.SUCCEEDED, queued.error)
+        self.assertEqual((queued.result['inserted'], queued.result['invalid']), (1, 2))
+
+    def test_rejects_unsupported_files(self):
+        response = self.client.post(
+            '/api/pentest/urls/upload/',
+            {'client_assessment_id': self.client_assessment.pk, 'file': SimpleUploadedFile('urls.txt', b'https://a.example.com')},
+            format='multipart',
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Job.objects.exists())
+
+
+class ChangeEventTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.alice, cls.bob = cls.user, User.objects.create(email='bob@example.com')
+        cls.url = URL.objects.create(url='https://a.example.com', client_assessment=cls.client_assessment, tester=cls.alice)
+
+    def events(self, change):
+        # Each test runs in one transaction; a savepoint gives the change its own batch.
+        with mock.patch('CORE.events.send') as send, self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            change()
+        return [event for call in send.call_args_list for event in call.args]
+
+    def test_reassigned_urls_notify_both_testers(self):
+        def reassign():
+            self.url.tester = self.bob
+            self.url.save()
+        self.assertEqual(self.events(reassign), [
+            {'type': 'url', 'action': 'updated', 'id': self.url.pk, 'tester_id': self.bob.pk, 'previous_tester_id': self.alice.pk},
+        ])
+
+    def test_findings_carry_the_tester_of_their_url(self):
+        finding = Findings(url=self.url, vulnerability=self.vulnerability, cvss_score='5.0')
+        self.assertEqual(self.events(finding.save), [
+            {'type': 'finding', 'action': 'created', 'id': finding.pk, 'url_id': self.url.pk, 'tester_id': self.alice.pk},
+        ])
+        self.assertEqual(self.events(finding.delete)[0]['action'], 'deleted')
+
+    def test_events_wait_for_the_commit(self):
+        with mock.patch('CORE.events.send') as send, self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.url.save()
+        self.assertEqual(len([callback for callback in callbacks if isinstance(getattr(callback, '__self__', None), EventBatch)]), 1)
+        send.assert_not_called()
+
+    def test_a_transaction_sends_one_batch(self):
+        with mock.patch('CORE.events.send') as send, self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            for tester in (self.bob, self.alice):
+                self.url.tester = tester
+                self.url.save()
+        self.assertEqual([len(call.args) for call in send.call_args_list], [2])
+
+    def test_failed_sends_do_not_fail_the_request(self):
+        with mock.patch('CORE.events.send', side_effect=OperationalError("database is locked")), self.assertLogs('django', 'ERROR'), \
+                self.captureOnCommitCallbacks(execute=True), transaction.atomic():
+            self.url.save()
+
+
+@override_settings(SYNC_OVERLAP_SECONDS=0)
+class SyncTests(PentestTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.urls = [URL.objects.create(url=f'https://{index}.example.com', client_assessment=cls.client_assessment) for index in range(3)]
+
+    def sync(self, path, since=None):
+        response = self.client.get(path, {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_returns_only_changes_since_the_token(self):
+        first = self.sync('/api/pentest/sync/urls/')
+        self.assertEqual([row['id'] for row in first['results']], [url.pk for url in self.urls])
+        self.assertFalse(first['more'])
+        self.assertEqual(self.sync('/api/pentest/sync/urls/', first['since'])['results'], [])
+
+        Findings.objects.create(url=self.urls[1], vulnerability=self.vulnerability, cvss_score='5.0')
+        deleted = self.urls[2].pk
+        URL.objects.filter(pk=deleted).delete()
+        changed = self.sync('/api/pentest/sync/urls/', first['since'])
+        self.assertEqual([(row['id'], row['finding_counts']) for row in changed['results']], [(self.urls[1].pk, 1)])
+        self.assertEqual(changed['deleted'], [deleted])
+
+    def test_cascaded_deletes_leave_tombstones(self):
+        findings = [Findings.objects.create(url=url, vulnerability=self.vulnerability, cvss_score='5.0') for url in self.urls]
+        since = self.sync('/api/pentest/sync/findings/')['since']
+        client_id = self.client_assessment.client_id
+        self.client_assessment.client.delete()
+        self.assertEqual(sorted(Tombstone.objects.values_list('model', 'object_id')), sorted(
+            [('CLIENT.clientdetail', client_id)]
+            + [('PENTEST.url', url.pk) for url in self.urls]
+            + [('PENTEST.findings', finding.pk) for finding in findings]
+        ))
+        changed = self.sync('/api/pentest/sync/findings/', since)
+        self.assertEqual(sorted(changed['deleted']), sorted(finding.pk for finding in findings))
+        self.assertEqual(self.sync('/api/client/sync/details/')['results'], [])
+
+    @override_settings(SYNC_OVERLAP_SECONDS=60)
+    def test_late_commits_are_restamped(self):
+        with self.captureOnCommitCallbacks() as callbacks, transaction.atomic():
+            url = URL.objects.create(url='https://late.example.com', client_assessment=self.client_assessment)
+            self.urls[0].delete()
+        restamps = [callback for callback in callbacks if isinstance(getattr(callback, '__self__', None), Restamp)]
+        self.assertEqual(len(restamps), 2)
+        stamp = url.updated_at
+
+        def commit_at(moment):
+            with mock.patch('CORE.sync.timezone.now', return_value=moment):
+                for restamp in restamps:
+                    restamp()
+            url.refresh_from_db()
+            return url.updated_at, Tombstone.objects.get().deleted_at
+
+        # Within half the overlap the stamps stand; later ones are moved to the commit.
+        self.assertEqual(commit_at(stamp + timedelta(seconds=10))[0], stamp)
+        late = stamp + timedelta(seconds=45)
+        self.assertEqual(commit_at(late), (late, late))
+
+    def test_pages_follow_the_token(self):
+        seen, since, more = [], None, True
+        with mock.patch.object(views.URLViewset, 'sync_page_size', 2):
+            while more:
+                page = self.sync('/api/pentest/sync/urls/', since)
+                seen += [row['id'] for row in page['results']]
+                since, more = page['since'], page['more']
+        self.assertEqual(seen, [url.pk for url in self.urls])
+
+    def test_rejects_bad_and_expired_tokens(self):
+        self.assertEqual(self.client.get('/api/pentest/sync/urls/', {'since': 'nope'}).status_code, 400)
+        expired = signing.dumps({'r': None, 'd': ['2000-01-01T00:00:00+00:00', 0]}, salt=f'sync:{URL._meta.label_lower}')
+        self.assertEqual(self.client.get('/api/pentest/sync/urls/', {'since': expired}).status_code, 410)
+        # Tokens are bound to their collection.
+        since = self.sync('/api/pentest/sync/urls/')['since']
+        self.assertEqual(self.client.get('/api/pentest/sync/findings/', {'since': since}).status_code, 400)
+
+
+class BulkURLAssignmentTests(PentestTestCase):
+    user_fields = {'is_staff': True}
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.compliance = CompilanceType.objects.create(name='PCI')
+        other = ClientAssessmentType.objects.create(client=cls.client_detail, assessment_type=AssessmentType.objects.create(name='Mobile'))
+        cls.urls = [URL.objects.create(url=f'https://{index}.example.com', client_assessment=cls.client_assessment) for index in range(3)]
+        cls.other_url = URL.objects.create(url='https://other.example.com', client_assessment=other)
+        for url in cls.urls[:2]:
+            Findings.objects.create(url=url, vulnerability=cls.vulnerability, cvss_score='9.8')
+
+    def patch(self, data):
+        return self.client.patch('/api/pentest/bulk/urls/', data, format='json')
+
+    def assertStatsConsistent(self):
+        counts = sorted(URLStat.objects.filter(url_count__gt=0).values_list('tester_id', 'compliance_id', 'url_count'))
+        finding_counts = sorted(FindingStat.objects.filter(finding_count__gt=0).values_list('tester_id', 'finding_count'))
+        rebuild_stats()
+        self.assertEqual(counts, sorted(URLStat.objects.values_list('tester_id', 'compliance_id', 'url_count')))
+        self.assertEqual(finding_counts, sorted(FindingStat.objects.values_list('tester_id', 'finding_count')))
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(User.objects.create(email='member@example.com'))
+        self.assertEqual(self.patch({'ids': [self.urls[0].pk], 'tester_id': self.user.pk}).status_code, 403)
+        self.client.force_authenticate(None)
+        self.assertEqual(self.patch({'ids': [self.urls[0].pk], 'tester_id': self.user.pk}).status_code, 401)
+        self.assertEqual(self.client.post('/api/pentest/bulk/findings/', {}, format='json').status_code, 401)
+        self.assertEqual(self.client.post(f'/api/pentest/urls/{self.urls[0].pk}/scan/', {}).status_code, 401)
+        self.assertFalse(URL.objects.filter(tester__isnull=False).exists())
+
+    def test_assigns_urls_by_id(self):
+        before = URL.objects.get(pk=self.urls[0].pk).updated_at
+        data = {
+            'ids': [self.urls[0].pk, self.urls[1].pk, 0],
+            'tester_id': self.user.pk, 'compliance_id': self.compliance.pk,
+            'start_date': '2026-01-01T00:00:00Z', 'end_date': '2026-01-31T00:00:00Z',
+        }
+        with mock.patch('CORE.events.send') as send, self.captureOnCommitCallbacks(execute=True):
+            response = self.patch(data)
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['results'], [
+            {'id': self.urls[0].pk, 'status': 'updated'}, {'id': self.urls[1].pk, 'status': 'updated'}, {'id': 0, 'status': 'not_found'},
+        ])
+        assigned = URL.objects.filter(tester=self.user, compliance=self.compliance, start_date__isnull=False, end_date__isnull=False)
+        self.assertEqual(sorted(assigned.values_list('id', flat=True)), [self.urls[0].pk, self.urls[1].pk])
+        self.assertGreater(URL.objects.get(pk=self.urls[0].pk).updated_at, before)
+        self.assertStatsConsistent()
+        self.assertEqual(send.call_args.args[0]['ids'], [self.urls[0].pk, self.urls[1].pk])
+
+    def test_assigns_a_client_assessment(self):
+        self.patch({'client_assessment_id': self.client_assessment.pk, 'tester_id': self.user.pk})
+        response = self.patch({'client_assessment_id': self.client_assessment.pk, 'tester_id': None, 'qa_date': '2026-02-01T00:00:00Z'})
+        self.assertEqual(response.json()['updated'], 3)
+        self.assertFalse(URL.objects.filter(tester__isnull=False).exists())
+        self.assertEqual(URL.objects.filter(qa_date__isnull=False).count(), 3)
+        self.assertIsNone(URL.objects.get(pk=self.other_url.pk).qa_date)
+        self.assertStatsConsistent()
+
+    def test_validation(self):
+        for data in [
+            {'tester_id': self.user.pk},
+            {'ids': [self.urls[0].pk]},
+            {'ids': [self.urls[0].pk], 'tester_id': 0},
+            {'ids': [self.urls[0].pk], 'start_date': '2026-02-01T00:00:00Z', 'end_date': '2026-01-01T00:00:00Z'},
+        ]:
+            self.assertEqual(self.patch(data).status_code, 400, data)
+        self.assertFalse(URL.objects.filter(tester__isnull=False).exists())
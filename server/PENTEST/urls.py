@@ -1,9 +1,10 @@
 from django.urls import path, include
 
 from rest_framework.routers import DefaultRouter
+from CORE.events import ChangeStreamView
 
 from .views import ClientAssessmentTypeViewSet, URLViewset, InProgresViews, \
-    InProgressDetailView, CompletedPentest, FindingViewset, InsertManyURL, POCViewset
+    InProgressDetailView, CompletedPentest, FindingViewset, InsertManyURL, InsertManyFindings, AssignManyURL, ScanImportView, POCViewset, POCUploadView, POCRenditionView, ReportView, ExportView, DashboardStatsView
 
 router = DefaultRouter()
 router.register(r'client_assessment', ClientAssessmentTypeViewSet)
@@ -16,7 +17,20 @@ urlpatterns = [
     path('in-progress/', InProgresViews.as_view(), name='in-progress-project'),
     path('in-progress/<int:pk>/', InProgressDetailView.as_view(), name='in-progress-project-detail'),
     path('urls/upload/', InsertManyURL.as_view(), name='url-excel-sheet'),
+    path('urls/<int:url_id>/scan/', ScanImportView.as_view(), name='url-scan-import'),
+    path('bulk/findings/', InsertManyFindings.as_view(), name='bulk-findings'),
+    path('bulk/urls/', AssignManyURL.as_view(), name='bulk-url-assignment'),
     path('completed/', CompletedPentest.as_view(), name='completed-pentest'),
+    path('findings/<int:finding_id>/pocs/', POCUploadView.as_view(), name='finding-poc-upload'),
+    path('renditions/pocs/<int:width>/<str:file_format>/<path:name>', POCRenditionView.as_view(), name='poc-rendition'),
+    path('reports/client-assessment/<int:client_assessment_id>/', ReportView.as_view(), name='client-assessment-report'),
+    path('reports/url/<int:url_id>/', ReportView.as_view(), name='url-report'),
+    path('exports/findings/<str:file_format>/', ExportView.as_view(kind='findings'), name='findings-export'),
+    path('exports/urls/<str:file_format>/', ExportView.as_view(kind='urls'), name='urls-export'),
+    path('stats/', DashboardStatsView.as_view(), name='dashboard-stats'),
+    path('changes/stream/', ChangeStreamView.as_view(), name='change-stream'),
+    path('sync/urls/', URLViewset.as_view({'get': 'sync'}), name='url-sync'),
+    path('sync/findings/', FindingViewset.as_view({'get': 'sync'}), name='finding-sync'),
 ]
 
 urlpatterns = urlpatterns
\ No newline at end of file
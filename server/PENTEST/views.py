@@ -1,19 +1,43 @@
-from django.shortcuts import render
+import os
+from django.db import IntegrityError
+from django.shortcuts import render, get_object_or_404
+from django.db.models import Q, Sum
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.http import StreamingHttpResponse
+from django.urls import reverse
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import generics, views
 from rest_framework.response import Response
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
-from .models import ClientAssessmentType, URL, Findings, POCS
-from .serializer import ClientAssessmentTypeSerializer, URLSerializer, FindingSerializer, POCSerializer
+from CLIENT.models import ClientDetail
+from CORE.cvss import SEVERITY_BANDS
+from CORE.fieldsets import ShapedQuerysetMixin
+from CORE.jobs import enqueue, stash_upload
+from CORE.middleware import ViewTimingMixin
+from CORE.renditions import RenditionView
+from CORE.rows import ValuesListMixin
+from CORE.models import AssessmentType, CompilanceType, User, Vulnerabilities
+from CORE.serializer import JobSerializer
+from CORE.sync import SyncMixin
+from . import stats
+from .models import ClientAssessmentType, URL, Findings, POCS, URLStat, FindingStat
+from .serializer import ClientAssessmentTypeSerializer, URLSerializer, FindingSerializer, POCSerializer, POCUploadSerializer, \
+    BulkFindingSerializer, BulkURLAssignmentSerializer
+from .reports import ReportBuilder
+from .exports import export
+from .importers import URL_IMPORT_EXTENSIONS
+from .scanners import ScanFormatError, check_scan_format
 from .pagination import LargeResultsSetPagination, StandardResultsSetPagination
-   
-class ClientAssessmentTypeViewSet(ModelViewSet):
+
+class ClientAssessmentTypeViewSet(ViewTimingMixin, ShapedQuerysetMixin, ModelViewSet):
     queryset = ClientAssessmentType.objects.select_related('assessment_type', 'client').all()
     serializer_class = ClientAssessmentTypeSerializer
     pagination_class = LargeResultsSetPagination
     
     def get_queryset(self):
-        queryset = ClientAssessmentType.objects.select_related('assessment_type', 'client').all()
+        queryset = ClientAssessmentType.objects.all()
         client_id = self.request.query_params.get('client')
         assessment_type = self.request.query_params.get("assessment_type")
         
@@ -24,13 +48,14 @@ class ClientAssessmentTypeViewSet(ModelViewSet):
             
         return queryset
     
-class URLViewset(ModelViewSet):
+class URLViewset(ViewTimingMixin, SyncMixin, ValuesListMixin, ShapedQuerysetMixin, ModelViewSet):
     queryset = URL.objects.select_related("tester", "client_assessment", "compliance").all()
     serializer_class = URLSerializer
     pagination_class = StandardResultsSetPagination
+    values_representation = True
     
     def get_queryset(self):
-        queryset = URL.objects.select_related("tester", "compliance", "client_assessment", "client_assessment__client", "client_assessment__assessment_type").all()
+        queryset = URL.objects.with_finding_counts()
         
         client_detail_id = self.request.query_params.get('client_id') 
         
@@ -44,45 +69,59 @@ class URLViewset(ModelViewSet):
             
             
         return queryset
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        # The response carries finding counts, which only annotated rows have.
+        serializer.instance = URL.objects.with_finding_counts().get(pk=serializer.instance.pk)
     
     
 class InsertManyURL(views.APIView):
+    permission_classes = [IsAuthenticated]
+
     def post(self, request, *args, **kwargs):
-        excel_data = request.data.get('data')
-        client_assessment_id = self.request.data.get('client_assessment_id')
-        if not excel_data:
-            return Response({"error": "No data provided"}, status=400)
-        
-        model_instances = []
-        
-        for row in excel_data:
-            model_instances.append(
-                URL(
-                    url=row.get('url'), 
-                    client_assessment_id=client_assessment_id 
-                )
-            )
-        try:
-            URL.objects.bulk_create(model_instances, ignore_conflicts=True)
-            return Response({"message": f"Successfully added {len(model_instances)} URLs."})
-        except Exception as e:
-            return Response({"error": str(e)}, status=500)
+        client_assessment_id = request.data.get('client_assessment_id')
+        if not str(client_assessment_id).isdigit() or not ClientAssessmentType.objects.filter(pk=client_assessment_id).exists():
+            return Response({"error": "A valid client_assessment_id is required"}, status=400)
+
+        upload = request.FILES.get('file')
+        payload = {'client_assessment_id': int(client_assessment_id)}
+        if upload is not None:
+            if os.path.splitext(upload.name or '')[1].lower() not in URL_IMPORT_EXTENSIONS:
+                return Response({"error": "Unsupported file type, upload a .csv, .xlsx or .json file"}, status=400)
+            payload['upload'] = stash_upload(upload)
+        else:
+            excel_data = request.data.get('data')
+            if not excel_data:
+                return Response({"error": "No data provided"}, status=400)
+            if not isinstance(excel_data, list):
+                return Response({"error": "Expected a list of rows"}, status=400)
+            payload['data'] = excel_data
+
+        # Large sheets take a while; the import runs on a worker.
+        job = enqueue('pentest.import_urls', payload, user=request.user)
+        return Response({
+            "message": "URL import queued.",
+            "job": JobSerializer(job).data,
+            "status_url": reverse('job-detail', args=[job.pk]),
+        }, status=202)
     
     
     
-class InProgresViews(generics.ListAPIView):
+class InProgresViews(ViewTimingMixin, ValuesListMixin, ShapedQuerysetMixin, generics.ListAPIView):
     queryset = URL.objects.filter(is_completed=False, start_date__isnull=False, end_date__isnull=False, qa_date__isnull=False, compliance__isnull=False, tester__isnull=False).select_related('client_assessment', 'tester', 'compliance').all()
     serializer_class = URLSerializer
     pagination_class = LargeResultsSetPagination
+    values_representation = True
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         user = self.request.user
-        queryset = URL.objects.filter(is_completed=False, start_date__isnull=False, end_date__isnull=False, qa_date__isnull=False, compliance__isnull=False, tester_id=user.id).prefetch_related('findings').select_related('client_assessment', 'tester', 'compliance').all()
+        queryset = URL.objects.filter(is_completed=False, start_date__isnull=False, end_date__isnull=False, qa_date__isnull=False, compliance__isnull=False, tester_id=user.id).with_finding_counts()
         return queryset
 
     
-class InProgressDetailView(generics.RetrieveAPIView):
+class InProgressDetailView(ViewTimingMixin, ShapedQuerysetMixin, generics.RetrieveAPIView):
     queryset = URL.objects.filter(
         start_date__isnull=False, 
         end_date__isnull=False, 
@@ -103,38 +142,268 @@ class InProgressDetailView(generics.RetrieveAPIView):
             qa_date__isnull=False, 
             compliance__isnull=False, 
             tester_id=user.id
-        ).select_related('client_assessment', 'tester', 'compliance')
+        ).with_finding_counts()
         return queryset
     
     
-class CompletedPentest(generics.ListAPIView):
+class CompletedPentest(ViewTimingMixin, ValuesListMixin, ShapedQuerysetMixin, generics.ListAPIView):
     queryset = URL.objects.filter(is_completed=True).select_related('client_assessment', 'tester', 'compliance').all()
     serializer_class = URLSerializer
     pagination_class = StandardResultsSetPagination
     permission_classes = [IsAuthenticated, IsAdminUser]
+    values_representation = True
     
     def get_queryset(self):
         user = self.request.user
-        queryset = URL.objects.filter(is_completed=True, tester_id=user.id).select_related('client_assessment', 'tester', 'compliance').all()
+        queryset = URL.objects.filter(is_completed=True, tester_id=user.id).with_finding_counts()
         return queryset
     
     
-class FindingViewset(ModelViewSet):
+class FindingViewset(ViewTimingMixin, SyncMixin, ValuesListMixin, ShapedQuerysetMixin, ModelViewSet):
     queryset =  Findings.objects.select_related('url', 'vulnerability').all()
     serializer_class = FindingSerializer
     pagination_class = StandardResultsSetPagination
-    
+    values_representation = True
+    related_querysets = {'url': URL.objects.with_finding_counts}
+
     def get_queryset(self):
-        queryset = Findings.objects.select_related('url', 'vulnerability').order_by('-cvss_score').all()
+        queryset = Findings.objects.order_by('-cvss_base_score').all()
         
         project_id = self.request.query_params.get('project_id') 
         
+        severity = self.request.query_params.get('severity')
+        
         if project_id is not None:
             queryset = queryset.filter(url__id=project_id)
             
+        if severity is not None:
+            queryset = queryset.filter(severity=severity)
+            
         return queryset
+
+    def perform_create(self, serializer):
+        super().perform_create(serializer)
+        self.annotate_url(serializer.instance)
+
+    def perform_update(self, serializer):
+        super().perform_update(serializer)
+        self.annotate_url(serializer.instance)
+
+    @staticmethod
+    def annotate_url(finding):
+        # The embedded URL carries finding counts, which only annotated rows have.
+        finding.url = URL.objects.with_finding_counts().get(pk=finding.url_id)
+    
+
+class ScanImportView(views.APIView):
+    parser_classes = [MultiPartParser]
+    permission_classes = [IsAuthenticated]
+    
+    def post(self, request, *args, **kwargs):
+        url = get_object_or_404(URL.objects.select_related('client_assessment'), pk=kwargs['url_id'])
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({"error": "No scan file provided"}, status=400)
+        
+        default_vulnerability_id = request.data.get('default_vulnerability_id') or None
+        if default_vulnerability_id is not None:
+            matches_category = str(default_vulnerability_id).isdigit() and Vulnerabilities.objects.filter(
+                pk=default_vulnerability_id, category_of_testing_id=url.client_assessment.assessment_type_id
+            ).exists()
+            if not matches_category:
+                return Response({"error": "default_vulnerability_id must be a vulnerability of this URL's assessment type"}, status=400)
+            default_vulnerability_id = int(default_vulnerability_id)
+        
+        try:
+            check_scan_format(upload)
+        except ScanFormatError as e:
+            return Response({"error": str(e)}, status=400)
+        
+        # Large exports take a while; the import runs on a worker.
+        job = enqueue('pentest.import_scan', {
+            'url_id': url.pk, 'upload': stash_upload(upload), 'default_vulnerability_id': default_vulnerability_id,
+        }, user=request.user)
+        return Response({
+            "message": "Scan import queued.",
+            "job": JobSerializer(job).data,
+            "status_url": reverse('job-detail', args=[job.pk]),
+        }, status=202)
+
+
+class InsertManyFindings(views.APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BulkFindingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            findings = serializer.save()
+        except IntegrityError:
+            return Response({"error": "Some of these findings were added concurrently, please retry"}, status=409)
+
+        return Response({
+            "message": f"Successfully added {len(findings)} findings.",
+            "inserted": len(findings),
+            "duplicates": serializer.validated_data['duplicates'],
+            "ids": [finding.pk for finding in findings],
+        }, status=201)
+
+
+class AssignManyURL(views.APIView):
+    permission_classes = [IsAuthenticated, IsAdminUser]
+
+    def patch(self, request, *args, **kwargs):
+        serializer = BulkURLAssignmentSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = serializer.save()
+        updated = sum(result['status'] == 'updated' for result in results)
+        return Response({
+            "message": f"Successfully updated {updated} URLs.",
+            "updated": updated,
+            "results": results,
+        })
+    
+
+class POCUploadView(generics.CreateAPIView):
+    serializer_class = POCUploadSerializer
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    
+    def perform_create(self, serializer):
+        finding = get_object_or_404(Findings, pk=self.kwargs['finding_id'])
+        serializer.save(finding=finding)
+    
+
+class POCRenditionView(RenditionView):
+    queryset = POCS.objects.all()
+    image_field = 'poc_image'
+    
+
+class ReportView(views.APIView):
+    permission_classes = [IsAuthenticated]
+    
+    def get(self, request, *args, **kwargs):
+        if 'url_id' in kwargs:
+            url = get_object_or_404(URL.objects.select_related('client_assessment__client'), pk=kwargs['url_id'])
+            builder = ReportBuilder(url=url)
+        else:
+            client_assessment = get_object_or_404(
+                ClientAssessmentType.objects.select_related('client', 'assessment_type'), pk=kwargs['client_assessment_id']
+            )
+            builder = ReportBuilder(client_assessment=client_assessment)
+        
+        response = StreamingHttpResponse(builder.render(), content_type='text/html; charset=utf-8')
+        response['Content-Disposition'] = f'inline; filename="{builder.filename}"'
+        return response
+    
+
+class ExportView(views.APIView):
+    """
+    Streams the findings or URLs of a client, a client assessment and/or
+    the URLs started within a date range, as CSV or XLSX.
+    """
+    permission_classes = [IsAuthenticated]
+    kind = 'findings'
+    content_types = {
+        'csv': 'text/csv; charset=utf-8',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    }
+    
+    def get(self, request, *args, **kwargs):
+        file_format = kwargs['file_format']
+        if file_format not in self.content_types:
+            return Response({"error": "Unsupported format, use csv or xlsx"}, status=400)
+        
+        urls = URL.objects.all()
+        for param, lookup in [('client_id', 'client_assessment__client_id'), ('client_assessment_id', 'client_assessment_id')]:
+            value = request.query_params.get(param)
+            if value is not None:
+                if not value.isdigit():
+                    return Response({"error": f"{param} must be an integer"}, status=400)
+                urls = urls.filter(**{lookup: value})
+        for param, lookup in [('start', 'start_date__date__gte'), ('end', 'start_date__date__lte')]:
+            value = request.query_params.get(param)
+            if value is not None:
+                day = parse_date(value)
+                if day is None:
+                    return Response({"error": f"{param} must be a date (YYYY-MM-DD)"}, status=400)
+                urls = urls.filter(**{lookup: day})
+        if not urls.query.where:
+            return Response({"error": "Pass client_id, client_assessment_id, start or end"}, status=400)
+        
+        response = StreamingHttpResponse(export(self.kind, urls, file_format), content_type=self.content_types[file_format])
+        response['Content-Disposition'] = f'attachment; filename="{self.kind}_{timezone.now():%Y%m%d_%H%M%S}.{file_format}"'
+        return response
+    
+
+class DashboardStatsView(views.APIView):
+    permission_classes = [IsAuthenticated]
+    filter_params = ['client_id', 'assessment_type_id', 'tester_id', 'compliance_id']
+    
+    def get(self, request, *args, **kwargs):
+        filters = {}
+        for param in self.filter_params:
+            value = request.query_params.get(param)
+            if value is not None:
+                if not value.isdigit():
+                    return Response({"error": f"{param} must be an integer"}, status=400)
+                filters[param] = int(value)
+        is_completed = request.query_params.get('is_completed')
+        if is_completed is not None:
+            filters['is_completed'] = is_completed.lower() in ('true', '1')
+        
+        url_stats = URLStat.objects.filter(**filters)
+        finding_stats = FindingStat.objects.filter(**filters)
+        url_sums = {'urls': Sum('url_count'), 'completed_urls': Sum('url_count', filter=Q(is_completed=True))}
+        finding_sums = {'findings': Sum('finding_count'), 'pocs': Sum('poc_count')}
+        
+        totals = url_stats.aggregate(**url_sums)
+        finding_totals = finding_stats.aggregate(**finding_sums)
+        severities = stats.rollup(finding_stats, 'severity', **finding_sums)
+        
+        def by_dimension(dimension, names):
+            urls = stats.rollup(url_stats, dimension, **url_sums)
+            findings = stats.rollup(finding_stats, dimension, **finding_sums)
+            labels = names([key for key in {*urls, *findings} if key])
+            return [
+                {
+                    'id': key or None,
+                    'name': labels.get(key),
+                    'urls': urls.get(key, {}).get('urls', 0),
+                    'completed_urls': urls.get(key, {}).get('completed_urls', 0),
+                    'findings': findings.get(key, {}).get('findings', 0),
+                    'pocs': findings.get(key, {}).get('pocs', 0),
+                }
+                for key in sorted({*urls, *findings})
+            ]
+        
+        def names_of(model, field):
+            return lambda ids: dict(model.objects.filter(pk__in=ids).values_list('id', field))
+        
+        def tester_names(ids):
+            return {id: f"{first} {last}".strip() for id, first, last in User.objects.filter(pk__in=ids).values_list('id', 'first_name', 'last_name')}
+        
+        return Response({
+            'urls': {
+                'total': totals['urls'] or 0,
+                'completed': totals['completed_urls'] or 0,
+                'open': (totals['urls'] or 0) - (totals['completed_urls'] or 0),
+            },
+            'findings': {
+                'total': finding_totals['findings'] or 0,
+                'pocs': finding_totals['pocs'] or 0,
+                'by_severity': {
+                    severity or 'none': severities.get(severity, {}).get('findings', 0)
+                    for severity in [band for band, _ in SEVERITY_BANDS] + ['']
+                },
+            },
+            'by_client': by_dimension('client_id', names_of(ClientDetail, 'name')),
+            'by_assessment_type': by_dimension('assessment_type_id', names_of(AssessmentType, 'name')),
+            'by_tester': by_dimension('tester_id', tester_names),
+            'by_compliance': by_dimension('compliance_id', names_of(CompilanceType, 'name')),
+        })
     
 
-class POCViewset(ModelViewSet):
+class POCViewset(ViewTimingMixin, ModelViewSet):
     queryset = POCS.objects.all()
     serializer_class = POCSerializer
\ No newline at end of file
@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Serve the change stream (/api/pentest/changes/stream/) through this
+application, e.g. `uvicorn server.asgi:application`: under WSGI every open
+stream holds a worker thread.
 """
 
 import os
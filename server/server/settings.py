@@ -49,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'CORE.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -86,6 +87,25 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Job workers write concurrently: take the write lock when a
+        # transaction starts and wait for it instead of failing at once.
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+    }
+}
+
+
+# Cache
+# Reference data and user snapshots are cached here. Point this at a shared
+# backend (Redis, Memcached) when running several worker processes so that
+# invalidations reach all of them; `manage.py check` warns about a
+# process-local one when DEBUG is off.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
@@ -139,10 +159,66 @@ AUTH_USER_MODEL = 'CORE.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'CORE.authentication.CachedJWTAuthentication',
     )
 }
 
+# Requests running the same query shape at least this many times are logged
+# as likely N+1 queries by CORE.middleware.QueryInstrumentationMiddleware.
+# It logs every other request at DEBUG: lower the level of the
+# CORE.middleware logger below to see them.
+N_PLUS_ONE_THRESHOLD = 10
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'CORE.middleware': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
+
+# Scanner imports (PENTEST.scanners): issues whose name matches no vulnerability
+# of the URL's assessment type are looked up here by issue name or category
+# (Burp issue type, Nessus plugin family, ZAP "CWE-<id>"), then fall back to
+# the default vulnerability name. Unmatched issues are skipped.
+SCANNER_VULNERABILITY_MAP = {}
+SCANNER_DEFAULT_VULNERABILITY = None
+
+# Background jobs (CORE.jobs), run by `manage.py run_worker`. A job is
+# retried after JOB_RETRY_DELAY seconds, doubling per attempt; a running
+# job not heard from for JOB_LEASE_SECONDS is taken over by another worker.
+# Without a worker, queued jobs never run: set JOB_RUN_INLINE to run them
+# in the process that queues them, once its transaction commits, e.g. in
+# development. Requests queuing a job then wait for it.
+JOB_WORKER_PROCESSES = 2
+JOB_RETRY_DELAY = 10
+JOB_LEASE_SECONDS = 300
+JOB_RUN_INLINE = False
+
+# Change events streamed to the dashboard (CORE.events). Streams in other
+# processes, e.g. for events sent by `run_worker`, receive them through the
+# ChangeEvent table, which they poll every CHANGE_POLL_INTERVAL seconds and
+# which keeps events for CHANGE_LOG_TIMEOUT seconds.
+CHANGE_LOG_TIMEOUT = 60
+CHANGE_POLL_INTERVAL = 1.0
+CHANGE_HEARTBEAT_INTERVAL = 15
+
+# Delta sync (CORE.sync). Caught-up tokens step back SYNC_OVERLAP_SECONDS
+# to cover transactions that commit after a later sync; rows of transactions
+# lasting over half of it are stamped again at commit. Tombstones, and with
+# them sync tokens, last SYNC_TOMBSTONE_DAYS (`manage.py prune_tombstones`).
+SYNC_OVERLAP_SECONDS = 5
+SYNC_TOMBSTONE_DAYS = 30
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:5173",
 ]
@@ -185,7 +261,7 @@ SIMPLE_JWT = {
     "SLIDING_TOKEN_LIFETIME": timedelta(minutes=5),
     "SLIDING_TOKEN_REFRESH_LIFETIME": timedelta(days=1),
 
-    "TOKEN_OBTAIN_SERIALIZER": "rest_framework_simplejwt.serializers.TokenObtainPairSerializer",
+    "TOKEN_OBTAIN_SERIALIZER": "CORE.authentication.ClaimsTokenObtainPairSerializer",
     "TOKEN_REFRESH_SERIALIZER": "rest_framework_simplejwt.serializers.TokenRefreshSerializer",
     "TOKEN_VERIFY_SERIALIZER": "rest_framework_simplejwt.serializers.TokenVerifySerializer",
     "TOKEN_BLACKLIST_SERIALIZER": "rest_framework_simplejwt.serializers.TokenBlacklistSerializer",
@@ -195,3 +271,13 @@ SIMPLE_JWT = {
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+# POC image files stored or reused within this many seconds are never
+# deleted, as the upload naming them may not be committed yet. Files
+# released in that window are left to `manage.py gc_poc_files`.
+POC_FILE_MIN_AGE = 60 * 60
+
+# Resized POC and client profile images (CORE.renditions), generated on
+# first request. The least recently used are evicted past the size limit.
+RENDITION_CACHE_DIR = os.path.join(BASE_DIR, 'renditions')
+RENDITION_CACHE_MAX_BYTES = 512 * 1024 * 1024